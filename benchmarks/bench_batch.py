@@ -0,0 +1,84 @@
+"""
+Compare the throughput of adding entries one invocation at a time, each loading
+and saving the database, with a single batch saving once.
+
+    python -m benchmarks.bench_batch --counts 10 100 --crypter gpg
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from pwdmanager import batch
+from pwdmanager.database import CRYPTERS, DataBaseManager, DBLoader, EncodeInterceptor
+
+PASSPHRASE = "benchmark"
+
+
+def create_db_manager(db_path, crypter):
+    interceptor = CRYPTERS[crypter](PASSPHRASE) if crypter else EncodeInterceptor()
+    return DataBaseManager(DBLoader(db_path, interceptor))
+
+
+def create_records(count):
+    return [
+        json.dumps(
+            {
+                "command": "add",
+                "name": "entry{}".format(i),
+                "login": "login{}".format(i),
+                "password": "pwd{}".format(i),
+                "tags": ["provisioning"],
+            }
+        )
+        for i in range(count)
+    ]
+
+
+def one_by_one(db_path, crypter, records):
+    for record in records:
+        db_manager = create_db_manager(db_path, crypter)
+        db = db_manager.load_db()
+        batch.create_command(json.loads(record)).check_execute_render(db)
+        db_manager.save_db_if_needed()
+
+
+def in_batch(db_path, crypter, records):
+    db_manager = create_db_manager(db_path, crypter)
+    db_manager.load_db()
+    batch.apply_commands(db_manager.db, batch.read_commands(records))
+    db_manager.save_db_if_needed()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--counts", nargs="+", type=int, default=[10, 100, 1000])
+    parser.add_argument(
+        "--crypter", choices=sorted(CRYPTERS), help="no encryption if not given"
+    )
+    args = parser.parse_args()
+
+    print(
+        "{:>9} {:>12} {:>9} {:>11}".format("commands", "mode", "time s", "commands/s")
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in args.counts:
+            records = create_records(count)
+            for mode, apply in (("one by one", one_by_one), ("batch", in_batch)):
+                # a new database for every run, init_db loading an existing one
+                db_path = os.path.join(tempfile.mkdtemp(dir=tmp_dir), "vault")
+                create_db_manager(db_path, args.crypter).init_db()
+                start = time.perf_counter()
+                apply(db_path, args.crypter, records)
+                elapsed = time.perf_counter() - start
+                print(
+                    "{:>9} {:>12} {:>9.2f} {:>11.0f}".format(
+                        count, mode, elapsed, count / elapsed
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
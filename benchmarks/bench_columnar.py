@@ -0,0 +1,120 @@
+"""
+Compare the scan throughput of the dict of DatabaseEntry objects with the one of
+ColumnarDatabase: counting the entries matching a search by visiting every
+object, with the trigram index of Database, and over the joined columns, along
+with an audit going through two fields of every entry. The first columnar search
+also joins the columns, which is timed separately.
+
+    python -m benchmarks.bench_columnar --sizes 10000 100000 1000000
+"""
+
+import argparse
+import operator
+import time
+
+from benchmarks.synthetic import generate_database
+from pwdmanager.columnar import ColumnarDatabase
+from pwdmanager.database import Database
+
+QUERIES = [("git", None), ("mail-4", None), ("github-vpn", "tag1"), (None, "tag42")]
+
+
+def scan_count(db, name_or_alias_part, tag_part):
+    return len(
+        Database.filter_with_tag_part(
+            tag_part,
+            Database.filter_with_name_or_alias_part(
+                name_or_alias_part, list(db.db.values())
+            ),
+        )
+    )
+
+
+def audit_objects(db):
+    return sum(
+        entry.creation_date == entry.last_update_date for entry in db.db.values()
+    )
+
+
+def audit_columns(db):
+    return sum(map(operator.eq, db.creation_dates, db.last_update_dates))
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        "{:>9} {:>12} {:>6} {:>10} {:>10} {:>11} {:>8}".format(
+            "entries", "search", "tag", "scan ms", "index ms", "columns ms", "speedup"
+        )
+    )
+    for size in args.sizes:
+        db = generate_database(size)
+        start = time.perf_counter()
+        columnar_db = ColumnarDatabase(db.db)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        columnar_db.count_matching_entries("git", "tag1")
+        join = time.perf_counter() - start
+        print(
+            "{:>9} columns built in {:.0f} ms, joined in {:.0f} ms".format(
+                size, build * 1000, join * 1000
+            )
+        )
+
+        for search, tag in QUERIES:
+            expected = scan_count(db, search, tag)
+            assert db.count_matching_entries(search, tag) == expected
+            assert columnar_db.count_matching_entries(search, tag) == expected
+            scan_time = best_time(lambda: scan_count(db, search, tag), args.repeat)
+            index_time = best_time(
+                lambda: db.count_matching_entries(search, tag), args.repeat
+            )
+            columns_time = best_time(
+                lambda: columnar_db.count_matching_entries(search, tag), args.repeat
+            )
+            print(
+                "{:>9} {:>12} {:>6} {:>10.2f} {:>10.2f} {:>11.2f} {:>7.1f}x".format(
+                    size,
+                    str(search),
+                    str(tag),
+                    scan_time * 1000,
+                    index_time * 1000,
+                    columns_time * 1000,
+                    scan_time / columns_time,
+                )
+            )
+
+        assert audit_objects(db) == audit_columns(columnar_db)
+        scan_time = best_time(lambda: audit_objects(db), args.repeat)
+        columns_time = best_time(lambda: audit_columns(columnar_db), args.repeat)
+        print(
+            "{:>9} {:>12} {:>6} {:>10.2f} {:>10} {:>11.2f} {:>7.1f}x".format(
+                size,
+                "audit",
+                "",
+                scan_time * 1000,
+                "",
+                columns_time * 1000,
+                scan_time / columns_time,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
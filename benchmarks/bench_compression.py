@@ -0,0 +1,78 @@
+"""
+Matrix of the size of the database file against the time to save and load it,
+for each compression algorithm and level, gpg only compressing the plaintext
+itself when no compression is configured.
+
+    python -m benchmarks.bench_compression --sizes 1000 10000 --crypter gpg
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_database
+from pwdmanager.database import CRYPTERS, DBLoader, create_interceptor
+
+PASSPHRASE = "benchmark"
+SETTINGS = [
+    (None, None),
+    ("zlib", 1),
+    ("zlib", 6),
+    ("zlib", 9),
+    ("bz2", 1),
+    ("bz2", 9),
+    ("lzma", 0),
+    ("lzma", 6),
+    ("lzma", 9),
+]
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10_000])
+    parser.add_argument("--crypter", choices=sorted(CRYPTERS), default="gpg")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        "{:>9} {:>11} {:>10} {:>9} {:>9}".format(
+            "entries", "compression", "file KiB", "save ms", "load ms"
+        )
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "vault")
+        for size in args.sizes:
+            db = generate_database(size)
+            for algorithm, level in SETTINGS:
+                interceptor = create_interceptor(
+                    PASSPHRASE, args.crypter, algorithm, level
+                )
+                db_loader = DBLoader(db_path, interceptor, binary=True)
+                save_time = best_time(lambda: db_loader.save_db(db), args.repeat)
+                load_time = best_time(
+                    lambda: DBLoader(db_path, interceptor).load_db(), args.repeat
+                )
+                print(
+                    "{:>9} {:>11} {:>10.1f} {:>9.1f} {:>9.1f}".format(
+                        size,
+                        "{} {}".format(algorithm, level) if algorithm else "none",
+                        os.path.getsize(db_path) / 1024,
+                        save_time * 1000,
+                        load_time * 1000,
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
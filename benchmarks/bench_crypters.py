@@ -0,0 +1,58 @@
+"""
+Compare the load and save latency of DBLoader with the gpg and aes-gcm crypters.
+Each measure creates a new crypter, as every pwdmanager invocation does.
+
+    python -m benchmarks.bench_crypters --sizes 0 1000 10000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_database
+from pwdmanager.database import CRYPTERS, DBLoader
+
+PASSPHRASE = "benchmark"
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=int, default=[0, 1000, 10_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print("{:>9} {:>8} {:>9} {:>9}".format("entries", "crypter", "load ms", "save ms"))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "vault")
+        for size in args.sizes:
+            db = generate_database(size)
+            for name, crypter in sorted(CRYPTERS.items()):
+                DBLoader(db_path, crypter(PASSPHRASE)).save_db(db)
+                save_time = best_time(
+                    lambda: DBLoader(db_path, crypter(PASSPHRASE)).save_db(db),
+                    args.repeat,
+                )
+                load_time = best_time(
+                    lambda: DBLoader(db_path, crypter(PASSPHRASE)).load_db(),
+                    args.repeat,
+                )
+                print(
+                    "{:>9} {:>8} {:>9.1f} {:>9.1f}".format(
+                        size, name, load_time * 1000, save_time * 1000
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
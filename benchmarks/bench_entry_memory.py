@@ -0,0 +1,83 @@
+"""
+Report the memory used per loaded entry by the slotted DatabaseEntry, against
+the previous representation with a __dict__ and two mutable sets per entry.
+
+    python -m benchmarks.bench_entry_memory --sizes 10000 100000
+"""
+
+import argparse
+import gc
+import json
+import tracemalloc
+
+from benchmarks.synthetic import generate_database
+from pwdmanager.database import DatabaseJSONEncoder, DBLoader
+
+
+class LegacyDatabaseEntry:
+    def __init__(self, name, login, pwd, login_alias=None):
+        self.name = name
+        self.login = login
+        self.login_alias = login_alias
+        self.pwd = pwd
+        self.aliases = set()
+        self.tags = set()
+        self.creation_date = None
+        self.last_update_date = None
+
+
+def legacy_decode_database_entry(o):
+    if "__db_entry__" in o:
+        db_entry = LegacyDatabaseEntry(
+            o["name"], o["login"], o["pwd"], o.get("login_alias")
+        )
+        db_entry.creation_date = o["creation_date"]
+        db_entry.last_update_date = o["last_update_date"]
+        db_entry.aliases = set(o.get("aliases", set()))
+        db_entry.tags = set(o.get("tags", set()))
+        return db_entry
+    else:
+        return o
+
+
+def measure(serialized, object_hook):
+    gc.collect()
+    tracemalloc.start()
+    loaded = json.loads(serialized, object_hook=object_hook)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del loaded
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000])
+    parser.add_argument("--aliases", type=int, default=2)
+    parser.add_argument("--tags", type=int, default=2)
+    args = parser.parse_args()
+
+    print(
+        "{:>9} {:>16} {:>16} {:>8}".format(
+            "entries", "legacy B/entry", "slotted B/entry", "saved"
+        )
+    )
+    for size in args.sizes:
+        serialized = json.dumps(
+            generate_database(
+                size, aliases_per_entry=args.aliases, tags_per_entry=args.tags
+            ),
+            cls=DatabaseJSONEncoder,
+        )
+        legacy = measure(serialized, legacy_decode_database_entry) / size
+        slotted = measure(serialized, DBLoader.json_decode_database_entry) / size
+        print(
+            "{:>9} {:>16.0f} {:>16.0f} {:>7.0%}".format(
+                size, legacy, slotted, 1 - slotted / legacy
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Compare the latency of saving a one entry update with and without the journal,
+and of loading the database once the updates are saved. The mean includes the
+compactions happening along the way. The default gpg crypter starts a process
+and derives a key for every decryption, that of the journal included.
+
+    python -m benchmarks.bench_journal --sizes 1000 10000 --crypter gpg
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_database
+from pwdmanager.database import CRYPTERS, DBLoader
+
+PASSPHRASE = "benchmark"
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure_updates(db_loader, db, updates):
+    names = list(db.db)
+    timings = list()
+    for i in range(updates):
+        entry = db[names[i % len(names)]]
+        entry.pwd = "updated-{}".format(i)
+        db.mark_modified(entry)
+        start = time.perf_counter()
+        db_loader.save_db(db)
+        timings.append(time.perf_counter() - start)
+        db.mark_saved()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10_000])
+    parser.add_argument("--updates", type=int, default=50)
+    parser.add_argument("--crypter", choices=sorted(CRYPTERS), default="gpg")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        "{:>9} {:>8} {:>10} {:>9} {:>9}".format(
+            "entries", "journal", "mean ms", "max ms", "load ms"
+        )
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "vault")
+        for size in args.sizes:
+            for journaling in (False, True):
+                crypter = CRYPTERS[args.crypter](PASSPHRASE)
+                DBLoader(db_path, crypter).save_db(generate_database(size))
+                db_loader = DBLoader(db_path, crypter, journaling=journaling)
+                timings = measure_updates(db_loader, db_loader.load_db(), args.updates)
+                load_time = best_time(
+                    lambda: DBLoader(db_path, crypter).load_db(), args.repeat
+                )
+                print(
+                    "{:>9} {:>8} {:>10.2f} {:>9.2f} {:>9.2f}".format(
+                        size,
+                        "on" if journaling else "off",
+                        sum(timings) / len(timings) * 1000,
+                        max(timings) * 1000,
+                        load_time * 1000,
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
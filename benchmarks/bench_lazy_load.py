@@ -0,0 +1,78 @@
+"""
+Compare loading a database eagerly, which creates every entry, with loading it
+lazily, which only creates the entries accessed: the time to load the database,
+to show one entry from a new load and to save every entry again untouched, for
+the JSON and binary serializations. The database is not encrypted so that the
+timings are those of the decoding and encoding alone.
+
+    python -m benchmarks.bench_lazy_load --entries 1000 10000 100000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_database
+from pwdmanager.database import DBLoader
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure(db_path, lazy, name, repeat):
+    def load():
+        DBLoader(db_path, lazy=lazy).load_db()
+
+    def show():
+        DBLoader(db_path, lazy=lazy).load_db()[name].pwd
+
+    db_loader = DBLoader(db_path, lazy=lazy)
+    db = db_loader.load_db()
+
+    def save_all():
+        db.modified = True
+        db_loader.save_db(db)
+
+    return [best_time(func, repeat) for func in (load, show, save_all)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", nargs="+", type=int, default=[1000, 10_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        "{:>8} {:>8} {:>6} {:>9} {:>9} {:>9}".format(
+            "entries", "format", "mode", "load ms", "show ms", "save ms"
+        )
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "vault")
+        for entries in args.entries:
+            db = generate_database(entries)
+            name = next(iter(db.db))
+            for serialization in ("json", "binary"):
+                DBLoader(db_path, binary=serialization == "binary").save_db(db)
+                for mode in ("eager", "lazy"):
+                    timings = measure(db_path, mode == "lazy", name, args.repeat)
+                    print(
+                        "{:>8} {:>8} {:>6} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+                            entries,
+                            serialization,
+                            mode,
+                            *(seconds * 1000 for seconds in timings),
+                        )
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Compare the peak memory of DBLoader.load_db with and without streaming, and of
+the loading done before the interceptors read the database file themselves,
+which read the file into bytes then decrypted them to a string. Each load runs
+in its own process so the maximum resident set sizes do not interfere.
+
+    python -m benchmarks.bench_load_memory --sizes 10000 100000 --backend gpg
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import generate_database
+from pwdmanager.database import (
+    Database,
+    DBLoader,
+    EncodeInterceptor,
+    PythonGnuPGCrypterInterceptor,
+)
+
+PASSPHRASE = "benchmark"
+MODES = ("bytes", "full", "streaming")
+
+
+def create_interceptor(backend):
+    if backend == "gpg":
+        return PythonGnuPGCrypterInterceptor(PASSPHRASE)
+    else:
+        return EncodeInterceptor()
+
+
+def load_from_bytes(db_loader):
+    with open(db_loader.db_path, "rb") as db_file:
+        loaded_bytes = db_file.read()
+    plaintext = db_loader.interceptor.at_load_time(loaded_bytes)
+    del loaded_bytes
+    db_dict = json.loads(plaintext, object_hook=db_loader.json_decode_database_entry)
+    del plaintext
+    return Database(db_dict)
+
+
+def measure_load(db_path, backend, mode):
+    """Runs in the child process, prints time, traced peak and max RSS."""
+    db_loader = DBLoader(
+        db_path, create_interceptor(backend), streaming=mode == "streaming"
+    )
+    tracemalloc.start()
+    start = time.perf_counter()
+    db = load_from_bytes(db_loader) if mode == "bytes" else db_loader.load_db()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(len(db), elapsed, current, peak, max_rss)
+
+
+def run_child(db_path, backend, mode):
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.bench_load_memory",
+            "--child",
+            db_path,
+            "--backend",
+            backend,
+            "--mode",
+            mode,
+        ],
+        check=True,
+        stdout=subprocess.PIPE,
+        text=True,
+    ).stdout.split()
+    return (
+        int(output[0]),
+        float(output[1]),
+        int(output[2]),
+        int(output[3]),
+        int(output[4]),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000])
+    parser.add_argument("--backend", choices=["plain", "gpg"], default="plain")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure_load(args.child, args.backend, args.mode)
+        return
+
+    print(
+        "{:>9} {:>10} {:>8} {:>10} {:>14} {:>12}".format(
+            "entries", "mode", "time s", "final MB", "traced peak MB", "max RSS MB"
+        )
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "vault")
+        for size in args.sizes:
+            DBLoader(db_path, create_interceptor(args.backend)).save_db(
+                generate_database(size)
+            )
+            for mode in MODES:
+                count, elapsed, current, peak, max_rss = run_child(
+                    db_path, args.backend, mode
+                )
+                assert count == size
+                print(
+                    "{:>9} {:>10} {:>8.2f} {:>10.1f} {:>14.1f} {:>12.1f}".format(
+                        size,
+                        mode,
+                        elapsed,
+                        current / 2**20,
+                        peak / 2**20,
+                        max_rss / 2**20,
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
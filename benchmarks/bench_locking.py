@@ -0,0 +1,122 @@
+"""
+Stress concurrent access to one database: writer processes each add entries one
+invocation at a time, loading, adding and saving, while reader processes keep
+listing the entries. Reports the throughput, the saves that had to apply their
+command again after another process saved first, the loads that failed on a
+partially written database and the entries lost, the last two being 0 unless
+--no-lock is given.
+
+    python -m benchmarks.bench_locking --writers 4 --readers 4 --updates 50
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from pwdmanager.commands import AddEntry, ListEntries
+from pwdmanager.database import DataBaseManager, DBLoader
+from pwdmanager.locking import DatabaseLock
+
+
+def create_db_manager(db_path, locking):
+    return DataBaseManager(
+        DBLoader(db_path, journaling=True),
+        lock=DatabaseLock(db_path) if locking else None,
+    )
+
+
+def write(db_path, locking, writer, updates, results):
+    conflicts, failures = 0, 0
+    for i in range(updates):
+        db_manager = create_db_manager(db_path, locking)
+        try:
+            db_manager.load_db()
+        except ValueError:
+            failures += 1
+            continue
+        command = AddEntry("writer{}-{}".format(writer, i), "login", "pwd")
+        db_manager.execute(command.check_execute_render)
+        db_manager.save_db_if_needed()
+        conflicts += db_manager.conflicts
+    results.put((conflicts, failures))
+
+
+def read(db_path, locking, stop, results):
+    reads, failures = 0, 0
+    while not stop.is_set():
+        db_manager = create_db_manager(db_path, locking)
+        try:
+            db_manager.load_db()
+        except ValueError:
+            failures += 1
+            continue
+        for _ in ListEntries(None).check_execute_render(db_manager.db):
+            pass
+        reads += 1
+    results.put((reads, failures))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--updates", type=int, default=50, help="per writer")
+    parser.add_argument(
+        "--no-lock", action="store_true", help="show the updates lost without locks"
+    )
+    args = parser.parse_args()
+    locking = not args.no_lock
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "vault")
+        create_db_manager(db_path, locking).init_db()
+
+        stop = multiprocessing.Event()
+        write_results, read_results = multiprocessing.Queue(), multiprocessing.Queue()
+        readers = [
+            multiprocessing.Process(
+                target=read, args=(db_path, locking, stop, read_results)
+            )
+            for _ in range(args.readers)
+        ]
+        writers = [
+            multiprocessing.Process(
+                target=write,
+                args=(db_path, locking, writer, args.updates, write_results),
+            )
+            for writer in range(args.writers)
+        ]
+
+        start = time.perf_counter()
+        for process in readers + writers:
+            process.start()
+        write_counts = [write_results.get() for _ in writers]
+        elapsed = time.perf_counter() - start
+        stop.set()
+        read_counts = [read_results.get() for _ in readers]
+        for process in readers + writers:
+            process.join()
+
+        try:
+            saved = len(DBLoader(db_path).load_db())
+        except ValueError:
+            # left partially written by concurrent saves
+            saved = 0
+
+    conflicts = sum(counts[0] for counts in write_counts)
+    reads = sum(counts[0] for counts in read_counts)
+    failures = sum(counts[1] for counts in write_counts + read_counts)
+    expected = args.writers * args.updates
+    print("locks          {}".format("on" if locking else "off"))
+    print("seconds        {:.2f}".format(elapsed))
+    print("writes/s       {:.1f}".format(expected / elapsed))
+    print("reads/s        {:.1f}".format(reads / elapsed))
+    print("applied again  {}".format(conflicts))
+    print("failed loads   {}".format(failures))
+    print("lost updates   {}".format(expected - saved))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Compare the peak memory of DBLoader.write_db, which streams the chunks of JSON
+through the interceptor into the database file, with the saving done before,
+which encoded the whole database to a string, encrypted it to bytes and then
+wrote them. Each save runs in its own process so the maximum resident set sizes
+do not interfere.
+
+    python -m benchmarks.bench_save_memory --sizes 10000 100000 --backend gpg
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import generate_database
+from pwdmanager.database import (
+    DatabaseJSONEncoder,
+    DBLoader,
+    EncodeInterceptor,
+    PythonGnuPGCrypterInterceptor,
+    write_atomically,
+)
+
+PASSPHRASE = "benchmark"
+MODES = ("bytes", "stream")
+
+
+def create_interceptor(backend):
+    if backend == "gpg":
+        return PythonGnuPGCrypterInterceptor(PASSPHRASE)
+    else:
+        return EncodeInterceptor()
+
+
+def save_from_bytes(db_loader, db):
+    plaintext = json.dumps(db, cls=DatabaseJSONEncoder)
+    to_be_written = db_loader.interceptor.at_save_time(plaintext)
+    del plaintext
+    with write_atomically(db_loader.db_path) as db_file:
+        db_file.write(to_be_written)
+
+
+def measure_save(db_path, backend, mode):
+    """Runs in the child process, prints time, traced peak and max RSS."""
+    db_loader = DBLoader(db_path, create_interceptor(backend))
+    db = db_loader.load_db()
+    # the memory of the loaded database is not part of the save
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    tracemalloc.start()
+    start = time.perf_counter()
+    if mode == "bytes":
+        save_from_bytes(db_loader, db)
+    else:
+        db_loader.write_db(db)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(len(db), elapsed, peak, max_rss, max_rss - baseline_rss)
+
+
+def run_child(db_path, backend, mode):
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.bench_save_memory",
+            "--child",
+            db_path,
+            "--backend",
+            backend,
+            "--mode",
+            mode,
+        ],
+        check=True,
+        stdout=subprocess.PIPE,
+        text=True,
+    ).stdout.split()
+    return (int(output[0]), float(output[1]), *map(int, output[2:]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000])
+    parser.add_argument("--backend", choices=["plain", "gpg"], default="plain")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure_save(args.child, args.backend, args.mode)
+        return
+
+    print(
+        "{:>9} {:>8} {:>8} {:>14} {:>12} {:>14}".format(
+            "entries", "mode", "time s", "traced peak MB", "max RSS MB", "RSS growth MB"
+        )
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "vault")
+        for size in args.sizes:
+            DBLoader(db_path, create_interceptor(args.backend)).save_db(
+                generate_database(size)
+            )
+            for mode in MODES:
+                count, elapsed, peak, max_rss, growth = run_child(
+                    db_path, args.backend, mode
+                )
+                assert count == size
+                print(
+                    "{:>9} {:>8} {:>8.2f} {:>14.1f} {:>12.1f} {:>14.1f}".format(
+                        size,
+                        mode,
+                        elapsed,
+                        peak / 2**20,
+                        max_rss / 2**20,
+                        growth / 2**20,
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Compare the full scan of Database.find_matching_entries without the trigram
+indexes, what a one-shot command runs, with the indexed search of the agent and
+the shell. The first search of those processes also pays for building the
+indexes, reported as build+query.
+
+    python -m benchmarks.bench_search --sizes 10000 100000 1000000
+"""
+
+import argparse
+import time
+
+from benchmarks.synthetic import generate_database
+from pwdmanager.database import Database
+
+QUERIES = [("git", None), ("mail-4", None), ("github-vpn", "tag1"), (None, "tag42")]
+
+
+def scan(db, name_or_alias_part, tag_part):
+    return Database.filter_with_tag_part(
+        tag_part,
+        Database.filter_with_name_or_alias_part(name_or_alias_part, db.db.values()),
+    )
+
+
+def build_and_search(db, name_or_alias_part, tag_part):
+    db.name_index = db.tag_index = None
+    db.build_search_indexes()
+    return db.find_matching_entries(name_or_alias_part, tag_part)
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        "{:>9} {:>12} {:>6} {:>10} {:>10} {:>8} {:>16}".format(
+            "entries",
+            "search",
+            "tag",
+            "scan ms",
+            "index ms",
+            "speedup",
+            "build+query ms",
+        )
+    )
+    for size in args.sizes:
+        db = generate_database(size)
+        for search, tag in QUERIES:
+            expected = list(scan(db, search, tag))
+            scan_time = best_time(
+                lambda: db.find_matching_entries(search, tag), args.repeat
+            )
+            first_time = best_time(
+                lambda: build_and_search(db, search, tag), args.repeat
+            )
+            assert list(db.find_matching_entries(search, tag)) == expected
+            index_time = best_time(
+                lambda: db.find_matching_entries(search, tag), args.repeat
+            )
+            db.name_index = db.tag_index = None
+            print(
+                "{:>9} {:>12} {:>6} {:>10.2f} {:>10.2f} {:>7.1f}x {:>16.2f}".format(
+                    size,
+                    str(search),
+                    str(tag),
+                    scan_time * 1000,
+                    index_time * 1000,
+                    scan_time / index_time,
+                    first_time * 1000,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
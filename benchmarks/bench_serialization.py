@@ -0,0 +1,75 @@
+"""
+Compare the JSON and binary serializations of the entries: the time to
+serialize and to parse the plaintext, its size and the size of the database
+file once encrypted, gpg compressing the plaintext before encrypting it.
+
+    python -m benchmarks.bench_serialization --sizes 1000 10000 100000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_database
+from pwdmanager.database import CRYPTERS, DBLoader, join_chunks
+
+PASSPHRASE = "benchmark"
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10_000, 100_000])
+    parser.add_argument("--crypter", choices=sorted(CRYPTERS), default="gpg")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        "{:>9} {:>7} {:>12} {:>9} {:>11} {:>10}".format(
+            "entries", "format", "serialize ms", "parse ms", "plain KiB", "file KiB"
+        )
+    )
+    crypter = CRYPTERS[args.crypter](PASSPHRASE)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "vault")
+        for size in args.sizes:
+            db = generate_database(size)
+            for name, binary in (("json", False), ("binary", True)):
+                db_loader = DBLoader(db_path, crypter, binary=binary)
+                entries = db.db.values()
+
+                def serialize():
+                    return join_chunks(db_loader.encode_entries(entries))
+
+                plaintext = serialize()
+                if isinstance(plaintext, str):
+                    plaintext = plaintext.encode()
+                serialize_time = best_time(serialize, args.repeat)
+                parse_time = best_time(
+                    lambda: db_loader.decode_entries(plaintext), args.repeat
+                )
+                db_loader.save_db(db)
+                print(
+                    "{:>9} {:>7} {:>12.1f} {:>9.1f} {:>11.1f} {:>10.1f}".format(
+                        size,
+                        name,
+                        serialize_time * 1000,
+                        parse_time * 1000,
+                        len(plaintext) / 1024,
+                        os.path.getsize(db_path) / 1024,
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compare a single file database with a sharded one: the latency of showing one
+entry, which only decrypts its shard, and of listing or saving every entry,
+which decrypts or encrypts all the shards in parallel, for each number of
+workers. The workers only speed things up with as many cores available, the
+number of cores is printed first.
+
+    python -m benchmarks.bench_sharded --entries 10000 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_database
+from pwdmanager.database import CRYPTERS, DBLoader, create_db_loader
+from pwdmanager.sharded_loader import ShardedDBLoader
+
+PASSPHRASE = "benchmark"
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure(db_path, crypter, workers, name, repeat):
+    def create_loader():
+        db_loader = create_db_loader(db_path, crypter)
+        db_loader.workers = workers
+        return db_loader
+
+    def show():
+        create_loader().load_db()[name].pwd
+
+    def list_all():
+        for _ in create_loader().load_db().entries():
+            pass
+
+    db_loader = create_loader()
+    db = db_loader.load_db()
+
+    def save_all():
+        db.modified = True
+        db_loader.save_db(db)
+
+    return [best_time(func, repeat) for func in (show, list_all, save_all)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=10_000)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--crypter", choices=sorted(CRYPTERS), default="aes-gcm")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print("cores: {}".format(os.cpu_count()))
+    print(
+        "{:>9} {:>8} {:>9} {:>9} {:>9}".format(
+            "layout", "workers", "show ms", "list ms", "save ms"
+        )
+    )
+    # the crypter is shared so that the key is only derived once
+    crypter = CRYPTERS[args.crypter](PASSPHRASE)
+    db = generate_database(args.entries)
+    name = next(iter(db.db))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "vault")
+        DBLoader(db_path, crypter).save_db(db)
+        results = [("single", 1, measure(db_path, crypter, 1, name, args.repeat))]
+
+        sharded_path = os.path.join(tmp_dir, "sharded")
+        ShardedDBLoader(sharded_path, crypter, shards=args.shards).save_db(db)
+        for workers in args.workers:
+            results.append(
+                (
+                    "sharded",
+                    workers,
+                    measure(sharded_path, crypter, workers, name, args.repeat),
+                )
+            )
+
+    for layout, workers, timings in results:
+        print(
+            "{:>9} {:>8} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+                layout, workers, *(seconds * 1000 for seconds in timings)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Measure the start up cost of the command line tool: the import time of
+pwdmanager.pwdmanager reported by python -X importtime, and the wall clock time
+of pwdmanager --help on top of a bare interpreter. Exits with status 1 when a
+measure exceeds its budget, so it can guard against regressions.
+
+    python -m benchmarks.bench_startup --import-budget-ms 60 --help-budget-ms 100
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ENTRY_MODULE = "pwdmanager.pwdmanager"
+
+
+def run(args, env):
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, *args], env=env, capture_output=True, text=True, check=True
+    )
+    return time.perf_counter() - start, completed
+
+
+def import_time(env):
+    """
+    Cumulative import time of ENTRY_MODULE in seconds, and the modules it imports
+    sorted by decreasing cumulative time.
+    """
+    _, completed = run(["-X", "importtime", "-c", "import " + ENTRY_MODULE], env)
+    prefix = "import time:"
+    modules = list()
+    for line in completed.stderr.splitlines():
+        if not line.startswith(prefix) or "cumulative" in line:
+            continue
+        _, cumulative, name = line.replace(prefix, "", 1).split("|")
+        modules.append((int(cumulative) / 1e6, name.strip()))
+
+    total = next(seconds for seconds, name in modules if name == ENTRY_MODULE)
+    return total, sorted(modules, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--import-budget-ms", type=float, default=60)
+    parser.add_argument("--help-budget-ms", type=float, default=100)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports shown")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pycache_dir:
+        # measure with compiled bytecode, as an installed package would run
+        env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache_dir)
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        run(["-m", ENTRY_MODULE, "--help"], env)
+
+        best_import, modules = min(import_time(env) for _ in range(args.repeat))
+        bare = min(run(["-c", "pass"], env)[0] for _ in range(args.repeat))
+        help_time = min(
+            run(["-m", ENTRY_MODULE, "--help"], env)[0] for _ in range(args.repeat)
+        )
+
+    print("slowest imports:")
+    for seconds, name in modules[: args.top]:
+        print("  {:>8.1f} ms  {}".format(seconds * 1000, name))
+    print()
+
+    over_budget = False
+    for label, seconds, budget in (
+        ("import " + ENTRY_MODULE, best_import, args.import_budget_ms),
+        ("--help over bare interpreter", help_time - bare, args.help_budget_ms),
+    ):
+        within = seconds * 1000 <= budget
+        over_budget = over_budget or not within
+        print(
+            "{:<40} {:>8.1f} ms  budget {:>6.1f} ms  {}".format(
+                label, seconds * 1000, budget, "ok" if within else "OVER BUDGET"
+            )
+        )
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Time DBLoader.save_db, DBLoader.load_db, Database.__getitem__,
+Database.find_matching_entries and Database.find_best_matching_entries on
+deterministic synthetic vaults, with the gpg crypter and with the pass-through
+EncodeInterceptor. Results are written as JSON so runs made on different
+versions can be compared:
+
+    python -m benchmarks.bench_suite --sizes 1000 10000 --output after.json
+    python -m benchmarks.bench_suite --compare before.json after.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import DISTRIBUTIONS, POPULARITIES, generate_database
+from pwdmanager.database import (
+    DBLoader,
+    EncodeInterceptor,
+    PythonGnuPGCrypterInterceptor,
+)
+
+BACKENDS = {
+    "encode": EncodeInterceptor,
+    "gpg": lambda: PythonGnuPGCrypterInterceptor("benchmark"),
+}
+LOOKUPS = 1000
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def get_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def lookup_all(db, keys):
+    for key in keys:
+        db[key]
+
+
+def bench_size(size, backends, args, db_path):
+    db = generate_database(
+        size,
+        seed=args.seed,
+        aliases_per_entry=args.aliases,
+        tags_per_entry=args.tags_per_entry,
+        tags=args.tags,
+        alias_distribution=args.alias_distribution,
+        tag_distribution=args.tag_distribution,
+        tag_popularity=args.tag_popularity,
+    )
+    rng = random.Random(args.seed)
+    names = rng.sample(sorted(db.db), min(LOOKUPS, size))
+    aliases = rng.sample(sorted(db.alias_index), min(LOOKUPS, len(db.alias_index)))
+    searches = {
+        "search_name": ("mail", None),
+        "search_tag": (None, "tag1"),
+        "search_name_and_tag": ("git", "tag0"),
+    }
+
+    for backend in backends:
+        interceptor = BACKENDS[backend]()
+        timings = dict()
+        timings["save"] = best_time(
+            lambda: DBLoader(db_path, interceptor).save_db(db), args.repeat
+        )
+        timings["load"] = best_time(
+            lambda: DBLoader(db_path, interceptor).load_db(), args.repeat
+        )
+        loaded_db = DBLoader(db_path, interceptor).load_db()
+        timings["lookup_name"] = best_time(
+            lambda: lookup_all(loaded_db, names), args.repeat
+        ) / max(len(names), 1)
+        timings["lookup_alias"] = best_time(
+            lambda: lookup_all(loaded_db, aliases), args.repeat
+        ) / max(len(aliases), 1)
+        for operation, (name_part, tag_part) in searches.items():
+            timings[operation] = best_time(
+                lambda: loaded_db.find_matching_entries(name_part, tag_part),
+                args.repeat,
+            )
+        timings["search_fuzzy"] = best_time(
+            lambda: loaded_db.find_best_matching_entries("mail", 10), args.repeat
+        )
+
+        for operation, seconds in timings.items():
+            yield {
+                "size": size,
+                "backend": backend,
+                "operation": operation,
+                "seconds": seconds,
+            }
+
+
+def run(args):
+    results = list()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "vault")
+        for size in args.sizes:
+            for result in bench_size(size, args.backends, args, db_path):
+                print(
+                    "{size:>9} {backend:>7} {operation:>20} {ms:>12.4f} ms".format(
+                        ms=result["seconds"] * 1000, **result
+                    ),
+                    file=sys.stderr,
+                )
+                results.append(result)
+
+    return {
+        "metadata": {
+            "date": datetime.datetime.now().isoformat(),
+            "revision": get_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": {
+                key: value
+                for key, value in vars(args).items()
+                if key not in ("output", "compare")
+            },
+        },
+        "results": results,
+    }
+
+
+def key(result):
+    return result["size"], result["backend"], result["operation"]
+
+
+def compare(before_path, after_path):
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+
+    before_results = {key(result): result["seconds"] for result in before["results"]}
+    print(
+        "{:>9} {:>7} {:>20} {:>12} {:>12} {:>8}".format(
+            "entries", "backend", "operation", "before ms", "after ms", "ratio"
+        )
+    )
+    for result in after["results"]:
+        previous = before_results.get(key(result))
+        if previous is None:
+            continue
+        print(
+            "{:>9} {:>7} {:>20} {:>12.3f} {:>12.3f} {:>7.2f}x".format(
+                *key(result),
+                previous * 1000,
+                result["seconds"] * 1000,
+                result["seconds"] / previous if previous else float("inf"),
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10_000])
+    parser.add_argument(
+        "--backends", nargs="+", choices=sorted(BACKENDS), default=sorted(BACKENDS)
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--aliases", type=int, default=2, help="mean per entry")
+    parser.add_argument("--alias-distribution", choices=DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--tags", type=int, default=50, help="number of tags")
+    parser.add_argument("--tags-per-entry", type=int, default=2, help="mean per entry")
+    parser.add_argument("--tag-distribution", choices=DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--tag-popularity", choices=POPULARITIES, default="uniform")
+    parser.add_argument(
+        "--output", help="JSON results file, standard output if omitted"
+    )
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BEFORE", "AFTER"),
+        help="print the ratios between two results files instead of running",
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
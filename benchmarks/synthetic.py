@@ -0,0 +1,109 @@
+import itertools
+import random
+
+from pwdmanager.database import Database, DatabaseEntry
+
+WORDS = [
+    "amazon",
+    "bank",
+    "cloud",
+    "drive",
+    "email",
+    "forum",
+    "github",
+    "gitlab",
+    "home",
+    "insurance",
+    "jira",
+    "kube",
+    "library",
+    "mail",
+    "netflix",
+    "office",
+    "paypal",
+    "router",
+    "server",
+    "travel",
+    "vpn",
+    "wiki",
+]
+
+
+DISTRIBUTIONS = ("fixed", "uniform", "exponential")
+POPULARITIES = ("uniform", "zipf")
+
+
+def draw_count(rng, mean, distribution, maximum):
+    """
+    Number of aliases or tags of an entry: always mean when fixed, uniform between
+    0 and twice the mean, or exponential with that mean, a few entries then
+    having many. Capped at maximum.
+    """
+    if distribution == "fixed" or mean == 0:
+        count = mean
+    elif distribution == "uniform":
+        count = rng.randint(0, 2 * mean)
+    elif distribution == "exponential":
+        count = round(rng.expovariate(1 / mean))
+    else:
+        raise ValueError("unknown distribution " + distribution)
+    return min(count, maximum)
+
+
+def draw_tags(rng, tag_pool, count, cumulative_weights):
+    """
+    Draw count distinct tags, all equally likely when cumulative_weights is None.
+    """
+    if cumulative_weights is None:
+        return set(rng.sample(tag_pool, count))
+
+    tags = set()
+    while len(tags) < count:
+        tags.add(rng.choices(tag_pool, cum_weights=cumulative_weights)[0])
+    return tags
+
+
+def generate_entries(
+    count,
+    seed=0,
+    aliases_per_entry=2,
+    tags_per_entry=2,
+    tags=50,
+    alias_distribution="fixed",
+    tag_distribution="fixed",
+    tag_popularity="uniform",
+):
+    """
+    Deterministically generate count entries with unique names and aliases.
+
+    aliases_per_entry and tags_per_entry are the mean numbers of aliases and
+    tags drawn according to alias_distribution and tag_distribution, entries
+    have at most one alias per word of WORDS. Tags are equally popular, or
+    follow a Zipf law where the n-th tag is n times less frequent than the first.
+    """
+    rng = random.Random(seed)
+    tag_pool = ["tag{}".format(i) for i in range(tags)]
+    cumulative_weights = None
+    if tag_popularity == "zipf":
+        cumulative_weights = list(
+            itertools.accumulate(1 / rank for rank in range(1, tags + 1))
+        )
+    elif tag_popularity != "uniform":
+        raise ValueError("unknown popularity " + tag_popularity)
+
+    for i in range(count):
+        name = "{}-{}-{}".format(rng.choice(WORDS), rng.choice(WORDS), i)
+        entry = DatabaseEntry(name, "login{}".format(i), "pwd{}".format(i))
+        aliases_count = draw_count(
+            rng, aliases_per_entry, alias_distribution, len(WORDS)
+        )
+        entry.aliases = {"{}{}".format(alias, i) for alias in WORDS[:aliases_count]}
+        tags_count = draw_count(rng, tags_per_entry, tag_distribution, tags)
+        entry.tags = draw_tags(rng, tag_pool, tags_count, cumulative_weights)
+        entry.creation_date = "2020-01-01T00:00:00"
+        entry.last_update_date = entry.creation_date
+        yield entry
+
+
+def generate_database(count, **kwargs):
+    return Database({entry.name: entry for entry in generate_entries(count, **kwargs)})
@@ -0,0 +1,357 @@
+"""
+Agent keeping a decrypted database in memory and executing commands sent by the
+command line tool through a Unix socket, so the database is only decrypted once.
+
+Requests and responses are JSON documents, one per line. A request carries the
+class name and the attributes of a command, along with the master password when
+the command line gave one, the response carries either its rendered output or the
+message of the CommandException it raised.
+"""
+
+import hashlib
+import hmac
+import inspect
+import json
+import os
+import select
+import signal
+import socket
+import struct
+import tempfile
+import threading
+import time
+
+from pwdmanager.commands import (
+    AddEntry,
+    CommandException,
+    ListEntries,
+    RemoveEntry,
+    ShowEntry,
+    UpdateEntry,
+    join_output,
+)
+from pwdmanager.database import DataBaseCryptException, DataBaseManager
+
+COMMANDS = {
+    command.__name__: command
+    for command in (AddEntry, ShowEntry, ListEntries, RemoveEntry, UpdateEntry)
+}
+CONNECTION_TIMEOUT = 5
+DEFAULT_IDLE_TIMEOUT = 15 * 60
+DEFAULT_SAVE_DELAY = 2
+# seconds before a save that failed is tried again
+SAVE_RETRY_DELAY = 1
+
+
+class AgentException(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
+
+def get_socket_path(db_path):
+    """
+    Socket of the agent serving db_path, in a directory only the user can access.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtime_dir:
+        runtime_dir = os.path.join(
+            tempfile.gettempdir(), "pwdmanager-{}".format(os.getuid())
+        )
+        os.makedirs(runtime_dir, mode=0o700, exist_ok=True)
+        if os.stat(runtime_dir).st_uid != os.getuid():
+            raise AgentException("{} is not owned by the user".format(runtime_dir))
+
+    db_hash = hashlib.sha256(os.path.realpath(db_path).encode()).hexdigest()
+    return os.path.join(runtime_dir, "pwdmanager-{}.sock".format(db_hash[:16]))
+
+
+def encode_command(command):
+    return {"command": type(command).__name__, "attributes": vars(command)}
+
+
+def decode_command(request):
+    command_type = COMMANDS.get(request.get("command"))
+    if command_type is None:
+        raise AgentException("unknown command {}".format(request.get("command")))
+
+    attributes = request.get("attributes")
+    if not isinstance(attributes, dict):
+        raise AgentException(
+            "no attributes for command {}".format(command_type.__name__)
+        )
+
+    # the command created from its arguments tells the attributes it needs
+    parameters = inspect.signature(command_type).parameters
+    missing = [name for name in parameters if name not in attributes]
+    if missing:
+        raise AgentException("missing attributes {}".format(", ".join(missing)))
+    command = command_type(*(attributes[name] for name in parameters))
+    unknown = attributes.keys() - vars(command).keys()
+    missing = vars(command).keys() - attributes.keys()
+    if unknown or missing:
+        raise AgentException(
+            "unknown attributes {} or missing attributes {}".format(
+                ", ".join(sorted(unknown)), ", ".join(sorted(missing))
+            )
+        )
+    command.__dict__.update(attributes)
+    return command
+
+
+def hash_password(password, salt):
+    return hashlib.sha256(salt + password.encode()).digest()
+
+
+def send_request(socket_path, request):
+    """
+    Return the response of the agent, or None if no agent listens on socket_path.
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            client.connect(socket_path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return None
+
+        client.sendall(json.dumps(request).encode() + b"\n")
+        with client.makefile("rb") as response:
+            line = response.readline()
+    finally:
+        client.close()
+
+    if not line:
+        raise AgentException("the agent closed the connection")
+    return json.loads(line)
+
+
+def execute_in_agent(socket_path, command, password=None):
+    """
+    Execute command in the agent and return its output, or None if no agent is
+    running. The agent rejects the command if password, when given, is not the
+    master password it was started with.
+    """
+    request = encode_command(command)
+    if password is not None:
+        request["password"] = password
+    response = send_request(socket_path, request)
+    if response is None:
+        return None
+    elif "command_error" in response:
+        raise CommandException(response["command_error"])
+    elif "error" in response:
+        raise AgentException(response["error"])
+    else:
+        return response["output"]
+
+
+def stop_agent(socket_path):
+    return send_request(socket_path, {"stop": True}) is not None
+
+
+class Agent:
+    """
+    Serve the database of db_manager until no request came for idle_timeout
+    seconds. Modifications are saved once no other modification happened for
+    save_delay seconds, and when the agent stops. A save that fails is tried again
+    until it succeeds, the agent serving the requests meanwhile and only stopping
+    once the modifications are saved.
+
+    password, when given, is the master password checked against the one sent
+    along with the requests. Only a salted hash of it is kept.
+    """
+
+    def __init__(
+        self,
+        db_manager: DataBaseManager,
+        socket_path,
+        idle_timeout=DEFAULT_IDLE_TIMEOUT,
+        save_delay=DEFAULT_SAVE_DELAY,
+        password=None,
+    ):
+        self.db_manager = db_manager
+        # the searches of the clients make up for building the trigram indexes
+        self.db_manager.keep_search_indexes()
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+        self.save_delay = save_delay
+        self.save_deadline = None
+        self.running = False
+        self.password_salt = os.urandom(16)
+        self.password_hash = (
+            hash_password(password, self.password_salt) if password else None
+        )
+
+    def bind(self):
+        if is_agent_running(self.socket_path):
+            raise AgentException("an agent is already running")
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        previous_umask = os.umask(0o177)
+        try:
+            server.bind(self.socket_path)
+        finally:
+            os.umask(previous_umask)
+        server.listen()
+        return server
+
+    def serve(self, server=None):
+        server = server if server else self.bind()
+        self.running = True
+        in_main_thread = threading.current_thread() is threading.main_thread()
+        if in_main_thread:
+            previous_handler = signal.signal(signal.SIGTERM, self.handle_sigterm)
+        try:
+            idle_deadline = time.monotonic() + self.idle_timeout
+            # when to stop, postponed while the modifications fail to be saved
+            stop_deadline = None
+            while True:
+                now = time.monotonic()
+                if stop_deadline is None and (not self.running or now >= idle_deadline):
+                    stop_deadline = now
+                if stop_deadline is not None and now >= stop_deadline:
+                    if self.save():
+                        break
+                    stop_deadline = self.save_deadline
+                elif self.save_deadline is not None and now >= self.save_deadline:
+                    self.save()
+                    continue
+
+                deadline = idle_deadline if stop_deadline is None else stop_deadline
+                if self.save_deadline is not None:
+                    deadline = min(deadline, self.save_deadline)
+                readable, _, _ = select.select([server], [], [], deadline - now)
+                if readable:
+                    connection, _ = server.accept()
+                    with connection:
+                        self.handle_connection(connection)
+                    idle_deadline = time.monotonic() + self.idle_timeout
+        finally:
+            server.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            if in_main_thread:
+                signal.signal(signal.SIGTERM, previous_handler)
+            self.save()
+
+    def handle_sigterm(self, signum, frame):
+        self.running = False
+
+    def save(self):
+        """
+        Return whether no modification is left to save. When the save fails, the
+        modifications are kept and saved again after SAVE_RETRY_DELAY.
+        """
+        self.save_deadline = None
+        try:
+            self.db_manager.save_db_if_needed()
+        except CommandException:
+            # the changes conflict with the ones saved by another process, the
+            # database was loaded again as that process saved it
+            pass
+        except (DataBaseCryptException, OSError):
+            self.save_deadline = time.monotonic() + SAVE_RETRY_DELAY
+            return False
+        return True
+
+    def refresh(self):
+        """
+        Load the database again if another process, such as batch or import,
+        saved it since the agent loaded it.
+        """
+        try:
+            self.db_manager.refresh_db()
+        except CommandException:
+            # same as in save
+            pass
+
+    def handle_connection(self, connection):
+        connection.settimeout(CONNECTION_TIMEOUT)
+        if not is_same_user(connection):
+            return
+
+        try:
+            with connection.makefile("rb") as request_file:
+                request = json.loads(request_file.readline())
+        except (OSError, ValueError):
+            return
+
+        try:
+            response = self.handle_request(request)
+        except Exception as e:
+            # only fails the request, the agent keeps serving the others
+            response = {"error": "request failed: {!r}".format(e)}
+        try:
+            connection.sendall(json.dumps(response).encode() + b"\n")
+        except OSError:
+            pass
+
+    def handle_request(self, request):
+        if not isinstance(request, dict):
+            return {"error": "a request must be a JSON object"}
+        elif request.get("ping"):
+            return {"output": "pong"}
+        elif request.get("stop"):
+            self.running = False
+            return {"output": "agent stopped"}
+        elif not self.is_password_accepted(request.get("password")):
+            return {"error": "wrong master password"}
+
+        try:
+            command = decode_command(request)
+            self.refresh()
+            output = join_output(self.db_manager.execute(command.check_execute_render))
+        except CommandException as e:
+            return {"command_error": e.msg}
+        except AgentException as e:
+            return {"error": e.msg}
+
+        if self.db_manager.db.modified:
+            self.save_deadline = time.monotonic() + self.save_delay
+        return {"output": output}
+
+    def is_password_accepted(self, password):
+        """
+        Whether password, None when the command line did not give any, is the
+        master password of the agent.
+        """
+        if password is None or self.password_hash is None:
+            return True
+        return isinstance(password, str) and hmac.compare_digest(
+            hash_password(password, self.password_salt), self.password_hash
+        )
+
+
+def is_agent_running(socket_path):
+    try:
+        return send_request(socket_path, {"ping": True}) is not None
+    except (OSError, ValueError, AgentException):
+        return False
+
+
+def is_same_user(connection):
+    if not hasattr(socket, "SO_PEERCRED"):
+        return True
+    credentials = connection.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    _, uid, _ = struct.unpack("3i", credentials)
+    return uid == os.getuid()
+
+
+def detach():
+    """
+    Fork in the background, the parent exits and the child gets its own session
+    with its standard streams redirected to /dev/null.
+    """
+    if os.fork() > 0:
+        os._exit(0)
+    os.setsid()
+    if os.fork() > 0:
+        os._exit(0)
+
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    os.close(devnull)
@@ -0,0 +1,152 @@
+"""
+Apply a stream of commands to a database with a single save. Every line of the
+stream is a JSON object describing one command, for instance:
+
+    {"command": "add", "name": "n", "login": "l", "password": "p", "tags": ["t"]}
+    {"command": "update", "name": "n", "password": "p2", "add_aliases": ["a"]}
+    {"command": "rm", "name": "n"}
+
+The other keys of add are aliases and login_alias, the other keys of update are
+login, login_alias, remove_aliases, add_tags and remove_tags.
+"""
+
+import json
+
+from pwdmanager.commands import AddEntry, CommandException, RemoveEntry, UpdateEntry
+from pwdmanager.database import Database
+
+STRING_FIELDS = ("name", "login", "password", "login_alias")
+LIST_FIELDS = (
+    "aliases",
+    "tags",
+    "add_aliases",
+    "remove_aliases",
+    "add_tags",
+    "remove_tags",
+)
+FIELDS = {
+    "add": {"name", "login", "password", "login_alias", "aliases", "tags"},
+    "update": {
+        "name",
+        "login",
+        "password",
+        "login_alias",
+        "add_aliases",
+        "remove_aliases",
+        "add_tags",
+        "remove_tags",
+    },
+    "rm": {"name"},
+}
+
+
+class BatchException(Exception):
+    def __init__(self, msg, line_number=None):
+        self.msg = (
+            msg if line_number is None else "line {}: {}".format(line_number, msg)
+        )
+        super().__init__(self.msg)
+
+
+def check_record(record):
+    if not isinstance(record, dict):
+        raise BatchException("a record must be a JSON object")
+
+    fields = FIELDS.get(record.get("command"))
+    if fields is None:
+        raise BatchException("unknown command {!r}".format(record.get("command")))
+
+    unknown_fields = set(record) - fields - {"command"}
+    if unknown_fields:
+        raise BatchException(
+            "unknown fields {}".format(", ".join(sorted(unknown_fields)))
+        )
+
+    for field in STRING_FIELDS:
+        if record.get(field) is not None and not isinstance(record[field], str):
+            raise BatchException("{} must be a string".format(field))
+    for field in LIST_FIELDS:
+        value = record.get(field)
+        if value is not None and not (
+            isinstance(value, list) and all(isinstance(item, str) for item in value)
+        ):
+            raise BatchException("{} must be a list of strings".format(field))
+
+
+def create_command(record):
+    check_record(record)
+    if record["command"] == "add":
+        command = AddEntry(
+            record.get("name"),
+            record.get("login"),
+            record.get("password"),
+            record.get("login_alias"),
+        )
+        command.aliases = record.get("aliases") or list()
+        command.tags = record.get("tags") or list()
+    elif record["command"] == "update":
+        command = UpdateEntry(record.get("name"))
+        command.login = record.get("login")
+        command.login_alias = record.get("login_alias")
+        command.pwd = record.get("password")
+        command.add_aliases = record.get("add_aliases") or list()
+        command.rm_aliases = record.get("remove_aliases") or list()
+        command.add_tags = record.get("add_tags") or list()
+        command.rm_tags = record.get("remove_tags") or list()
+    else:
+        command = RemoveEntry(record.get("name"))
+
+    return command
+
+
+def read_commands(lines):
+    """
+    Parse every line before returning, so a malformed record is reported before
+    any command is applied. Blank lines are ignored.
+    """
+    commands = list()
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            commands.append((line_number, create_command(json.loads(line))))
+        except ValueError as e:
+            raise BatchException("invalid JSON: {}".format(e), line_number)
+        except BatchException as e:
+            raise BatchException(e.msg, line_number)
+
+    return commands
+
+
+def apply_commands(database: Database, commands):
+    """
+    Check and execute the commands in order against database and count them by
+    type. On failure the database is left partially modified and must not be
+    saved.
+    """
+    counts: dict = {AddEntry: 0, UpdateEntry: 0, RemoveEntry: 0}
+    for line_number, command in commands:
+        try:
+            command.perform_checks(database)
+            result = command.execute(database)
+        except CommandException as e:
+            raise BatchException(e.msg, line_number)
+
+        if isinstance(command, UpdateEntry) and not result[0]:
+            raise BatchException(
+                "no entry found with name or alias {}".format(result[1]), line_number
+            )
+        elif isinstance(command, RemoveEntry) and not result:
+            raise BatchException(
+                "no entry found with name or alias {}".format(command.name),
+                line_number,
+            )
+        counts[type(command)] += 1
+
+    return counts
+
+
+def render_counts(counts):
+    return "batch applied: {} added, {} updated, {} removed".format(
+        counts[AddEntry], counts[UpdateEntry], counts[RemoveEntry]
+    )
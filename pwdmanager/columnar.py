@@ -0,0 +1,346 @@
+"""
+Database keeping the entries in columns rather than as one object per entry: a
+list per field, indexed by row, the aliases and tags of all the rows being
+flattened in a single list each, with the start and end of the ones of every row
+in arrays. Searches run over the names and aliases, or the tags, of every row
+joined in a single string, so str.find jumps from one matching row to the next
+instead of visiting every entry.
+
+Removed rows are left empty until they outnumber the others, and aliases or tags
+that change are appended to their list, the previous ones being left unused until
+they outnumber the ones in use. The columns are then written again without them.
+"""
+
+import heapq
+import itertools
+from array import array
+from bisect import bisect_right
+from collections.abc import Mapping
+
+from pwdmanager.database import Database, DatabaseEntry, compact_set, intern_set
+from pwdmanager.index import match_score
+
+# separates the texts of the rows joined for a search, none can contain it
+SEPARATOR = "\0"
+
+
+class ColumnarEntries(Mapping):
+    """
+    Entries of a ColumnarDatabase by name, created from the columns when read.
+    """
+
+    def __init__(self, database):
+        self.database = database
+
+    def __getitem__(self, name):
+        return self.database.entry(self.database.rows[name])
+
+    def __iter__(self):
+        return iter(self.database.rows)
+
+    def __len__(self):
+        return len(self.database.rows)
+
+    def values(self):
+        return map(self.database.entry, self.database.rows.values())
+
+
+class ColumnarDatabase(Database):
+    """
+    Same interface as Database. The entries it returns are created from the
+    columns, those found by name or alias being kept so the same object is
+    returned until the entry is removed. Setting an attribute of any of them
+    writes it back to the columns.
+    """
+
+    def init_entries(self, db: dict):
+        self.clear_columns()
+        self.found: dict = dict()
+        for entry in db.values():
+            self.append_row(entry)
+
+    def clear_columns(self):
+        self.names = list()
+        self.logins = list()
+        self.pwds = list()
+        self.login_aliases = list()
+        self.creation_dates = list()
+        self.last_update_dates = list()
+        self.aliases = list()
+        self.alias_starts = array("I")
+        self.alias_ends = array("I")
+        self.tags = list()
+        self.tag_starts = array("I")
+        self.tag_ends = array("I")
+        # row of every name, in database order
+        self.rows = dict()
+        self.alias_index = dict()
+        self.removed_rows = 0
+        # aliases and tags left in their list by the rows that changed them
+        self.unused_aliases = 0
+        self.unused_tags = 0
+        # joined texts of the rows and their offsets, until a row changes
+        self.search_texts = dict()
+
+    @property
+    def db(self):
+        return ColumnarEntries(self)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, item):
+        return self.find(item)
+
+    def __delitem__(self, key):
+        result = self.find(key)
+        if result:
+            row = self.rows.pop(result.name)
+            del self.found[result.name]
+            object.__setattr__(result, "_owner", None)
+            for alias in self.row_aliases(row):
+                if self.alias_index.get(alias, None) == result.name:
+                    del self.alias_index[alias]
+            self.names[row] = None
+            self.unused_aliases += self.alias_ends[row] - self.alias_starts[row]
+            self.unused_tags += self.tag_ends[row] - self.tag_starts[row]
+            self.alias_ends[row] = self.alias_starts[row]
+            self.tag_ends[row] = self.tag_starts[row]
+            self.removed_rows += 1
+            self.changed()
+            self.changeset.record_removed(result.name)
+            self.compact_if_needed()
+        return bool(result)
+
+    def __contains__(self, item):
+        return item in self.rows or item in self.alias_index
+
+    def find(self, item):
+        name = item if item in self.rows else self.alias_index.get(item, None)
+        if name is None:
+            return None
+        entry = self.found.get(name, None)
+        if entry is None:
+            entry = self.found[name] = self.entry(self.rows[name])
+        return entry
+
+    def entry(self, row):
+        entry = self.found.get(self.names[row], None)
+        if entry is not None:
+            return entry
+        entry = DatabaseEntry.from_fields(
+            self.names[row],
+            self.logins[row],
+            self.pwds[row],
+            self.login_aliases[row],
+            self.creation_dates[row],
+            self.last_update_dates[row],
+            self.row_aliases(row),
+            self.row_tags(row),
+        )
+        object.__setattr__(entry, "_owner", self)
+        return entry
+
+    def row_aliases(self, row):
+        start, end = self.alias_starts[row], self.alias_ends[row]
+        return self.aliases[start:end]
+
+    def row_tags(self, row):
+        start, end = self.tag_starts[row], self.tag_ends[row]
+        return self.tags[start:end]
+
+    def entries(self):
+        return map(self.entry, self.rows.values())
+
+    def materialize(self, entry):
+        return entry
+
+    def append_row(self, entry):
+        self.rows[entry.name] = len(self.names)
+        self.names.append(entry.name)
+        for column in (
+            self.logins,
+            self.pwds,
+            self.login_aliases,
+            self.creation_dates,
+            self.last_update_dates,
+        ):
+            column.append(None)
+        for starts, ends in (
+            (self.alias_starts, self.alias_ends),
+            (self.tag_starts, self.tag_ends),
+        ):
+            starts.append(0)
+            ends.append(0)
+        self.write_row(self.rows[entry.name], entry)
+        for alias in entry.aliases:
+            self.alias_index[alias] = entry.name
+
+    def write_row(self, row, entry):
+        self.logins[row] = entry.login
+        self.pwds[row] = entry.pwd
+        self.login_aliases[row] = entry.login_alias
+        self.creation_dates[row] = entry.creation_date
+        self.last_update_dates[row] = entry.last_update_date
+        if compact_set(self.row_aliases(row)) != entry.aliases:
+            self.unused_aliases += self.alias_ends[row] - self.alias_starts[row]
+            self.alias_starts[row] = len(self.aliases)
+            self.aliases.extend(entry.aliases)
+            self.alias_ends[row] = len(self.aliases)
+        if intern_set(self.row_tags(row)) != entry.tags:
+            self.unused_tags += self.tag_ends[row] - self.tag_starts[row]
+            self.tag_starts[row] = len(self.tags)
+            self.tags.extend(entry.tags)
+            self.tag_ends[row] = len(self.tags)
+
+    def changed(self):
+        self.search_texts.clear()
+
+    def compact_if_needed(self):
+        if (
+            self.removed_rows > len(self.rows)
+            or self.unused_aliases * 2 > len(self.aliases)
+            or self.unused_tags * 2 > len(self.tags)
+        ):
+            self.compact()
+
+    def compact(self):
+        """
+        Write the rows again without the removed ones and the unused aliases and
+        tags.
+        """
+        entries = [self.entry(row) for row in self.rows.values()]
+        self.clear_columns()
+        for entry in entries:
+            self.append_row(entry)
+
+    def add_entry(self, entry: DatabaseEntry):
+        row = self.rows.get(entry.name, None)
+        if row is None:
+            self.append_row(entry)
+            self.changeset.record_added(entry.name)
+        else:
+            previous = self.found.pop(entry.name, None)
+            if previous is not None:
+                object.__setattr__(previous, "_owner", None)
+            for alias in self.row_aliases(row):
+                if self.alias_index.get(alias, None) == entry.name:
+                    del self.alias_index[alias]
+            self.write_row(row, entry)
+            for alias in entry.aliases:
+                self.alias_index[alias] = entry.name
+            self.changeset.record_modified(entry.name)
+        object.__setattr__(entry, "_owner", self)
+        self.found[entry.name] = entry
+        self.changed()
+        self.compact_if_needed()
+
+    def mark_modified(self, entry: DatabaseEntry):
+        row = self.rows.get(entry.name, None)
+        if row is not None:
+            self.write_row(row, entry)
+            self.changed()
+            self.compact_if_needed()
+        self.changeset.record_modified(entry.name)
+
+    def build_search_indexes(self):
+        """
+        Searches scan the columns, there are no indexes to build.
+        """
+
+    def search_text(self, texts_of_row):
+        """
+        Texts of every row, removed ones included, joined after a separator each,
+        along with the offset of every row in the result.
+        """
+        texts = self.search_texts.get(texts_of_row, None)
+        if texts is None:
+            rows = [
+                SEPARATOR + SEPARATOR.join(texts_of_row(row))
+                for row in range(len(self.names))
+            ]
+            offsets = array("I", [0])
+            offsets.extend(itertools.accumulate(map(len, rows)))
+            texts = self.search_texts[texts_of_row] = ("".join(rows), offsets)
+        return texts
+
+    def names_and_aliases(self, row):
+        name = self.names[row]
+        return (name, *self.row_aliases(row)) if name is not None else ()
+
+    def scan(self, part, texts_of_row):
+        """
+        Rows, in database order, of which one of texts_of_row contains part.
+        """
+        if SEPARATOR in part:
+            return [
+                row
+                for row in self.rows.values()
+                if self.is_part_contained_in_items(part, texts_of_row(row))
+            ]
+
+        text, offsets = self.search_text(texts_of_row)
+        rows = list()
+        start = text.find(part)
+        while start >= 0:
+            row = bisect_right(offsets, start) - 1
+            rows.append(row)
+            start = text.find(part, offsets[row + 1])
+        return rows
+
+    def matching_rows(self, name_or_alias_part, tag_part=None):
+        rows = None
+        for part, texts_of_row in (
+            (name_or_alias_part, self.names_and_aliases),
+            (tag_part, self.row_tags),
+        ):
+            if not part:
+                continue
+            if rows is None:
+                rows = self.scan(part, texts_of_row)
+            elif len(rows) * 8 < len(self.names):
+                # cheaper to look at the few rows left than to scan them all
+                rows = [
+                    row
+                    for row in rows
+                    if self.is_part_contained_in_items(part, texts_of_row(row))
+                ]
+            else:
+                matching = set(self.scan(part, texts_of_row))
+                rows = [row for row in rows if row in matching]
+        return self.rows.values() if rows is None else rows
+
+    def iter_matching_entries(self, name_or_alias_part, tag_part=None):
+        return map(self.entry, self.matching_rows(name_or_alias_part, tag_part))
+
+    def count_matching_entries(self, name_or_alias_part, tag_part=None):
+        return len(self.matching_rows(name_or_alias_part, tag_part))
+
+    def find_best_matching_entries(self, name_or_alias_part, limit, tag_part=None):
+        rows = self.matching_rows(None, tag_part)
+        containing = set(self.scan(name_or_alias_part, self.names_and_aliases))
+        best = heapq.nlargest(
+            limit,
+            self.score_rows(
+                name_or_alias_part, (row for row in rows if row in containing)
+            ),
+        )
+        # the rows not containing the search only look like it at best
+        if len(best) < limit or best[-1][0] < 1:
+            best = heapq.nlargest(
+                limit,
+                itertools.chain(
+                    best,
+                    self.score_rows(
+                        name_or_alias_part,
+                        (row for row in rows if row not in containing),
+                    ),
+                ),
+            )
+        return [self.entry(row) for _, _, row in best]
+
+    def score_rows(self, name_or_alias_part, rows):
+        for row in rows:
+            score = match_score(name_or_alias_part, self.names_and_aliases(row))
+            if score > 0:
+                yield score, -row, row
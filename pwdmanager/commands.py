@@ -1,8 +1,64 @@
 import datetime
 import io
+import itertools
+import json
+import time
 from abc import ABC, abstractmethod
 
+from pwdmanager import transfer
 from pwdmanager.database import Database, DatabaseEntry
+from pwdmanager.timings import NO_TIMINGS
+
+# entries shown by a fuzzy search unless a limit is given
+DEFAULT_FUZZY_LIMIT = 10
+LIST_FORMATS = ("text", "jsonl", "tsv")
+DEFAULT_LIST_FIELDS = ("name", "login", "password")
+TSV_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def write_output(output, output_file):
+    """
+    Write what a command rendered, either a string or lines produced one at a
+    time, each one followed by a new line.
+    """
+    if isinstance(output, str):
+        output_file.write(output + "\n")
+    else:
+        for line in output:
+            output_file.write(line + "\n")
+
+
+def join_output(output):
+    return output if isinstance(output, str) else "\n".join(output)
+
+
+def timed_lines(lines, timings):
+    """
+    Yield the lines of a generator, the time spent producing them being added up
+    as the render phase inside the phase consuming them.
+    """
+    lines = iter(lines)
+    nanoseconds = 0
+    try:
+        while True:
+            start = time.perf_counter_ns()
+            try:
+                line = next(lines)
+            except StopIteration:
+                return
+            finally:
+                nanoseconds += time.perf_counter_ns() - start
+            yield line
+    finally:
+        timings.add("render", nanoseconds)
+
+
+def tsv_value(value):
+    if value is None:
+        return ""
+    elif isinstance(value, list):
+        value = transfer.LIST_SEPARATOR.join(value)
+    return value.translate(TSV_ESCAPES)
 
 
 class CommandException(Exception):
@@ -23,10 +79,22 @@ class Command(ABC):
     def render(self, to_render):
         pass
 
-    def check_execute_render(self, database: Database):
-        self.perform_checks(database)
-        res = self.execute(database)
-        return self.render(res)
+    def check_execute_render(self, database: Database, timings=None):
+        """
+        timings, when given, records how long each of the three steps takes. The
+        lines rendered one at a time, by ListEntries, are timed as they are
+        consumed, under a render phase inside the phase consuming them.
+        """
+        timings = timings if timings else NO_TIMINGS
+        with timings.phase("checks"):
+            self.perform_checks(database)
+        with timings.phase("execute"):
+            res = self.execute(database)
+        with timings.phase("render"):
+            output = self.render(res)
+        if isinstance(output, str) or timings is NO_TIMINGS:
+            return output
+        return timed_lines(output, timings)
 
 
 class AddEntry(Command):
@@ -106,31 +174,93 @@ class ShowEntry(Command):
 
 
 class ListEntries(Command):
-    def __init__(self, search, tag_part=None):
+    """
+    fuzzy ranks the entries by how well they match search, best first, instead of
+    listing the ones containing it in database order. The first offset entries
+    are skipped and at most limit entries are listed.
+
+    The entries are rendered one at a time, as they are loaded, in output_format:
+    text for people, jsonl or tsv for programs, with the fields of
+    transfer.FIELDS given in fields.
+    """
+
+    def __init__(self, search, tag_part=None, fuzzy=False, limit=None):
         self.search = search
         self.tag_part = tag_part
+        self.fuzzy = fuzzy
+        self.limit = limit
+        self.offset = 0
+        self.output_format = "text"
+        self.fields = list(DEFAULT_LIST_FIELDS)
 
     def perform_checks(self, database: Database):
         if self.tag_part is not None and len(self.tag_part) == 0:
             raise CommandException("cannot search with an empty tag part")
+        if self.fuzzy and not self.search:
+            raise CommandException("cannot rank entries without a search")
+        if self.limit is not None and self.limit < 1:
+            raise CommandException("the limit must be positive")
+        if self.offset < 0:
+            raise CommandException("the offset cannot be negative")
+        if self.output_format not in LIST_FORMATS:
+            raise CommandException("unknown format {}".format(self.output_format))
+        if not self.fields:
+            raise CommandException("at least one field must be listed")
+        for field in self.fields:
+            if field not in transfer.FIELDS:
+                raise CommandException("unknown field {}".format(field))
 
     def execute(self, database: Database):
-        return database.find_matching_entries(self.search, self.tag_part)
+        """
+        Return an iterator loading the entries as they are consumed.
+        """
+        end = self.offset + self.limit if self.limit else None
+        if self.fuzzy:
+            entries = database.find_best_matching_entries(
+                self.search,
+                end if end else self.offset + DEFAULT_FUZZY_LIMIT,
+                self.tag_part,
+            )
+        else:
+            entries = database.iter_matching_entries(self.search, self.tag_part)
+        return itertools.islice(entries, self.offset, end)
 
     def minimal_repr(self, entry: DatabaseEntry):
-        return "name: {}\nlogin: {}\npassword: {}".format(
-            entry.name, entry.login, entry.pwd
+        record = transfer.entry_to_record(entry)
+        return "\n".join(
+            "{}: {}".format(
+                field.replace("_", " "),
+                (
+                    ", ".join(record[field])
+                    if isinstance(record[field], list)
+                    else record[field]
+                ),
+            )
+            for field in self.fields
         )
 
-    def render(self, entry_list: list):
-        if entry_list:
-            repr = io.StringIO()
-            repr.write("\n\n".join(map(self.minimal_repr, entry_list)))
-            res = repr.getvalue()
+    def render(self, entries):
+        """
+        Generate the lines of the output, the entries being consumed one at a
+        time.
+        """
+        if self.output_format == "jsonl":
+            for entry in entries:
+                record = transfer.entry_to_record(entry)
+                yield json.dumps({field: record[field] for field in self.fields})
+        elif self.output_format == "tsv":
+            for entry in entries:
+                record = transfer.entry_to_record(entry)
+                yield "\t".join(tsv_value(record[field]) for field in self.fields)
         else:
-            res = "no match"
-
-        return res
+            matched = False
+            for entry in entries:
+                if matched:
+                    yield ""
+                matched = True
+                yield self.minimal_repr(entry)
+            if not matched:
+                yield "no match"
 
 
 class RemoveEntry(Command):
@@ -181,16 +311,14 @@ class UpdateEntry(Command):
         entry = database[self.name_or_alias]
         if entry:
             for alias_to_add in self.add_aliases:
-                entry.aliases.add(alias_to_add)
+                database.add_alias(entry, alias_to_add)
             for alias_to_rm in self.rm_aliases:
-                if alias_to_rm in entry.aliases:
-                    entry.aliases.remove(alias_to_rm)
+                database.remove_alias(entry, alias_to_rm)
 
             for tag_to_add in self.add_tags:
-                entry.tags.add(tag_to_add)
+                database.add_tag(entry, tag_to_add)
             for tag_to_rm in self.rm_tags:
-                if tag_to_rm in entry.tags:
-                    entry.tags.remove(tag_to_rm)
+                database.remove_tag(entry, tag_to_rm)
 
             if self.pwd:
                 entry.pwd = self.pwd
@@ -201,8 +329,6 @@ class UpdateEntry(Command):
 
             entry.last_update_date = datetime.datetime.now().isoformat()
 
-            database.modified = True
-
             return True, entry.name
         else:
             return False, self.name_or_alias
@@ -0,0 +1,121 @@
+"""
+Compression of the plaintext before it is encrypted. Compressed data starts with
+MAGIC followed by the code of the algorithm, so that it is decompressed whatever
+the algorithm configured, and data without it is read as is:
+
+    MAGIC | algorithm code | compressed data
+
+zlib data is deflated in a gzip container, which gzip.GzipFile decompresses
+from a stream like bz2.BZ2File and lzma.LZMAFile do for the other algorithms.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import zlib
+
+MAGIC = b"PWDZIP"
+HEADER_SIZE = len(MAGIC) + 1
+# raised by the decompressors on corrupted data
+ERRORS = (ValueError, EOFError, OSError, zlib.error, lzma.LZMAError)
+
+
+class Algorithm:
+    def __init__(self, code, levels, default_level, compressor, open_stream):
+        self.code = code
+        self.levels = levels
+        self.default_level = default_level
+        self.compressor = compressor
+        self.open_stream = open_stream
+
+
+ALGORITHMS = {
+    "zlib": Algorithm(
+        1,
+        range(0, 10),
+        6,
+        lambda level: zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS),
+        lambda stream: gzip.GzipFile(fileobj=stream, mode="rb"),
+    ),
+    "bz2": Algorithm(2, range(1, 10), 9, bz2.BZ2Compressor, bz2.BZ2File),
+    "lzma": Algorithm(
+        3,
+        range(0, 10),
+        6,
+        lambda level: lzma.LZMACompressor(preset=level),
+        lzma.LZMAFile,
+    ),
+}
+ALGORITHMS_BY_CODE = {algorithm.code: algorithm for algorithm in ALGORITHMS.values()}
+
+
+def get_algorithm(header: bytes):
+    """
+    Algorithm the data starting with header was compressed with, None if it is
+    not compressed.
+    """
+    if len(header) < HEADER_SIZE or not header.startswith(MAGIC):
+        return None
+    algorithm = ALGORITHMS_BY_CODE.get(header[len(MAGIC)])
+    if algorithm is None:
+        raise ValueError("unknown compression algorithm {}".format(header[len(MAGIC)]))
+    return algorithm
+
+
+def compress_chunks(chunks, name, level):
+    """
+    Yield the compressed data of the chunks of bytes, compressed as they come.
+    """
+    algorithm = ALGORITHMS[name]
+    compressor = algorithm.compressor(level)
+    yield MAGIC + bytes((algorithm.code,))
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def decompress(data: bytes):
+    """
+    Return data decompressed, or data itself if it is not compressed.
+    """
+    algorithm = get_algorithm(data[:HEADER_SIZE])
+    if algorithm is None:
+        return data
+    with algorithm.open_stream(io.BytesIO(data[HEADER_SIZE:])) as stream:
+        return stream.read()
+
+
+class PrefixedReader(io.RawIOBase):
+    """
+    Raw stream reading prefix, then what is left of stream.
+    """
+
+    def __init__(self, prefix, stream):
+        self.prefix = prefix
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.prefix:
+            size = min(len(buffer), len(self.prefix))
+            buffer[:size] = self.prefix[:size]
+            self.prefix = self.prefix[size:]
+            return size
+        return self.stream.readinto(buffer)
+
+
+def open_decompressed(stream):
+    """
+    Return a binary stream of what stream holds decompressed, or of stream itself
+    if it is not compressed.
+    """
+    header = stream.read(HEADER_SIZE)
+    algorithm = get_algorithm(header)
+    if algorithm is None:
+        return io.BufferedReader(PrefixedReader(header, stream))
+    return algorithm.open_stream(stream)
@@ -1,7 +1,23 @@
 import abc
+import contextlib
+import hashlib
+import heapq
+import io
+import itertools
 import json
+import mmap
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+from typing import Optional
 
-import gnupg
+from pwdmanager import binary, compression, journal, segmented, sharded
+from pwdmanager.index import TrigramIndex, match_score
+from pwdmanager.jsonstream import IncrementalObjectReader
+from pwdmanager.locking import NO_LOCK, DatabaseLock
+from pwdmanager.timings import NO_TIMINGS
 
 
 class DataBaseCryptException(Exception):
@@ -9,53 +25,558 @@ class DataBaseCryptException(Exception):
         self.msg = msg
 
 
+def to_bytes(plaintext):
+    return plaintext if isinstance(plaintext, bytes) else plaintext.encode()
+
+
 class SaveAndLoadInterceptor(abc.ABC):
+    """
+    The plaintext saved is either text or bytes, those of the binary format.
+    """
+
+    timings = NO_TIMINGS
+
     @abc.abstractmethod
-    def at_save_time(self, plaintext: str):
+    def at_save_time(self, plaintext):
         pass
 
     @abc.abstractmethod
     def at_load_time(self, loaded_bytes: bytes):
         pass
 
+    def at_load_time_bytes(self, loaded_bytes: bytes):
+        """
+        Same as at_load_time but return the plaintext as bytes, which may be
+        those of the binary format. By default the text of at_load_time is
+        encoded, interceptors able to save bytes override it.
+        """
+        return self.at_load_time(loaded_bytes).encode()
+
+    @contextlib.contextmanager
+    def open_load_stream(self, db_file):
+        """
+        Provide the plaintext of db_file as a binary stream. By default the whole
+        file goes through at_load_time_bytes, interceptors able to stream override
+        it.
+        """
+        yield io.BytesIO(self.at_load_time_bytes(db_file.read()))
+
+    def iter_save(self, chunks):
+        """
+        Yield the bytes saved for the plaintext made of the chunks of text or
+        bytes. By default the whole plaintext goes through at_save_time,
+        interceptors able to stream override it.
+        """
+        yield self.at_save_time(join_chunks(chunks))
+
+    def save_to_stream(self, chunks, out_file):
+        """
+        Write to the binary out_file what is saved for the plaintext made of the
+        chunks of text or bytes.
+        """
+        for data in self.iter_save(chunks):
+            out_file.write(data)
+
 
 class EncodeInterceptor(SaveAndLoadInterceptor):
-    def at_save_time(self, plaintext: str):
-        return plaintext.encode()
+    def at_save_time(self, plaintext):
+        return to_bytes(plaintext)
 
     def at_load_time(self, loaded_bytes: bytes):
         return loaded_bytes.decode()
 
+    def at_load_time_bytes(self, loaded_bytes: bytes):
+        return loaded_bytes
+
+    @contextlib.contextmanager
+    def open_load_stream(self, db_file):
+        yield db_file
+
+    def iter_save(self, chunks):
+        return map(to_bytes, chunks)
+
+
+class CompressInterceptor(SaveAndLoadInterceptor):
+    """
+    Compress the plaintext with algorithm, one of compression.ALGORITHMS, before
+    the next interceptor of a chain encrypts it. Compressed data is recognized on
+    load whatever the algorithm, so with algorithm None nothing is compressed but
+    what was compressed is still decompressed.
+    """
+
+    def __init__(self, algorithm=None, level=None):
+        if algorithm is not None:
+            levels = compression.ALGORITHMS[algorithm].levels
+            if level is None:
+                level = compression.ALGORITHMS[algorithm].default_level
+            elif level not in levels:
+                raise DataBaseCryptException(
+                    "{} compression levels go from {} to {}".format(
+                        algorithm, levels[0], levels[-1]
+                    )
+                )
+        self.algorithm = algorithm
+        self.level = level
+
+    def at_save_time(self, plaintext):
+        return b"".join(self.iter_save([plaintext]))
+
+    def iter_save(self, chunks):
+        chunks = map(to_bytes, chunks)
+        if self.algorithm is None:
+            return chunks
+        return compression.compress_chunks(chunks, self.algorithm, self.level)
+
+    def at_load_time(self, loaded_bytes: bytes):
+        return self.at_load_time_bytes(loaded_bytes).decode()
+
+    def at_load_time_bytes(self, loaded_bytes: bytes):
+        with self.decompression_errors():
+            return compression.decompress(loaded_bytes)
+
+    @contextlib.contextmanager
+    def open_load_stream(self, db_file):
+        with self.decompression_errors():
+            with compression.open_decompressed(db_file) as stream:
+                yield stream
+
+    @staticmethod
+    @contextlib.contextmanager
+    def decompression_errors():
+        try:
+            yield
+        except compression.ERRORS as e:
+            raise DataBaseCryptException("decompression failed: {}".format(e))
+
+
+class InterceptorChain(SaveAndLoadInterceptor):
+    """
+    Interceptors applied one after the other, the first one to the plaintext and
+    the last one writing the file, for instance a CompressInterceptor followed by
+    a crypter. They are applied in reverse order on load. Only the last one is
+    given the database file, the others stream what the next one loads.
+    """
+
+    def __init__(self, interceptors):
+        self.interceptors = list(interceptors)
+        self.timings = NO_TIMINGS
+
+    @property
+    def timings(self):
+        return self._timings
+
+    @timings.setter
+    def timings(self, timings):
+        self._timings = timings
+        for interceptor in self.interceptors:
+            interceptor.timings = timings
+
+    def at_save_time(self, plaintext):
+        for interceptor in self.interceptors:
+            plaintext = interceptor.at_save_time(plaintext)
+        return plaintext
+
+    def at_load_time(self, loaded_bytes: bytes):
+        return self.at_load_time_bytes(loaded_bytes).decode()
+
+    def at_load_time_bytes(self, loaded_bytes: bytes):
+        for interceptor in reversed(self.interceptors):
+            loaded_bytes = interceptor.at_load_time_bytes(loaded_bytes)
+        return loaded_bytes
+
+    @contextlib.contextmanager
+    def open_load_stream(self, db_file):
+        with contextlib.ExitStack() as stack:
+            stream = db_file
+            for interceptor in reversed(self.interceptors):
+                stream = stack.enter_context(interceptor.open_load_stream(stream))
+            yield stream
+
+    def iter_save(self, chunks):
+        for interceptor in self.interceptors:
+            chunks = interceptor.iter_save(chunks)
+        return chunks
+
+    def save_to_stream(self, chunks, out_file):
+        for interceptor in self.interceptors[:-1]:
+            chunks = interceptor.iter_save(chunks)
+        self.interceptors[-1].save_to_stream(chunks, out_file)
+
 
 class PythonGnuPGCrypterInterceptor(SaveAndLoadInterceptor):
-    def __init__(self, passphrase):
+    """
+    gnupg is only imported, and the gpg program only probed, the first time
+    something is encrypted or decrypted with gpg.
+    """
+
+    def __init__(self, passphrase, compress=True):
         self.passphrase = passphrase
-        self.gpg = gnupg.GPG()
+        # off when the plaintext is already compressed
+        self.compress = compress
+        self._gpg = None
+        self.aes_gcm_crypter = None
 
-    def at_save_time(self, plaintext: str):
+    @property
+    def gpg(self):
+        if self._gpg is None:
+            with self.timings.phase("gpg probe"):
+                import gnupg
+
+                self._gpg = gnupg.GPG()
+        return self._gpg
+
+    def at_save_time(self, plaintext):
         return self.encrypt(plaintext)
 
-    def encrypt(self, plaintext: str):
+    def encrypt(self, plaintext):
         result = self.gpg.encrypt(
-            plaintext.encode(), [], passphrase=self.passphrase, symmetric=True
+            to_bytes(plaintext),
+            [],
+            passphrase=self.passphrase,
+            symmetric=True,
+            extra_args=self.compression_args(),
         )
         return result.data
 
+    def compression_args(self):
+        return [] if self.compress else ["--compress-algo", "none"]
+
     def at_load_time(self, loaded_bytes: bytes):
         return self.decrypt(loaded_bytes)
 
+    def at_load_time_bytes(self, loaded_bytes: bytes):
+        return self.decrypt_bytes(loaded_bytes)
+
     def decrypt(self, to_decrypt: bytes):
+        return self.decrypt_bytes(to_decrypt).decode()
+
+    def decrypt_bytes(self, to_decrypt: bytes):
+        if to_decrypt.startswith(AEAD_MAGIC):
+            if self.aes_gcm_crypter is None:
+                self.aes_gcm_crypter = AESGCMCrypterInterceptor(self.passphrase)
+            return self.aes_gcm_crypter.decrypt_bytes(memoryview(to_decrypt))
+
         decrypt = self.gpg.decrypt(to_decrypt, passphrase=self.passphrase)
         if not decrypt.ok:
             raise DataBaseCryptException(decrypt.status)
         else:
-            return decrypt.data.decode()
+            return decrypt.data
+
+    def start_gpg(self, args, stdin, stdout, status_file):
+        """
+        Start a gpg process reading the passphrase from a pipe of its own, so
+        that its standard input is left for the data.
+        """
+        passphrase_fd, passphrase_writer = os.pipe()
+        with os.fdopen(passphrase_writer, "w") as passphrase_pipe:
+            passphrase_pipe.write(self.passphrase + "\n")
+
+        args = ["--passphrase-fd", str(passphrase_fd)] + args
+        if self.gpg.version >= (2, 1):
+            args[0:0] = ["--pinentry-mode", "loopback"]
+
+        try:
+            gpg_args = self.gpg.make_args(args, False)
+            with self.timings.phase("gpg start"):
+                return subprocess.Popen(
+                    gpg_args,
+                    stdin=stdin,
+                    stdout=stdout,
+                    stderr=status_file,
+                    pass_fds=(passphrase_fd,),
+                )
+        finally:
+            os.close(passphrase_fd)
+
+    @contextlib.contextmanager
+    def open_load_stream(self, db_file):
+        """
+        Decrypt db_file with a gpg process reading the file descriptor directly and
+        yield its standard output. gpg only checks the integrity of the data once
+        everything has been read, so the exit status is checked when leaving.
+        """
+        if os.pread(db_file.fileno(), len(AEAD_MAGIC), 0) == AEAD_MAGIC:
+            if self.aes_gcm_crypter is None:
+                self.aes_gcm_crypter = AESGCMCrypterInterceptor(self.passphrase)
+            with self.aes_gcm_crypter.open_load_stream(db_file) as stream:
+                yield stream
+            return
+
+        with tempfile.TemporaryFile() as status_file:
+            process = self.start_gpg(
+                ["--decrypt"], db_file, subprocess.PIPE, status_file
+            )
+            with process.stdout:
+                try:
+                    yield process.stdout
+                finally:
+                    while process.stdout.read(io.DEFAULT_BUFFER_SIZE):
+                        pass
+                    if process.wait() != 0:
+                        raise DataBaseCryptException("decryption failed")
+
+    def save_to_stream(self, chunks, out_file):
+        """
+        Encrypt with a gpg process the chunks written one by one to its standard
+        input, its output going straight to out_file. The output is armored like
+        the one of at_save_time.
+        """
+        with tempfile.TemporaryFile() as status_file:
+            process = self.start_gpg(
+                ["--symmetric", "--armor"] + self.compression_args(),
+                subprocess.PIPE,
+                out_file,
+                status_file,
+            )
+            try:
+                with process.stdin:
+                    for chunk in chunks:
+                        process.stdin.write(to_bytes(chunk))
+            except BrokenPipeError:
+                # gpg stopped early, its exit status tells why
+                pass
+            except BaseException:
+                process.kill()
+                process.wait()
+                raise
+            if process.wait() != 0:
+                raise DataBaseCryptException("encryption failed")
+
+
+AEAD_MAGIC = b"PWDAEAD1"
+AEAD_HEADER = struct.Struct(">8sIII16s12s")
+SCRYPT_LIMITS = (2**20, 32, 16)
+
+
+class AESGCMCrypterInterceptor(SaveAndLoadInterceptor):
+    """
+    Authenticated encryption with AES-256-GCM performed in process, the key being
+    derived from the passphrase with scrypt. Every encrypted blob starts with a
+    header holding the scrypt parameters, the salt and the nonce, which is
+    authenticated along with the ciphertext. Blobs encrypted with gpg can still be
+    decrypted.
+    """
+
+    def __init__(self, passphrase, n=2**15, r=8, p=1):
+        try:
+            from cryptography.exceptions import InvalidTag
+            from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        except ImportError:
+            raise DataBaseCryptException(
+                "the aes-gcm backend requires the cryptography package"
+            )
+
+        self.aesgcm = AESGCM
+        self.invalid_tag = InvalidTag
+        self.passphrase = passphrase
+        self.kdf_params = (n, r, p)
+        self.salt = None
+        self.keys = dict()
+        self.gpg_crypter = None
+
+    def at_save_time(self, plaintext):
+        return self.encrypt(plaintext)
+
+    def at_load_time(self, loaded_bytes: bytes):
+        return self.decrypt(loaded_bytes)
+
+    def derive_key(self, salt, n, r, p):
+        if any(param > limit for param, limit in zip((n, r, p), SCRYPT_LIMITS)):
+            raise DataBaseCryptException("unsupported key derivation parameters")
+
+        cache_key = (self.passphrase, salt, n, r, p)
+        key = self.keys.get(cache_key)
+        if key is None:
+            try:
+                key = hashlib.scrypt(
+                    self.passphrase.encode(),
+                    salt=salt,
+                    n=n,
+                    r=r,
+                    p=p,
+                    maxmem=256 * n * r * p,
+                    dklen=32,
+                )
+            except ValueError as e:
+                raise DataBaseCryptException(str(e))
+            self.keys[cache_key] = key
+
+        return key
+
+    def encrypt(self, plaintext):
+        if self.salt is None:
+            self.salt = os.urandom(16)
+        n, r, p = self.kdf_params
+        nonce = os.urandom(12)
+        header = AEAD_HEADER.pack(AEAD_MAGIC, n, r, p, self.salt, nonce)
+        cipher = self.aesgcm(self.derive_key(self.salt, n, r, p))
+        return header + cipher.encrypt(nonce, to_bytes(plaintext), header)
+
+    def at_load_time_bytes(self, loaded_bytes: bytes):
+        if not loaded_bytes.startswith(AEAD_MAGIC):
+            if self.gpg_crypter is None:
+                self.gpg_crypter = PythonGnuPGCrypterInterceptor(self.passphrase)
+            return self.gpg_crypter.decrypt_bytes(loaded_bytes)
+        return self.decrypt_bytes(memoryview(loaded_bytes))
+
+    def decrypt(self, to_decrypt: bytes):
+        return self.at_load_time_bytes(to_decrypt).decode()
+
+    def decrypt_bytes(self, data: memoryview):
+        """
+        Decrypt data, starting with AEAD_MAGIC, to the plaintext bytes.
+        """
+        if len(data) < AEAD_HEADER.size:
+            raise DataBaseCryptException("truncated data")
+
+        _, n, r, p, salt, nonce = AEAD_HEADER.unpack_from(data)
+        cipher = self.aesgcm(self.derive_key(salt, n, r, p))
+        header_size = AEAD_HEADER.size
+        try:
+            plaintext = cipher.decrypt(nonce, data[header_size:], data[:header_size])
+        except self.invalid_tag:
+            raise DataBaseCryptException("decryption failed")
+
+        # saving again with the same salt reuses the derived key
+        if self.salt is None and (n, r, p) == self.kdf_params:
+            self.salt = salt
+
+        return plaintext
+
+    @contextlib.contextmanager
+    def open_load_stream(self, db_file):
+        """
+        Decrypt db_file mapped in memory rather than read into bytes first.
+        """
+        if os.fstat(db_file.fileno()).st_size < len(AEAD_MAGIC) or (
+            os.pread(db_file.fileno(), len(AEAD_MAGIC), 0) != AEAD_MAGIC
+        ):
+            yield io.BytesIO(self.at_load_time_bytes(db_file.read()))
+            return
+
+        with mmap.mmap(db_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as data:
+                plaintext = self.decrypt_bytes(data)
+        yield io.BytesIO(plaintext)
+
+
+class DetectedCrypterInterceptor(SaveAndLoadInterceptor):
+    """
+    Encrypt with the crypter the data last loaded was encrypted with, gpg until
+    something is loaded, so that saving keeps how an existing database is
+    encrypted. Data encrypted either way is decrypted by its own crypter.
+    """
+
+    def __init__(self, passphrase, compress=True):
+        self.passphrase = passphrase
+        # only applies to gpg, off when the plaintext is already compressed
+        self.compress = compress
+        self.crypter_name = "gpg"
+        self.crypters: dict = dict()
+
+    def get_crypter(self, name):
+        crypter = self.crypters.get(name)
+        if crypter is None:
+            if name == "gpg":
+                crypter = PythonGnuPGCrypterInterceptor(self.passphrase, self.compress)
+            else:
+                crypter = CRYPTERS[name](self.passphrase)
+            crypter.timings = self.timings
+            self.crypters[name] = crypter
+        return crypter
+
+    def detect(self, start: bytes):
+        """
+        Return the crypter of the data starting with start, now used to save.
+        """
+        self.crypter_name = "aes-gcm" if start.startswith(AEAD_MAGIC) else "gpg"
+        return self.get_crypter(self.crypter_name)
+
+    def at_save_time(self, plaintext):
+        return self.get_crypter(self.crypter_name).at_save_time(plaintext)
+
+    def at_load_time(self, loaded_bytes: bytes):
+        return self.detect(loaded_bytes).at_load_time(loaded_bytes)
+
+    def at_load_time_bytes(self, loaded_bytes: bytes):
+        return self.detect(loaded_bytes).at_load_time_bytes(loaded_bytes)
+
+    @contextlib.contextmanager
+    def open_load_stream(self, db_file):
+        start = os.pread(db_file.fileno(), len(AEAD_MAGIC), 0)
+        with self.detect(start).open_load_stream(db_file) as stream:
+            yield stream
+
+    def iter_save(self, chunks):
+        return self.get_crypter(self.crypter_name).iter_save(chunks)
+
+    def save_to_stream(self, chunks, out_file):
+        self.get_crypter(self.crypter_name).save_to_stream(chunks, out_file)
+
+
+@contextlib.contextmanager
+def write_atomically(path):
+    """
+    Yield a temporary file next to path, moved over it once fully written so an
+    interrupted save leaves the previous file untouched. A symbolic link is
+    followed, the file it points to being replaced rather than the link.
+    """
+    path = os.path.realpath(path)
+    directory = os.path.dirname(path)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as tmp_file:
+        try:
+            yield tmp_file
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        except BaseException:
+            tmp_file.close()
+            os.unlink(tmp_file.name)
+            raise
+
+    sharded.replace(tmp_file.name, path)
 
 
 class DBLoader:
-    def __init__(self, db_path: str, interceptor=None):
-        self.db_path = db_path
+    def __init__(
+        self,
+        db_path: str,
+        interceptor=None,
+        streaming=False,
+        journaling=False,
+        binary=False,
+        columnar=False,
+        lazy=False,
+    ):
+        # resolved once, so that a symbolic link to the database is followed by
+        # the saves and the journal and lock of the database are always the same
+        self.db_path = os.path.realpath(db_path)
         self.interceptor = interceptor if interceptor else EncodeInterceptor()
+        self.streaming = streaming
+        self.journaling = journaling
+        # whether the entries of the database file, or of the shards, are
+        # written in the binary format rather than in JSON
+        self.binary = binary
+        # whether a database loaded whole is kept in columns, see ColumnarDatabase
+        self.columnar = columnar
+        # whether the entries of a database loaded whole are kept as RecordStub
+        self.lazy = lazy
+        self.journal_path = journal.get_journal_path(self.db_path)
+        self.journal_length = 0
+        # names of the entries put and deleted by the journal, all of them being
+        # written again by every save to the journal
+        self.journal_put: set = set()
+        self.journal_deleted: set = set()
+        self.db_file_size = 0
+        self.timings = NO_TIMINGS
+
+    @property
+    def timings(self):
+        return self._timings
+
+    @timings.setter
+    def timings(self, timings):
+        self._timings = timings
+        self.interceptor.timings = timings
 
     @staticmethod
     def json_decode_database_entry(o):
@@ -65,33 +586,374 @@ class DBLoader:
             )
             db_entry.creation_date = o["creation_date"]
             db_entry.last_update_date = o["last_update_date"]
-            db_entry.aliases = set(o.get("aliases", set()))
-            db_entry.tags = set(o.get("tags", set()))
+            db_entry.aliases = o.get("aliases", EMPTY_SET)
+            db_entry.tags = o.get("tags", EMPTY_SET)
             return db_entry
         else:
             return o
 
+    def json_decode_record_stub(self, o):
+        if "__db_entry__" in o:
+            return RecordStub(
+                o["name"],
+                o["login"],
+                o["pwd"],
+                o.get("login_alias"),
+                o["creation_date"],
+                o["last_update_date"],
+                o.get("aliases", EMPTY_SET),
+                o.get("tags", EMPTY_SET),
+                self,
+            )
+        else:
+            return o
+
+    def create_record_stub(self, *fields):
+        """
+        Same arguments as DatabaseEntry.from_fields, for binary.decode.
+        """
+        return RecordStub(*fields, self)
+
+    def with_format(self, loader_class, **options):
+        """
+        Loader of the same database, with the same options, writing the format of
+        loader_class. self when it already does and no other option is given.
+        """
+        if type(self) is loader_class and not options:
+            return self
+        db_loader = loader_class(
+            self.db_path,
+            self.interceptor,
+            streaming=self.streaming,
+            journaling=self.journaling,
+            binary=self.binary,
+            columnar=self.columnar,
+            lazy=self.lazy,
+            **options,
+        )
+        db_loader.timings = self.timings
+        return db_loader
+
     def load_db(self):
-        with open(self.db_path, "rb") as db_file:
-            db_dict = json.loads(
-                self.interceptor.at_load_time(db_file.read()),
-                object_hook=self.json_decode_database_entry,
+        loader_class = get_loader_class(self.db_path)
+        if type(self) is not loader_class:
+            raise DataBaseCryptException(
+                "{} is to be loaded by a {}".format(self.db_path, loader_class.__name__)
             )
-        return Database(db_dict)
 
-    def save_db(self, db):
-        to_be_written = self.interceptor.at_save_time(
-            json.dumps(db, cls=DatabaseJSONEncoder)
+        db = self.read_db()
+        self.db_file_size = sharded.get_size(self.db_path)
+        with self.timings.phase("journal replay"):
+            self.replay_journal(db)
+        return db
+
+    def replay_journal(self, db):
+        """
+        Apply the changes saved in the journal since the database file was written.
+        """
+        self.journal_length = 0
+        self.journal_put = set()
+        self.journal_deleted = set()
+        try:
+            journal_file = open(self.journal_path, "rb")
+        except FileNotFoundError:
+            return
+
+        with journal_file:
+            if not journal.is_journal(journal_file):
+                raise DataBaseCryptException(
+                    "{} is not a journal".format(self.journal_path)
+                )
+            self.journal_length = len(journal.MAGIC)
+            for record, self.journal_length in journal.read_records(journal_file):
+                changes = json.loads(
+                    self.interceptor.at_load_time(record),
+                    object_hook=self.json_decode_database_entry,
+                )
+                for entry in changes["put"]:
+                    db.add_entry(entry)
+                    self.forget_saved(entry.name)
+                    self.journal_put.add(entry.name)
+                    self.journal_deleted.discard(entry.name)
+                for name in changes["del"]:
+                    self.forget_saved(name)
+                    self.journal_put.discard(name)
+                    self.journal_deleted.add(name)
+                    if name in db.db:
+                        del db[name]
+        db.mark_saved()
+
+    def read_db(self):
+        """
+        Decrypt and decode the legacy database file, a single blob of every entry.
+        """
+        if self.streaming:
+            return self.load_db_streaming()
+
+        # the interceptor reads the file itself, the plaintext is decoded as bytes
+        # rather than copied to a string first
+        with self.timings.phase("decrypt"):
+            with open(self.db_path, "rb") as db_file:
+                with self.interceptor.open_load_stream(db_file) as stream:
+                    plaintext = stream.read()
+        with self.timings.phase("decode"):
+            self.binary = binary.is_binary(plaintext)
+            db_dict = self.decode_entries(plaintext, self.lazy)
+        del plaintext
+        with self.timings.phase("index"):
+            return self.create_database(db_dict)
+
+    def load_db_streaming(self):
+        """
+        Decrypt and parse the database incrementally, so entries are created one by
+        one without holding the whole plaintext in memory.
+        """
+        with self.timings.phase("decrypt and decode"):
+            with open(self.db_path, "rb") as db_file:
+                with self.interceptor.open_load_stream(db_file) as stream:
+                    prefix = stream.read(len(binary.MAGIC))
+                    self.binary = binary.is_binary(prefix)
+                    if self.binary:
+                        # compact enough to be decoded at once
+                        db_dict = self.decode_entries(prefix + stream.read(), self.lazy)
+                    else:
+                        db_dict = dict(
+                            IncrementalObjectReader(
+                                stream,
+                                object_hook=(
+                                    self.json_decode_record_stub
+                                    if self.lazy
+                                    else self.json_decode_database_entry
+                                ),
+                                prefix=prefix,
+                            )
+                        )
+        with self.timings.phase("index"):
+            return self.create_database(db_dict)
+
+    def create_database(self, entries):
+        """
+        Database of the entries by name, a ColumnarDatabase if self.columnar. The
+        stubs of segmented and sharded databases always go to a Database.
+        """
+        if not self.columnar:
+            return Database(entries)
+
+        from pwdmanager.columnar import ColumnarDatabase
+
+        return ColumnarDatabase(entries)
+
+    def decode_entries(self, plaintext: bytes, lazy=False):
+        """
+        Entries by name of a plaintext in either the binary or the JSON format,
+        RecordStub rather than DatabaseEntry if lazy.
+        """
+        if binary.is_binary(plaintext):
+            return binary.decode(
+                plaintext,
+                self.create_record_stub if lazy else DatabaseEntry.from_fields,
+            )
+        entries = json.loads(
+            plaintext,
+            object_hook=(
+                self.json_decode_record_stub
+                if lazy
+                else self.json_decode_database_entry
+            ),
         )
-        with open(self.db_path, "wb") as db_file:
-            db_file.write(to_be_written)
+        if not isinstance(entries, dict):
+            raise ValueError("not a database")
+        return entries
+
+    def encode_entries(self, entries):
+        """
+        Chunks of the plaintext of entries, in the binary format if self.binary.
+        """
+        if self.binary:
+            return binary.iter_encode(load_entries(entries))
+        return iter_encode(entries)
+
+    def save_db(self, db):
+        """
+        When journaling, only write the changes of db since the database file was
+        written to the journal. The whole database is written when there is no
+        change to save, or once the journal grew larger than the database file.
+        """
+        if (
+            not self.journaling
+            or db.unknown_changes
+            or not db.changeset
+            or not os.path.exists(self.db_path)
+        ):
+            self.write_db(db)
+            return
+
+        self.save_to_journal(db)
+        if self.journal_length > max(journal.COMPACTION_MIN_SIZE, self.db_file_size):
+            self.write_db(db)
+
+    def write_db(self, db):
+        self.write_entries(db)
+        self.db_file_size = sharded.get_size(self.db_path)
+        self.journal_length = 0
+        self.journal_put = set()
+        self.journal_deleted = set()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.journal_path)
+
+    def write_entries(self, db):
+        """
+        Write the legacy database file, a single blob of every entry.
+        """
+        preload_stubs(db.db.values())
+        # encoded, encrypted and written as the chunks are produced
+        with self.timings.phase("write"):
+            with write_atomically(self.db_path) as db_file:
+                self.interceptor.save_to_stream(
+                    self.encode_entries(db.db.values()), db_file
+                )
+
+    def forget_saved(self, name):
+        """
+        Record that the entry with that name is not up to date in the database file
+        anymore, it has to be written again with the whole database.
+        """
+
+    def preload(self, entries):
+        """
+        Prepare the stubs of this loader among entries before they are loaded one
+        by one.
+        """
+
+    def save_to_journal(self, db):
+        changeset = db.changeset
+        for name in changeset.names():
+            self.forget_saved(name)
+        put = changeset.added | changeset.modified
+        self.journal_put = (self.journal_put - changeset.removed) | put
+        self.journal_deleted = (self.journal_deleted - put) | changeset.removed
+        with self.timings.phase("encode"):
+            plaintext = json.dumps(
+                {
+                    "put": [db.db[name] for name in self.journal_put],
+                    "del": list(self.journal_deleted),
+                },
+                cls=DatabaseJSONEncoder,
+            )
+        with self.timings.phase("encrypt"):
+            record = self.interceptor.at_save_time(plaintext)
+        with self.timings.phase("write journal"):
+            self.write_journal(record)
+
+    def write_journal(self, record):
+        """
+        Replace the journal with record alone, it holding every change since the
+        database file was written.
+        """
+        with write_atomically(self.journal_path) as journal_file:
+            journal_file.write(journal.MAGIC)
+            written = journal.write_record(journal_file, record)
+        self.journal_length = len(journal.MAGIC) + written
+
+
+# characters of the chunks the database is encoded to
+ENCODE_CHUNK_SIZE = 64 * 1024
+
+
+def iter_encode(entries):
+    """
+    Yield the JSON object of entries by name, the same text as json.dumps of a
+    Database, in chunks of about ENCODE_CHUNK_SIZE characters. Entries are
+    encoded one at a time by the C encoder, which JSONEncoder.iterencode does not
+    use.
+    """
+    encoder = DatabaseJSONEncoder()
+    encode_string = json.encoder.encode_basestring_ascii
+    chunk = ["{"]
+    size = 1
+    separator = ""
+    for entry in entries:
+        text = separator + encode_string(entry.name) + ": " + encoder.encode(entry)
+        separator = ", "
+        chunk.append(text)
+        size += len(text)
+        if size >= ENCODE_CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk = list()
+            size = 0
+    chunk.append("}")
+    yield "".join(chunk)
+
+
+def get_loader_class(db_path):
+    """
+    DBLoader subclass reading the format of the database at db_path: a directory
+    is sharded and a file either segmented or a legacy single blob, as is a
+    database that does not exist yet.
+    """
+    if os.path.isdir(db_path):
+        from pwdmanager.sharded_loader import ShardedDBLoader
+
+        return ShardedDBLoader
+    try:
+        with open(db_path, "rb") as db_file:
+            is_segmented = segmented.is_segmented(db_file)
+    except FileNotFoundError:
+        return DBLoader
+    if is_segmented:
+        from pwdmanager.segmented_loader import SegmentedDBLoader
+
+        return SegmentedDBLoader
+    return DBLoader
+
+
+def create_db_loader(db_path, interceptor=None, **options):
+    """
+    Loader of the database at db_path, of the class reading its format.
+    """
+    return get_loader_class(db_path)(db_path, interceptor, **options)
+
+
+def preload_stubs(entries):
+    """
+    Let the loader of every stub among entries prepare them before they are loaded
+    one by one, such as a ShardedDBLoader decrypting their shards in parallel.
+    """
+    entries = list(entries)
+    loaders = {
+        id(entry.loader): entry.loader
+        for entry in entries
+        if isinstance(entry, EntryStub)
+    }
+    for loader in loaders.values():
+        loader.preload(entries)
+
+
+def join_chunks(chunks):
+    chunks = list(chunks)
+    if chunks and isinstance(chunks[0], bytes):
+        return b"".join(chunks)
+    return "".join(chunks)
+
+
+def load_entries(entries):
+    """
+    Yield entries, loading the stubs lacking fields. RecordStub have them all.
+    """
+    for entry in entries:
+        if isinstance(entry, EntryStub) and not isinstance(entry, RecordStub):
+            entry = entry.load()
+        yield entry
 
 
 class DatabaseJSONEncoder(json.JSONEncoder):
     def default(self, o):
         if isinstance(o, Database):
             return o.db
-        elif isinstance(o, DatabaseEntry):
+        elif isinstance(o, EntryStub) and not isinstance(o, RecordStub):
+            return self.default(o.load())
+        elif isinstance(o, (DatabaseEntry, RecordStub)):
+            # a RecordStub is written from its fields, no entry being created
             res = {
                 "__db_entry__": True,
                 "name": o.name,
@@ -113,21 +975,163 @@ class DatabaseJSONEncoder(json.JSONEncoder):
 
 
 class DataBaseManager:
-    def __init__(self, db_loader: DBLoader):
+    """
+    timings, when given, records how long loading and saving take, phase by
+    phase.
+
+    lock, when given, is the DatabaseLock shared with the other processes using
+    the database. The changes made through execute are then applied again to the
+    database saved by another process since it was loaded, instead of
+    overwriting it.
+    """
+
+    def __init__(self, db_loader: DBLoader, timings=None, lock=None):
         self.db_loader = db_loader
         self.db = None
+        self.timings = timings if timings else NO_TIMINGS
+        self.db_loader.timings = self.timings
+        self.lock = lock if lock else NO_LOCK
+        # generation of the database loaded, None if it was not loaded
+        self.generation = None
+        # functions that modified the database since it was last saved
+        self.pending: list = list()
+        self.conflicts = 0
+        # whether the trigram indexes are built after every load
+        self.search_indexes = False
+
+    def keep_search_indexes(self):
+        """
+        Build the trigram indexes of the database, now and after every load, for
+        the processes serving many searches. A single search scans the entries
+        faster than the indexes are built.
+        """
+        self.search_indexes = True
+        if self.db is not None:
+            self.db.build_search_indexes()
 
     def init_db(self):
-        self.db = Database(dict())
-        self.db_loader.save_db(self.db)
+        with self.lock.exclusive():
+            if os.path.exists(self.db_loader.db_path):
+                # created by another process in the meantime
+                self.read_db()
+                return self.db
+
+            self.db = self.db_loader.create_database(dict())
+            if self.search_indexes:
+                self.db.build_search_indexes()
+            with self.timings.phase("init"):
+                self.db_loader.save_db(self.db)
+            self.generation = self.lock.increment_generation()
         return self.db
 
     def load_db(self):
-        self.db = self.db_loader.load_db()
+        with self.lock.shared():
+            self.read_db()
         return self.db
 
-    def save_db(self):
-        self.db_loader.save_db(self.db)
+    def read_db(self):
+        # the database may have been migrated to another format in the meantime
+        self.db_loader = self.db_loader.with_format(
+            get_loader_class(self.db_loader.db_path)
+        )
+        self.generation = self.lock.generation()
+        with self.timings.phase("load"):
+            self.db = self.db_loader.load_db()
+        if self.search_indexes:
+            with self.timings.phase("search indexes"):
+                self.db.build_search_indexes()
+        self.pending = list()
+
+    def execute(self, apply):
+        """
+        Call apply with the database and return its result. apply is remembered
+        until the database is saved if it modified the database.
+        """
+        recorded = self.db.changeset.recorded
+        unknown_changes = self.db.unknown_changes
+        result = apply(self.db)
+        if self.db.changeset.recorded > recorded or (
+            self.db.unknown_changes and not unknown_changes
+        ):
+            self.pending.append(apply)
+        return result
+
+    def saved_by_another_process(self):
+        """
+        To be called while holding the lock.
+        """
+        return self.generation is not None and self.lock.generation() != self.generation
+
+    def read_db_again(self):
+        """
+        Load the database saved by another process and apply the pending changes
+        to it. Should one of them fail, its exception is raised and the database is
+        left as the other process saved it.
+        """
+        pending = self.pending
+        self.read_db()
+        try:
+            for apply in pending:
+                self.execute(apply)
+        except BaseException:
+            self.read_db()
+            raise
+
+    def refresh_db(self):
+        """
+        Load the database again, as read_db_again does, if another process saved
+        it since it was loaded. Return whether it was loaded again.
+        """
+        with self.lock.shared():
+            if not self.saved_by_another_process():
+                return False
+            self.read_db_again()
+        return True
+
+    def save_db(self, db_loader=None):
+        """
+        If another process saved the database since it was loaded, it is loaded
+        again and the pending changes applied to it before saving, see
+        read_db_again. When db_loader is given, every entry is then written in its
+        format and db_loader kept for the next loads and saves.
+        """
+        with self.lock.exclusive():
+            if self.saved_by_another_process():
+                self.conflicts += 1
+                self.read_db_again()
+            if db_loader is not None:
+                self.db_loader = db_loader
+                self.db.modified = True
+
+            with self.timings.phase("save"):
+                self.db_loader.save_db(self.db)
+            self.generation = self.lock.increment_generation()
+        self.db.mark_saved()
+        self.pending = list()
+
+    def migrate(self, to_segmented: bool, shards=0, to_binary=None):
+        """
+        Write the loaded database again, either in the segmented or in the legacy
+        single blob format, or as a directory of that many shards when shards is
+        positive. The entries of the legacy file or of the shards are serialized
+        in the binary format or in JSON depending on to_binary, or as they were
+        when it is None.
+        """
+        if shards > 0:
+            from pwdmanager.sharded_loader import ShardedDBLoader
+
+            db_loader = self.db_loader.with_format(ShardedDBLoader, shards=shards)
+        elif to_segmented:
+            from pwdmanager.segmented_loader import SegmentedDBLoader
+
+            db_loader = self.db_loader.with_format(SegmentedDBLoader)
+        else:
+            db_loader = self.db_loader.with_format(DBLoader)
+        if to_binary is not None:
+            db_loader.binary = to_binary
+        # every segment or shard is written again, in the new serialization and
+        # with the current interceptor
+        self.save_db(db_loader)
 
     def save_db_if_needed(self):
         saved = False
@@ -138,62 +1142,609 @@ class DataBaseManager:
         return saved
 
 
-def create_db_manager(db_path, db_password):
+CRYPTERS = {
+    "gpg": PythonGnuPGCrypterInterceptor,
+    "aes-gcm": AESGCMCrypterInterceptor,
+}
+
+
+def create_interceptor(passphrase, crypter=None, compression=None, level=None):
+    """
+    Chain compressing the plaintext with the compression algorithm, if any, then
+    encrypting it with the crypter. Compressed databases are decompressed on load
+    even without compression. Without crypter, the database is encrypted as it
+    was when loaded, with gpg if it is new.
+    """
+    if crypter is None:
+        encrypter = DetectedCrypterInterceptor(passphrase, compress=compression is None)
+    elif crypter == "gpg":
+        # gpg compresses by default, in vain once the plaintext is compressed
+        encrypter = PythonGnuPGCrypterInterceptor(
+            passphrase, compress=compression is None
+        )
+    else:
+        encrypter = CRYPTERS[crypter](passphrase)
+    return InterceptorChain([CompressInterceptor(compression, level), encrypter])
+
+
+def create_db_manager(
+    db_path,
+    db_password,
+    streaming=False,
+    crypter=None,
+    journaling=True,
+    timings=None,
+    compression=None,
+    compression_level=None,
+    columnar=False,
+    lazy=False,
+):
+    # new databases are binary, the format of an existing one is kept on load as
+    # is its crypter unless one is given
     return DataBaseManager(
-        DBLoader(db_path, interceptor=PythonGnuPGCrypterInterceptor(db_password))
+        create_db_loader(
+            db_path,
+            interceptor=create_interceptor(
+                db_password, crypter, compression, compression_level
+            ),
+            streaming=streaming,
+            journaling=journaling,
+            binary=True,
+            columnar=columnar,
+            lazy=lazy,
+        ),
+        timings=timings,
+        lock=DatabaseLock(db_path),
     )
 
 
+EMPTY_SET: frozenset = frozenset()
+
+
+def compact_set(items):
+    """
+    Return items as a frozenset, every empty set being the same shared instance.
+    """
+    return frozenset(items) if items else EMPTY_SET
+
+
+def intern_set(items):
+    """
+    Same as compact_set but also interns the strings, for values such as tags
+    that are repeated across many entries.
+    """
+    return frozenset(map(sys.intern, items)) if items else EMPTY_SET
+
+
 class DatabaseEntry:
+    """
+    Entries are slotted and their aliases and tags are frozensets, so they must be
+    reassigned rather than mutated in place. Tags are interned since the same few
+    tags are shared by many entries, aliases are unique so they are not.
+
+    Setting an attribute of an entry that belongs to a database marks it modified
+    in that database, the aliases and tags assigned being indexed by it in place of
+    the previous ones.
+    """
+
+    __slots__ = (
+        "_owner",
+        "name",
+        "login",
+        "login_alias",
+        "pwd",
+        "_aliases",
+        "_tags",
+        "creation_date",
+        "last_update_date",
+    )
+    _owner: "Optional[Database]"
+
     def __init__(self, name, login, pwd, login_alias=None):
+        object.__setattr__(self, "_owner", None)
         self.name = name
         self.login = login
         self.login_alias = login_alias
         self.pwd = pwd
-        self.aliases = set()
-        self.tags = set()
+        self._aliases = EMPTY_SET
+        self._tags = EMPTY_SET
         self.creation_date = None
         self.last_update_date = None
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if self._owner is not None and name != "_owner":
+            self._owner.mark_modified(self)
+
+    @classmethod
+    def from_fields(
+        cls,
+        name,
+        login,
+        pwd,
+        login_alias,
+        creation_date,
+        last_update_date,
+        aliases,
+        tags,
+    ):
+        """
+        Create an entry bypassing __setattr__, for the loaders.
+        """
+        entry = cls.__new__(cls)
+        set_slot = object.__setattr__
+        set_slot(entry, "_owner", None)
+        set_slot(entry, "name", name)
+        set_slot(entry, "login", login)
+        set_slot(entry, "login_alias", login_alias)
+        set_slot(entry, "pwd", pwd)
+        set_slot(entry, "_aliases", compact_set(aliases))
+        set_slot(entry, "_tags", intern_set(tags))
+        set_slot(entry, "creation_date", creation_date)
+        set_slot(entry, "last_update_date", last_update_date)
+        return entry
+
+    @property
+    def aliases(self):
+        return self._aliases
+
+    @aliases.setter
+    def aliases(self, aliases):
+        previous = self._aliases
+        self._aliases = compact_set(aliases)
+        if self._owner is not None:
+            self._owner.reindex_aliases(self, previous)
+
+    @property
+    def tags(self):
+        return self._tags
+
+    @tags.setter
+    def tags(self, tags):
+        previous = self._tags
+        self._tags = intern_set(tags)
+        if self._owner is not None:
+            self._owner.reindex_tags(self, previous)
+
+
+class EntryStub:
+    """
+    Entry of a segmented database that has not been decrypted yet. Its name,
+    aliases and tags come from the header, the other fields stay in its segment.
+    """
+
+    __slots__ = ("name", "aliases", "tags", "offset", "length", "loader")
+
+    def __init__(self, name, aliases, tags, offset, length, loader: DBLoader):
+        self.name = name
+        self.aliases = compact_set(aliases)
+        self.tags = intern_set(tags)
+        self.offset = offset
+        self.length = length
+        self.loader = loader
+
+    def load(self):
+        return self.loader.load_segment(self)
+
+
+class RecordStub(EntryStub):
+    """
+    Entry of a database loaded lazily, its fields being kept as they were decoded.
+    A DatabaseEntry is only created when the entry is accessed, an entry left
+    untouched being saved again from its fields.
+    """
+
+    __slots__ = ("login", "pwd", "login_alias", "creation_date", "last_update_date")
+
+    def __init__(
+        self,
+        name,
+        login,
+        pwd,
+        login_alias,
+        creation_date,
+        last_update_date,
+        aliases,
+        tags,
+        loader: DBLoader,
+    ):
+        super().__init__(name, aliases, tags, None, None, loader)
+        self.login = login
+        self.pwd = pwd
+        self.login_alias = login_alias
+        self.creation_date = creation_date
+        self.last_update_date = last_update_date
+
+    def load(self):
+        return DatabaseEntry.from_fields(
+            self.name,
+            self.login,
+            self.pwd,
+            self.login_alias,
+            self.creation_date,
+            self.last_update_date,
+            self.aliases,
+            self.tags,
+        )
+
+
+class Changeset:
+    """
+    Names of the entries added, modified and removed since the last save. An entry
+    added then modified stays added, an entry added then removed is forgotten and
+    an entry removed then added again is modified.
+    """
+
+    def __init__(self):
+        self.added = set()
+        self.modified = set()
+        self.removed = set()
+        # number of changes recorded, even those not changing the sets
+        self.recorded = 0
+
+    def __bool__(self):
+        return bool(self.added or self.modified or self.removed)
+
+    def names(self):
+        return self.added | self.modified | self.removed
+
+    def record_added(self, name):
+        self.recorded += 1
+        if name in self.removed:
+            self.removed.discard(name)
+            self.modified.add(name)
+        else:
+            self.added.add(name)
+
+    def record_modified(self, name):
+        self.recorded += 1
+        if name not in self.added:
+            self.modified.add(name)
+
+    def record_removed(self, name):
+        self.recorded += 1
+        if name in self.added:
+            self.added.discard(name)
+        else:
+            self.modified.discard(name)
+            self.removed.add(name)
+
+
+# entries whose stubs are loaded at once before the first one is needed
+LOAD_AHEAD_BATCH = 8
+
+
+def load_ahead(entries):
+    """
+    Yield entries, having the loader of their stubs load them ahead in batches,
+    each twice as large as the previous one, so that a sharded database decrypts
+    the shards holding a batch in parallel while the first entries still come
+    quickly.
+    """
+    entries = iter(entries)
+    size = LOAD_AHEAD_BATCH
+    while True:
+        batch = list(itertools.islice(entries, size))
+        if not batch:
+            return
+        for entry in batch:
+            if isinstance(entry, EntryStub):
+                entry.loader.preload(batch)
+                break
+        yield from batch
+        size *= 2
+
 
 class Database:
     def __init__(self, db: dict = None):
-        self.db = db if db is not None else dict()
-        self.modified = False
+        self.alias_index: dict = dict()
+        # trigram indexes, built by the first search needing them
+        self.name_index = None
+        self.tag_index = None
+        self.positions: dict = dict()
+        self.next_position = 0
+        self.changeset = Changeset()
+        # set when the database changed without the changeset knowing how
+        self.unknown_changes = False
+        self.init_entries(db if db is not None else dict())
+
+    def init_entries(self, db: dict):
+        self.db = db
+        for entry in self.db.values():
+            self.index_entry(entry)
 
     def __len__(self):
         return len(self.db)
 
     def __getitem__(self, item):
-        result = self.db.get(item, None)
-
-        if result is None:
-            for entry in self.db.values():
-                if item in entry.aliases:
-                    result = entry
-                    break
-
-        return result
+        result = self.find(item)
+        return self.materialize(result) if result is not None else None
 
     def __delitem__(self, key):
-        result = self.__getitem__(key)
+        result = self.find(key)
         if result:
+            self.unindex_entry(result)
             self.db.__delitem__(result.name)
-            self.modified = True
+            self.changeset.record_removed(result.name)
         return bool(result)
 
     def __contains__(self, item):
-        return self.__getitem__(item) is not None
+        return item in self.db or item in self.alias_index
+
+    def find(self, item):
+        """
+        Look an entry up by name or alias without loading it if it is a stub.
+        """
+        result = self.db.get(item, None)
+
+        if result is None:
+            name = self.alias_index.get(item, None)
+            if name is not None:
+                result = self.db.get(name, None)
+
+        return result
+
+    def entries(self):
+        """
+        Iterate over the entries, loading stubs without keeping them loaded.
+        """
+        for entry in load_ahead(self.db.values()):
+            yield entry.load() if isinstance(entry, EntryStub) else entry
+
+    def materialize(self, entry):
+        if isinstance(entry, EntryStub):
+            entry = entry.load()
+            entry._owner = self
+            self.db[entry.name] = entry
+        return entry
 
     def add_entry(self, entry: DatabaseEntry):
+        previous = self.db.get(entry.name, None)
+        if previous is not None:
+            self.unindex_entry(previous)
         self.db[entry.name] = entry
-        self.modified = True
+        self.index_entry(entry)
+        if previous is not None:
+            self.changeset.record_modified(entry.name)
+        else:
+            self.changeset.record_added(entry.name)
+
+    def mark_modified(self, entry: DatabaseEntry):
+        self.changeset.record_modified(entry.name)
+
+    def mark_saved(self):
+        self.changeset = Changeset()
+        self.unknown_changes = False
+
+    @property
+    def modified(self):
+        return self.unknown_changes or bool(self.changeset)
+
+    @modified.setter
+    def modified(self, modified):
+        if modified:
+            self.unknown_changes = True
+        else:
+            self.mark_saved()
+
+    def add_alias(self, entry: DatabaseEntry, alias):
+        if alias not in entry.aliases:
+            entry.aliases = entry.aliases | {alias}
+        # the alias of another entry stays its own, UpdateEntry adds then removes
+        # an alias both added and removed without checking it
+        self.alias_index.setdefault(alias, entry.name)
+        self.mark_modified(entry)
+
+    def remove_alias(self, entry: DatabaseEntry, alias):
+        if alias in entry.aliases:
+            entry.aliases = entry.aliases - {alias}
+            self.mark_modified(entry)
+
+    def add_tag(self, entry: DatabaseEntry, tag):
+        if tag not in entry.tags:
+            entry.tags = entry.tags | {tag}
+        self.mark_modified(entry)
+
+    def remove_tag(self, entry: DatabaseEntry, tag):
+        if tag in entry.tags:
+            entry.tags = entry.tags - {tag}
+            self.mark_modified(entry)
+
+    def reindex_aliases(self, entry: DatabaseEntry, previous):
+        """
+        Index the aliases of entry, one of its own, in place of the previous ones.
+        """
+        for alias in previous - entry.aliases:
+            if self.alias_index.get(alias, None) == entry.name:
+                del self.alias_index[alias]
+            if self.name_index is not None:
+                self.name_index.remove(entry.name, alias)
+        for alias in entry.aliases - previous:
+            self.alias_index.setdefault(alias, entry.name)
+            if self.name_index is not None:
+                self.name_index.add(entry.name, alias)
+
+    def reindex_tags(self, entry: DatabaseEntry, previous):
+        """
+        Index the tags of entry, one of its own, in place of the previous ones.
+        """
+        if self.tag_index is not None:
+            for tag in previous - entry.tags:
+                self.tag_index.remove(entry.name, tag)
+            for tag in entry.tags - previous:
+                self.tag_index.add(entry.name, tag)
+
+    def index_entry(self, entry: DatabaseEntry):
+        if isinstance(entry, DatabaseEntry):
+            entry._owner = self
+        self.positions[entry.name] = self.next_position
+        self.next_position += 1
+        for alias in entry.aliases:
+            self.alias_index[alias] = entry.name
+        if self.name_index is not None:
+            self.add_to_search_indexes(entry)
+
+    def unindex_entry(self, entry: DatabaseEntry):
+        if isinstance(entry, DatabaseEntry) and entry._owner is self:
+            entry._owner = None
+        del self.positions[entry.name]
+        for alias in entry.aliases:
+            if self.alias_index.get(alias, None) == entry.name:
+                del self.alias_index[alias]
+        if self.name_index is not None:
+            self.name_index.remove(entry.name, entry.name)
+            for alias in entry.aliases:
+                self.name_index.remove(entry.name, alias)
+            for tag in entry.tags:
+                self.tag_index.remove(entry.name, tag)
+
+    def add_to_search_indexes(self, entry):
+        self.name_index.add(entry.name, entry.name)
+        for alias in entry.aliases:
+            self.name_index.add(entry.name, alias)
+        for tag in entry.tags:
+            self.tag_index.add(entry.name, tag)
+
+    def build_search_indexes(self):
+        """
+        Build the trigram indexes, kept up to date from then on. Searches scan
+        every entry until they are built, which is faster than building them for
+        the single search of a command, see DataBaseManager.keep_search_indexes.
+        """
+        if self.name_index is None:
+            self.name_index = TrigramIndex()
+            self.tag_index = TrigramIndex()
+            for entry in self.db.values():
+                self.add_to_search_indexes(entry)
 
     def find_matching_entries(self, name_or_alias_part, tag_part=None):
-        return self.filter_with_tag_part(
+        return list(self.iter_matching_entries(name_or_alias_part, tag_part))
+
+    def iter_matching_entries(self, name_or_alias_part, tag_part=None):
+        """
+        Yield the matching entries in database order, each one being loaded only
+        when reached.
+        """
+        entries = self.filter_with_tag_part(
             tag_part,
-            self.filter_with_name_or_alias_part(name_or_alias_part, self.db.values()),
+            self.filter_with_name_or_alias_part(
+                name_or_alias_part,
+                self.find_candidate_entries(name_or_alias_part, tag_part),
+            ),
         )
+        for entry in load_ahead(entries):
+            yield self.materialize(entry)
+
+    def count_matching_entries(self, name_or_alias_part, tag_part=None):
+        """
+        Number of the entries find_matching_entries returns, without loading any.
+        """
+        entries = self.filter_with_tag_part(
+            tag_part,
+            self.filter_with_name_or_alias_part(
+                name_or_alias_part,
+                self.find_candidate_entries(name_or_alias_part, tag_part),
+            ),
+        )
+        return sum(1 for _ in entries)
+
+    def find_best_matching_entries(self, name_or_alias_part, limit, tag_part=None):
+        """
+        Rank the entries by how well their name or best alias matches
+        name_or_alias_part, see match_score, and return the limit best ones, best
+        first. Entries ranked equally are kept in database order and only the
+        returned entries are loaded.
+        """
+        if self.name_index is None:
+            best = heapq.nlargest(
+                limit,
+                self.score_entries(
+                    name_or_alias_part,
+                    self.filter_with_tag_part(tag_part, self.db.values()),
+                ),
+            )
+            best = [entry for _, _, entry in best]
+            return [self.materialize(entry) for entry in load_ahead(best)]
+
+        tag_names = self.tag_index.candidates(tag_part) if tag_part else None
+        containing = self.name_index.candidates(name_or_alias_part)
+        best = heapq.nlargest(
+            limit,
+            self.score_entries(
+                name_or_alias_part,
+                self.filter_with_tag_part(
+                    tag_part, self.select_entries(containing, tag_names)
+                ),
+            ),
+        )
+
+        # entries lacking trigrams of the search cannot contain it, they are only
+        # looked at when the ones containing it are not enough
+        if containing is not None and (len(best) < limit or best[-1][0] < 1):
+            looking_like = self.name_index.neighbours(name_or_alias_part) - containing
+            best = heapq.nlargest(
+                limit,
+                itertools.chain(
+                    best,
+                    self.score_entries(
+                        name_or_alias_part,
+                        self.filter_with_tag_part(
+                            tag_part, self.select_entries(looking_like, tag_names)
+                        ),
+                    ),
+                ),
+            )
+
+        best = [entry for _, _, entry in best]
+        return [self.materialize(entry) for entry in load_ahead(best)]
+
+    def select_entries(self, names, tag_names):
+        """
+        Entries both in names and tag_names, None standing for all the entries.
+        """
+        if names is None:
+            names = tag_names
+        elif tag_names is not None:
+            names = names & tag_names
+        return self.db.values() if names is None else (self.db[name] for name in names)
+
+    def score_entries(self, name_or_alias_part, entries):
+        """
+        Yield the score, opposite position and entry of the entries matching
+        name_or_alias_part. Positions are unique so entries are never compared.
+        """
+        for entry in entries:
+            score = match_score(name_or_alias_part, (entry.name, *entry.aliases))
+            if score > 0:
+                yield score, -self.positions[entry.name], entry
+
+    def find_candidate_entries(self, name_or_alias_part, tag_part=None):
+        """
+        Use the trigram indexes, if built, to narrow down the entries that may
+        match, in database order. The candidates still have to be filtered.
+        """
+        if self.name_index is None:
+            return self.db.values()
+
+        candidates = None
+        for index, part in (
+            (self.name_index, name_or_alias_part),
+            (self.tag_index, tag_part),
+        ):
+            if part:
+                names = index.candidates(part)
+                if names is not None:
+                    candidates = names if candidates is None else candidates & names
+
+        if candidates is None:
+            return self.db.values()
+        elif len(candidates) * 4 > len(self.db):
+            return [entry for name, entry in self.db.items() if name in candidates]
+        else:
+            return [
+                self.db[name]
+                for name in sorted(candidates, key=self.positions.__getitem__)
+            ]
 
     @staticmethod
     def filter_with_name_or_alias_part(name_or_alias_part, entries):
@@ -0,0 +1,115 @@
+GRAM_SIZE = 3
+# trigram similarity below which a string is not considered to look like a search
+MIN_SIMILARITY = 0.3
+
+
+def trigrams(text: str):
+    return {
+        text[start:end] for start, end in enumerate(range(GRAM_SIZE, len(text) + 1))
+    }
+
+
+def similarity(part: str, text: str):
+    """
+    Share of the trigrams of part and text that they have in common, from 0 to 1.
+    """
+    part_grams, text_grams = trigrams(part), trigrams(text)
+    if not part_grams or not text_grams:
+        return 0.0
+    common = len(part_grams & text_grams)
+    return common / (len(part_grams) + len(text_grams) - common)
+
+
+def match_score(part: str, texts):
+    """
+    How well the best of texts matches part: 3 if it is part, between 2 and 3 if
+    it starts with part, between 1 and 2 if it contains it, the closer to the
+    upper bound the larger the share of the text part covers, and its similarity
+    with part otherwise. 0 if no text looks like part at all.
+    """
+    score = 0.0
+    for text in texts:
+        if text.startswith(part):
+            score = max(score, 2 + len(part) / len(text))
+        elif part in text:
+            score = max(score, 1 + len(part) / len(text))
+    if score:
+        return score
+
+    # similarities are below 1, only needed when no text contains part
+    for text in texts:
+        score = max(score, similarity(part, text))
+    return score if score >= MIN_SIMILARITY else 0.0
+
+
+class TrigramIndex:
+    """
+    Inverted index from trigrams to the keys of the strings containing them.
+
+    Several strings can be indexed under the same key (a name and its aliases for
+    instance), so each posting counts how many of them contain the trigram.
+    """
+
+    def __init__(self):
+        self.postings = dict()
+
+    def add(self, key, text: str):
+        for gram in trigrams(text):
+            posting = self.postings.setdefault(gram, dict())
+            posting[key] = posting.get(key, 0) + 1
+
+    def remove(self, key, text: str):
+        for gram in trigrams(text):
+            posting = self.postings.get(gram)
+            if posting is None or key not in posting:
+                continue
+            if posting[key] > 1:
+                posting[key] -= 1
+            else:
+                del posting[key]
+                if not posting:
+                    del self.postings[gram]
+
+    def candidates(self, part: str):
+        """
+        Return the keys of the strings that may contain part, or None if part is
+        too short for the index to narrow the search down.
+        """
+        if len(part) < GRAM_SIZE:
+            return None
+
+        postings = list()
+        for gram in trigrams(part):
+            posting = self.postings.get(gram)
+            if not posting:
+                return set()
+            postings.append(posting)
+
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result = {key for key in result if key in posting}
+
+        return result
+
+    def neighbours(self, part: str):
+        """
+        Return the keys of the strings sharing enough trigrams with part to have
+        a similarity of at least MIN_SIMILARITY with it, or None if part is too
+        short to have trigrams.
+        """
+        part_grams = trigrams(part)
+        if not part_grams:
+            return None
+
+        shared: dict = dict()
+        for gram in part_grams:
+            for key in self.postings.get(gram, ()):
+                shared[key] = shared.get(key, 0) + 1
+
+        # a string sharing n trigrams with part has a similarity of at most n
+        # divided by the number of trigrams of part
+        needed = MIN_SIMILARITY * len(part_grams)
+        return {key for key, count in shared.items() if count >= needed}
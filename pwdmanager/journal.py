@@ -0,0 +1,55 @@
+"""
+Journal of the changes saved since the database file was last written, so a save
+only encrypts what changed. Layout of the file:
+
+    MAGIC | record 1 | ... | record n
+
+Every record is a big-endian unsigned 32 bits length followed by that many
+encrypted bytes. A record holds the entries put and the names deleted, replayed
+in order. A save writes the journal again as a single record of every change
+since the database file was written, so that a load decrypts one record however
+many saves there were. Records only carry final states, so replaying a journal
+on a database file that already contains its changes gives the same database
+again.
+"""
+
+import os
+import struct
+
+MAGIC = b"PWDJRN01"
+RECORD_LENGTH = struct.Struct(">I")
+COMPACTION_MIN_SIZE = 64 * 1024
+
+
+def get_journal_path(db_path):
+    return os.path.realpath(db_path) + ".journal"
+
+
+def is_journal(journal_file):
+    journal_file.seek(0)
+    return journal_file.read(len(MAGIC)) == MAGIC
+
+
+def read_records(journal_file):
+    """
+    Yield every record along with the offset where it ends. A truncated last
+    record, left by an interrupted append, is ignored.
+    """
+    journal_file.seek(len(MAGIC))
+    end = len(MAGIC)
+    while True:
+        length_bytes = journal_file.read(RECORD_LENGTH.size)
+        if len(length_bytes) < RECORD_LENGTH.size:
+            return
+        (length,) = RECORD_LENGTH.unpack(length_bytes)
+        record = journal_file.read(length)
+        if len(record) < length:
+            return
+        end += RECORD_LENGTH.size + length
+        yield record, end
+
+
+def write_record(journal_file, record: bytes):
+    journal_file.write(RECORD_LENGTH.pack(len(record)))
+    journal_file.write(record)
+    return RECORD_LENGTH.size + len(record)
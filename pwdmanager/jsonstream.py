@@ -0,0 +1,91 @@
+import codecs
+import json
+
+CHUNK_SIZE = 64 * 1024
+DELIMITERS = frozenset(",:]} \t\n\r")
+
+
+class IncrementalObjectReader:
+    """
+    Iterate over the members of the top-level JSON object of a binary stream. Only
+    the current chunk and the member being decoded are held as text. prefix holds
+    the bytes already read from the stream.
+    """
+
+    def __init__(self, stream, object_hook=None, chunk_size=CHUNK_SIZE, prefix=b""):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder(object_hook=object_hook)
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = self.text_decoder.decode(prefix)
+        self.pos = 0
+        self.eof = False
+
+    def read_chunk(self):
+        if self.eof:
+            return False
+
+        chunk = self.stream.read(self.chunk_size)
+        self.eof = not chunk
+        self.buffer += self.text_decoder.decode(chunk, final=self.eof)
+        return not self.eof
+
+    def compact(self):
+        consumed = self.pos
+        if consumed > self.chunk_size:
+            self.buffer, self.pos = self.buffer[consumed:], 0
+
+    def skip_whitespace(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.read_chunk():
+                return self.pos < len(self.buffer)
+
+    def expect(self, chars):
+        if not self.skip_whitespace():
+            raise json.JSONDecodeError("unexpected end of data", self.buffer, self.pos)
+
+        char = self.buffer[self.pos]
+        if char not in chars:
+            raise json.JSONDecodeError(
+                "expected one of {!r}".format(chars), self.buffer, self.pos
+            )
+        self.pos += 1
+        return char
+
+    def decode_value(self):
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.read_chunk():
+                    raise
+            else:
+                # a value not followed by a delimiter may be a truncated number
+                followed = end < len(self.buffer) and self.buffer[end] in DELIMITERS
+                if followed or not self.read_chunk():
+                    self.pos = end
+                    return value
+
+    def __iter__(self):
+        self.expect("{")
+        self.skip_whitespace()
+        if self.buffer.startswith("}", self.pos):
+            self.pos += 1
+        else:
+            while True:
+                key = self.decode_value()
+                if not isinstance(key, str):
+                    raise json.JSONDecodeError(
+                        "expected a string key", self.buffer, self.pos
+                    )
+                self.expect(":")
+                yield key, self.decode_value()
+                self.compact()
+                if self.expect(",}") == "}":
+                    break
+
+        if self.skip_whitespace():
+            raise json.JSONDecodeError("extra data", self.buffer, self.pos)
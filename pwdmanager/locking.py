@@ -0,0 +1,81 @@
+"""
+Coordination of the processes using the same database. Loads hold a shared lock
+so any number of them run at once, saves hold an exclusive lock. The lock file
+also holds the generation of the database, incremented by every save, so that a
+process can tell whether the database was saved by another one since it loaded
+it.
+"""
+
+import contextlib
+import fcntl
+import os
+
+
+def get_lock_path(db_path):
+    # the same lock whatever the path or symbolic link the database is reached by
+    return os.path.realpath(db_path) + ".lock"
+
+
+class DatabaseLock:
+    def __init__(self, db_path):
+        self.path = get_lock_path(db_path)
+        self.lock_file = None
+
+    @contextlib.contextmanager
+    def locked(self, operation):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        with open(fd, "r+b", buffering=0) as lock_file:
+            fcntl.flock(lock_file, operation)
+            self.lock_file = lock_file
+            try:
+                yield
+            finally:
+                self.lock_file = None
+
+    def shared(self):
+        return self.locked(fcntl.LOCK_SH)
+
+    def exclusive(self):
+        return self.locked(fcntl.LOCK_EX)
+
+    def generation(self):
+        """
+        Generation of the database, to be read while holding the lock.
+        """
+        self.lock_file.seek(0)
+        try:
+            return int(self.lock_file.read() or 0)
+        except ValueError:
+            return 0
+
+    def increment_generation(self):
+        """
+        Record that the database was saved, to be called while holding the
+        exclusive lock. Return the new generation.
+        """
+        generation = self.generation() + 1
+        self.lock_file.seek(0)
+        self.lock_file.truncate()
+        self.lock_file.write(b"%d\n" % generation)
+        return generation
+
+
+class NoLock:
+    """
+    Lock of a database used by a single process.
+    """
+
+    def shared(self):
+        return contextlib.nullcontext()
+
+    def exclusive(self):
+        return contextlib.nullcontext()
+
+    def generation(self):
+        return 0
+
+    def increment_generation(self):
+        return 0
+
+
+NO_LOCK = NoLock()
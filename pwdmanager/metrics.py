@@ -0,0 +1,240 @@
+"""
+Operation metrics aggregated over the invocations into a state file and written
+in the Prometheus text exposition format, to be picked up by the textfile
+collector of the node exporter. Only the phases timed by a Timings and the end
+of each invocation are recorded, the metrics are merged into the state and
+rendered once, when the invocation ends.
+"""
+
+import bisect
+import fcntl
+import json
+import os
+import tempfile
+import time
+
+from pwdmanager import journal, sharded
+from pwdmanager.database import DataBaseCryptException
+
+# upper bounds in seconds of the latency histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# top level phases whose latency is recorded, with their histogram
+HISTOGRAMS = {
+    "load": "pwdmanager_load_duration_seconds",
+    "save": "pwdmanager_save_duration_seconds",
+}
+HELP = {
+    "pwdmanager_commands_total": ("counter", "Invocations by command."),
+    "pwdmanager_decrypt_failures_total": (
+        "counter",
+        "Databases that could not be decrypted.",
+    ),
+    "pwdmanager_load_duration_seconds": (
+        "histogram",
+        "Time taken to load the database.",
+    ),
+    "pwdmanager_save_duration_seconds": (
+        "histogram",
+        "Time taken to save the database.",
+    ),
+    "pwdmanager_entries": ("gauge", "Entries in the database when last loaded."),
+    "pwdmanager_database_bytes": ("gauge", "Size of the database files."),
+    "pwdmanager_journal_bytes": ("gauge", "Size of the journal of the database."),
+    "pwdmanager_last_run_timestamp_seconds": (
+        "gauge",
+        "Time the last invocation ended.",
+    ),
+}
+
+
+def get_state_path(textfile_path):
+    # the textfile collector only reads the files ending with .prom
+    return textfile_path + ".state"
+
+
+def new_histogram():
+    return {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0}
+
+
+def observe(histogram, seconds):
+    index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+    if index < len(LATENCY_BUCKETS):
+        histogram["buckets"][index] += 1
+    histogram["sum"] += seconds
+    histogram["count"] += 1
+
+
+def merge_histogram(histogram, other):
+    for index, count in enumerate(other["buckets"]):
+        histogram["buckets"][index] += count
+    histogram["sum"] += other["sum"]
+    histogram["count"] += other["count"]
+
+
+def escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def new_state():
+    return {
+        "counters": dict(),
+        "histograms": dict(),
+        "gauges": dict(),
+    }
+
+
+def read_state(state_file):
+    """
+    The state saved in state_file, a new one if it is empty or unreadable, the
+    counters then starting over as Prometheus expects when they are reset.
+    """
+    try:
+        state = json.load(state_file)
+    except ValueError:
+        return new_state()
+
+    if not isinstance(state, dict) or set(state) != set(new_state()):
+        return new_state()
+    for histogram in state["histograms"].values():
+        if len(histogram["buckets"]) != len(LATENCY_BUCKETS):
+            return new_state()
+    return state
+
+
+def render(state):
+    lines = list()
+    for name, (metric_type, description) in HELP.items():
+        samples = list()
+        if metric_type == "histogram":
+            histogram = state["histograms"].get(name)
+            if histogram:
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, histogram["buckets"]):
+                    cumulative += count
+                    samples.append(
+                        '{}_bucket{{le="{}"}} {}'.format(name, bound, cumulative)
+                    )
+                samples.append(
+                    '{}_bucket{{le="+Inf"}} {}'.format(name, histogram["count"])
+                )
+                samples.append(
+                    "{}_sum {}".format(name, format_value(float(histogram["sum"])))
+                )
+                samples.append("{}_count {}".format(name, histogram["count"]))
+        elif name == "pwdmanager_commands_total":
+            for command, count in sorted(state["counters"].get(name, dict()).items()):
+                samples.append(
+                    '{}{{command="{}"}} {}'.format(name, escape_label(command), count)
+                )
+        else:
+            values = state["counters"] if metric_type == "counter" else state["gauges"]
+            if name in values:
+                samples.append("{} {}".format(name, format_value(values[name])))
+
+        if samples:
+            lines.append("# HELP {} {}".format(name, description))
+            lines.append("# TYPE {} {}".format(name, metric_type))
+            lines.extend(samples)
+
+    return "".join(line + "\n" for line in lines)
+
+
+def write_textfile(path, content):
+    """
+    Replace the file at path with content at once, the node exporter never
+    reading a partially written file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".pwdmanager-")
+    try:
+        with open(fd, "w") as tmp_file:
+            tmp_file.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class Metrics:
+    """
+    Metrics of one invocation, merged into the ones of the previous invocations
+    by save.
+    """
+
+    def __init__(self, textfile_path):
+        self.textfile_path = textfile_path
+        self.state_path = get_state_path(textfile_path)
+        self.histograms = dict()
+        self.decrypt_failures = 0
+        self.command = None
+        self.entries = None
+        self.database_path = None
+        self.journal_path = None
+
+    def observe_phase(self, path, nanoseconds, error):
+        """
+        To be set as the on_phase_end of the Timings of the invocation.
+        """
+        if len(path) != 1 or path[0] not in HISTOGRAMS:
+            return
+        if isinstance(error, DataBaseCryptException):
+            self.decrypt_failures += 1
+        elif error is None:
+            observe(
+                self.histograms.setdefault(HISTOGRAMS[path[0]], new_histogram()),
+                nanoseconds / 1e9,
+            )
+
+    def observe_run(self, command, database_path, db=None):
+        """
+        db is the database loaded by the invocation, if any.
+        """
+        self.command = command
+        self.database_path = database_path
+        self.journal_path = journal.get_journal_path(database_path)
+        if db is not None:
+            self.entries = len(db)
+
+    def merge_into(self, state):
+        counters, gauges = state["counters"], state["gauges"]
+        if self.command:
+            commands = counters.setdefault("pwdmanager_commands_total", dict())
+            commands[self.command] = commands.get(self.command, 0) + 1
+        counters["pwdmanager_decrypt_failures_total"] = (
+            counters.get("pwdmanager_decrypt_failures_total", 0) + self.decrypt_failures
+        )
+        for name, histogram in self.histograms.items():
+            merge_histogram(
+                state["histograms"].setdefault(name, new_histogram()), histogram
+            )
+
+        if self.entries is not None:
+            gauges["pwdmanager_entries"] = self.entries
+        for name, path in (
+            ("pwdmanager_database_bytes", self.database_path),
+            ("pwdmanager_journal_bytes", self.journal_path),
+        ):
+            if path is not None:
+                gauges[name] = sharded.get_size(path) if os.path.exists(path) else 0
+        gauges["pwdmanager_last_run_timestamp_seconds"] = time.time()
+
+    def save(self):
+        """
+        Merge the metrics into the state file and render the textfile, the state
+        file being locked so that concurrent invocations do not lose updates.
+        """
+        fd = os.open(self.state_path, os.O_RDWR | os.O_CREAT, 0o600)
+        with open(fd, "r+") as state_file:
+            fcntl.flock(state_file, fcntl.LOCK_EX)
+            state = read_state(state_file)
+            self.merge_into(state)
+            state_file.seek(0)
+            state_file.truncate()
+            json.dump(state, state_file)
+            state_file.flush()
+            write_textfile(self.textfile_path, render(state))
@@ -1,16 +1,31 @@
+"""
+Command line entry point. Only argparse is imported at start up, the modules
+handling the database are imported once the arguments are known to be valid, so
+that --help and argument errors return immediately.
+"""
+
 import argparse
 import getpass
 import os
+import sys
 
-from pwdmanager.commands import (
-    AddEntry,
-    CommandException,
-    ListEntries,
-    RemoveEntry,
-    ShowEntry,
-    UpdateEntry,
-)
-from pwdmanager.database import DataBaseCryptException, create_db_manager
+IMPORT_FORMATS = ["bitwarden", "csv", "jsonl"]
+EXPORT_FORMATS = ["csv", "jsonl"]
+LIST_FORMATS = ["text", "jsonl", "tsv"]
+CRYPTERS = ["gpg", "aes-gcm"]
+COMPRESSIONS = ["none", "zlib", "bz2", "lzma"]
+# options of the configuration file, the defaults of the command line
+CONFIG_OPTIONS = ["crypter", "compression", "compression-level"]
+LIST_FIELDS = [
+    "name",
+    "login",
+    "password",
+    "login_alias",
+    "aliases",
+    "tags",
+    "creation_date",
+    "last_update_date",
+]
 
 
 def create_arg_parser():
@@ -24,6 +39,75 @@ def create_arg_parser():
     parser.add_argument(
         "-p", "--master-password", help="password to crypt and decrypt the database"
     )
+    parser.add_argument(
+        "--config",
+        default=get_default_config_location(),
+        help="configuration file whose [pwdmanager] section sets the default of the"
+        " {} options".format(", ".join("--" + option for option in CONFIG_OPTIONS)),
+    )
+    parser.add_argument(
+        "--crypter",
+        choices=CRYPTERS,
+        help="how the database is encrypted when saved, gpg runs the gpg program"
+        " while aes-gcm encrypts in process and requires the cryptography package."
+        " Databases encrypted either way can be read. By default a database is"
+        " encrypted again as it was, new ones with gpg",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=COMPRESSIONS,
+        default="none",
+        help="compress the database before encrypting it, in which case gpg does"
+        " not compress it as it does otherwise. Databases compressed either way"
+        " can be read",
+    )
+    parser.add_argument(
+        "--compression-level",
+        type=int,
+        metavar="N",
+        help="from 0, or 1 for bz2, to 9, the default of the algorithm otherwise",
+    )
+    parser.add_argument(
+        "--streaming-load",
+        action="store_true",
+        help="decrypt and parse the database incrementally to lower peak memory",
+    )
+    parser.add_argument(
+        "--lazy-load",
+        action="store_true",
+        help="create the entries of a database only when they are accessed, those"
+        " left untouched being saved again as they were loaded",
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="keep the entries of a database loaded whole in columns, faster to"
+        " search, rather than as one object per entry",
+    )
+    parser.add_argument(
+        "--no-journal",
+        action="store_true",
+        help="write the whole database on every save instead of appending the"
+        " changes to its journal",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="print on the standard error how long each phase of the command took",
+    )
+    parser.add_argument(
+        "--timings-format",
+        choices=["table", "json"],
+        default="table",
+        help="format of the timings",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        help="add the metrics of the invocation to the ones aggregated in"
+        " FILE.state and write them all to FILE in the Prometheus text format,"
+        " for the textfile collector of the node exporter",
+    )
     subparser = parser.add_subparsers(dest="command")
     subparser.required = True
 
@@ -57,6 +141,38 @@ def create_arg_parser():
     subparser_list.add_argument(
         "-t", "--tag", help="string you want to look for in tags of entries"
     )
+    subparser_list.add_argument(
+        "-f",
+        "--fuzzy",
+        action="store_true",
+        help="rank the entries by how well their name or aliases match search,"
+        " starting with it, containing it or looking like it, best first",
+    )
+    subparser_list.add_argument(
+        "--limit",
+        type=int,
+        metavar="N",
+        help="list at most N entries, 10 by default with --fuzzy",
+    )
+    subparser_list.add_argument(
+        "--offset",
+        type=int,
+        default=0,
+        metavar="N",
+        help="skip the first N entries, to list them page by page with --limit",
+    )
+    subparser_list.add_argument(
+        "--format",
+        choices=LIST_FORMATS,
+        default="text",
+        help="jsonl prints a JSON object per entry and tsv a line of tab"
+        " separated fields per entry, aliases and tags being separated by ;",
+    )
+    subparser_list.add_argument(
+        "--fields",
+        help="comma separated fields to list among {}, name,login,password by"
+        " default".format(",".join(LIST_FIELDS)),
+    )
 
     subparser_show = subparser.add_parser("rm")
     subparser_show.add_argument(
@@ -87,6 +203,121 @@ def create_arg_parser():
         "-rmt", "--remove-tags", nargs="+", help="tags you want to remove"
     )
 
+    subparser_migrate = subparser.add_parser(
+        "migrate", help="convert the database to another on disk format"
+    )
+    subparser_migrate.add_argument(
+        "format",
+        choices=["segmented", "sharded", "legacy"],
+        help="segmented encrypts each entry separately so that looking up an entry"
+        " only decrypts that entry, sharded turns the database into a directory of"
+        " shards encrypted separately and in parallel, legacy encrypts the whole"
+        " database at once",
+    )
+    subparser_migrate.add_argument(
+        "--shards",
+        type=int,
+        default=16,
+        metavar="N",
+        help="number of shards of the sharded format, 16 by default",
+    )
+    subparser_migrate.add_argument(
+        "--serialization",
+        choices=["binary", "json"],
+        default="binary",
+        help="serialization of the entries of the legacy and sharded formats, binary"
+        " by default, the segmented format always uses JSON",
+    )
+
+    subparser_agent = subparser.add_parser(
+        "agent",
+        help="keep the database decrypted in a background process that executes"
+        " the commands of the other invocations",
+    )
+    subparser_agent.add_argument(
+        "--idle-timeout",
+        type=float,
+        help="seconds without request after which the agent stops, 15 minutes by"
+        " default",
+    )
+    subparser_agent.add_argument(
+        "--save-delay",
+        type=float,
+        help="modifications are saved once none happened for that many seconds, 2"
+        " by default",
+    )
+    subparser_agent.add_argument(
+        "--foreground", action="store_true", help="do not detach from the terminal"
+    )
+    subparser_agent.add_argument(
+        "--stop", action="store_true", help="stop the running agent"
+    )
+
+    subparser_shell = subparser.add_parser(
+        "shell", help="execute several commands against the database loaded once"
+    )
+    subparser_shell.add_argument(
+        "--autosave",
+        type=int,
+        default=0,
+        metavar="N",
+        help="save the database every N modifying commands, by default it is only"
+        " saved by the save and exit shell commands",
+    )
+
+    subparser_batch = subparser.add_parser(
+        "batch",
+        help="apply a file of JSON commands, one per line, and save once if they"
+        " all succeed",
+    )
+    subparser_batch.add_argument(
+        "file", help="file to read the commands from, - for the standard input"
+    )
+
+    subparser_import = subparser.add_parser(
+        "import",
+        help="add the entries of a file exported by pwdmanager or another"
+        " password manager",
+    )
+    subparser_import.add_argument(
+        "file", help="file to read the entries from, - for the standard input"
+    )
+    subparser_import.add_argument(
+        "-f",
+        "--format",
+        choices=IMPORT_FORMATS,
+        default="jsonl",
+        help="format of the file, bitwarden is the CSV export of Bitwarden",
+    )
+    subparser_import.add_argument(
+        "--on-name-conflict",
+        choices=["fail", "skip", "overwrite", "rename"],
+        default="fail",
+        help="what to do when an entry with the same name or alias exists,"
+        " rename appends a numeric suffix to the imported name",
+    )
+    subparser_import.add_argument(
+        "--on-alias-conflict",
+        choices=["fail", "drop", "skip"],
+        default="fail",
+        help="what to do when an imported alias is already used,"
+        " drop imports the entry without that alias",
+    )
+
+    subparser_export = subparser.add_parser(
+        "export", help="write every entry, passwords included, in clear to a file"
+    )
+    subparser_export.add_argument(
+        "file", help="file to write the entries to, - for the standard output"
+    )
+    subparser_export.add_argument(
+        "-f",
+        "--format",
+        choices=EXPORT_FORMATS,
+        default="jsonl",
+        help="format of the file",
+    )
+
     return parser
 
 
@@ -94,7 +325,83 @@ def get_default_db_location():
     return os.path.join(os.path.expanduser("~"), ".pwddb")
 
 
+def get_default_config_location():
+    return os.path.join(os.path.expanduser("~"), ".pwdmanager.ini")
+
+
+def apply_config(parser, argv):
+    """
+    Use the options of the configuration file as defaults, so that the command
+    line still overrides them. Only an explicitly given file must exist.
+    """
+    config_parser = argparse.ArgumentParser(add_help=False)
+    config_parser.add_argument("--config")
+    config_path = config_parser.parse_known_args(argv)[0].config
+    if config_path is None and not os.path.exists(get_default_config_location()):
+        return
+
+    import configparser
+
+    config = configparser.ConfigParser()
+    try:
+        with open(config_path or get_default_config_location()) as config_file:
+            config.read_file(config_file)
+    except (OSError, configparser.Error) as e:
+        parser.error("cannot read the configuration file: {}".format(e))
+
+    if not config.has_section("pwdmanager"):
+        return
+    for option, value in config.items("pwdmanager"):
+        if option not in CONFIG_OPTIONS:
+            parser.error("unknown option {} in the configuration file".format(option))
+        parser.set_defaults(**{option.replace("-", "_"): value})
+
+
+def check_args(parser, args):
+    """
+    Report the invalid values argparse cannot check by itself before anything
+    else happens, the master password prompt included.
+    """
+    if args.crypter is not None and args.crypter not in CRYPTERS:
+        parser.error("unknown crypter {}".format(args.crypter))
+    if args.compression not in COMPRESSIONS:
+        parser.error("unknown compression {}".format(args.compression))
+    if args.compression != "none" and args.compression_level is not None:
+        from pwdmanager.compression import ALGORITHMS
+
+        levels = ALGORITHMS[args.compression].levels
+        if args.compression_level not in levels:
+            parser.error(
+                "--compression-level of {} goes from {} to {}".format(
+                    args.compression, levels[0], levels[-1]
+                )
+            )
+
+    if args.command == "shell" and args.autosave < 0:
+        parser.error("--autosave cannot be negative")
+    elif args.command == "migrate" and args.shards < 1:
+        parser.error("--shards must be positive")
+    elif args.command == "list":
+        if args.fuzzy and not args.search:
+            parser.error("--fuzzy needs a search")
+        if args.limit is not None and args.limit < 1:
+            parser.error("--limit must be positive")
+        if args.offset < 0:
+            parser.error("--offset cannot be negative")
+        if args.fields is not None:
+            for field in args.fields.split(","):
+                if field not in LIST_FIELDS:
+                    parser.error("unknown field {} in --fields".format(field))
+    elif args.command == "agent":
+        if args.idle_timeout is not None and args.idle_timeout <= 0:
+            parser.error("--idle-timeout must be positive")
+        if args.save_delay is not None and args.save_delay < 0:
+            parser.error("--save-delay cannot be negative")
+
+
 def create_addentry_command(args):
+    from pwdmanager.commands import AddEntry
+
     command = AddEntry(args.name, args.login, args.password, args.login_alias)
     if args.alias:
         command.aliases = args.alias
@@ -105,18 +412,32 @@ def create_addentry_command(args):
 
 
 def create_showentry_command(args):
+    from pwdmanager.commands import ShowEntry
+
     return ShowEntry(args.name)
 
 
 def create_listentries_command(args):
-    return ListEntries(args.search, args.tag)
+    from pwdmanager.commands import ListEntries
+
+    command = ListEntries(args.search, args.tag, fuzzy=args.fuzzy, limit=args.limit)
+    command.offset = args.offset
+    command.output_format = args.format
+    if args.fields is not None:
+        command.fields = args.fields.split(",")
+
+    return command
 
 
 def create_remove_command(args):
+    from pwdmanager.commands import RemoveEntry
+
     return RemoveEntry(args.name)
 
 
 def create_update_command(args):
+    from pwdmanager.commands import UpdateEntry
+
     command = UpdateEntry(args.name)
     if args.login_alias is not None:
         command.login_alias = args.login_alias
@@ -136,14 +457,7 @@ def create_update_command(args):
     return command
 
 
-def main():
-    parser = create_arg_parser()
-    args = parser.parse_args()
-
-    master_pwd = args.master_password
-    if not master_pwd:
-        master_pwd = getpass.getpass()
-
+def create_command(args):
     if args.command == "add":
         command = create_addentry_command(args)
     elif args.command == "show":
@@ -154,23 +468,262 @@ def main():
         command = create_remove_command(args)
     elif args.command == "update":
         command = create_update_command(args)
+    else:
+        command = None
+
+    return command
 
-    db_manager = create_db_manager(args.database, master_pwd)
+
+def run_agent(args, db_manager, master_pwd):
+    from pwdmanager import agent
+
+    socket_path = agent.get_socket_path(args.database)
+    options = dict()
+    if args.idle_timeout is not None:
+        options["idle_timeout"] = args.idle_timeout
+    if args.save_delay is not None:
+        options["save_delay"] = args.save_delay
+    db_agent = agent.Agent(db_manager, socket_path, password=master_pwd, **options)
     try:
-        db = (
-            db_manager.load_db()
-            if os.path.exists(args.database)
-            else db_manager.init_db()
+        server = db_agent.bind()
+    except agent.AgentException as e:
+        print("cannot start agent, message is: {}".format(str(e)))
+        return
+
+    print("agent listening on {}".format(socket_path))
+    if not args.foreground:
+        agent.detach()
+    db_agent.serve(server)
+
+
+def read_batch_commands(path):
+    from pwdmanager import batch
+
+    if path == "-":
+        return batch.read_commands(sys.stdin)
+    else:
+        with open(path) as batch_file:
+            return batch.read_commands(batch_file)
+
+
+def run_batch(batch_commands, db_manager):
+    from pwdmanager import batch
+
+    try:
+        counts = db_manager.execute(lambda db: batch.apply_commands(db, batch_commands))
+        db_manager.save_db_if_needed()
+    except batch.BatchException as e:
+        print("batch not applied, message is: {}".format(e.msg))
+    else:
+        print(batch.render_counts(counts))
+
+
+def open_import_file(path):
+    return sys.stdin if path == "-" else open(path, newline="")
+
+
+def run_import(args, db_manager, import_file):
+    import csv
+
+    from pwdmanager import transfer
+
+    records = transfer.READERS[args.format](import_file)
+    imported = list()
+
+    def import_records(db):
+        # the records are read as they are imported, they cannot be imported
+        # again should another process save the database first
+        if imported:
+            raise transfer.TransferException(
+                "the database was modified by another process during the import"
+            )
+        importer = transfer.Importer(db, args.on_name_conflict, args.on_alias_conflict)
+        imported.append(True)
+        return importer.import_records(records)
+
+    try:
+        with import_file:
+            counts = db_manager.execute(import_records)
+        db_manager.save_db_if_needed()
+    except (OSError, UnicodeDecodeError, csv.Error, transfer.TransferException) as e:
+        print("import not applied, message is: {}".format(str(e)))
+    else:
+        print(transfer.render_import_counts(counts))
+
+
+def run_export(args, db_manager):
+    from pwdmanager import transfer
+
+    write_entries = transfer.WRITERS[args.format]
+    entries = db_manager.db.entries()
+    try:
+        if args.file == "-":
+            count = write_entries(entries, sys.stdout)
+        else:
+            fd = os.open(args.file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(fd, "w", newline="") as export_file:
+                count = write_entries(entries, export_file)
+    except OSError as e:
+        print("cannot export database, message is: {}".format(str(e)))
+    else:
+        if args.file != "-":
+            print("{} entries exported to {}".format(count, args.file))
+
+
+def main():
+    parser = create_arg_parser()
+    apply_config(parser, sys.argv[1:])
+    args = parser.parse_args()
+    check_args(parser, args)
+
+    if not args.timings and not args.metrics:
+        run(parser, args)
+        return
+
+    from pwdmanager.timings import Timings
+
+    timings = Timings()
+    if args.metrics:
+        from pwdmanager.metrics import Metrics
+
+        metrics = Metrics(args.metrics)
+        timings.on_phase_end = metrics.observe_phase
+
+    db_manager = None
+    try:
+        db_manager = run(parser, args, timings)
+    finally:
+        if args.timings:
+            print(timings.render(args.timings_format), file=sys.stderr)
+        if args.metrics:
+            save_metrics(metrics, args, db_manager)
+
+
+def save_metrics(metrics, args, db_manager):
+    metrics.observe_run(
+        args.command, args.database, db_manager.db if db_manager else None
+    )
+    try:
+        metrics.save()
+    except OSError as e:
+        print("cannot write metrics, message is: {}".format(str(e)), file=sys.stderr)
+
+
+def run(parser, args, timings=None):
+    """
+    Return the manager of the database once loaded, None when it was not.
+    """
+    from pwdmanager.timings import NO_TIMINGS
+
+    timings = timings if timings else NO_TIMINGS
+    command = create_command(args)
+    if command is not None:
+        from pwdmanager import agent
+        from pwdmanager.commands import CommandException
+
+        try:
+            with timings.phase("agent request"):
+                output = agent.execute_in_agent(
+                    agent.get_socket_path(args.database),
+                    command,
+                    args.master_password,
+                )
+        except (CommandException, agent.AgentException) as e:
+            print("cannot execute command, message is: {}".format(str(e)))
+            return
+        if output is not None:
+            print(output)
+            return
+    elif args.command == "agent" and args.stop:
+        from pwdmanager import agent
+
+        if not agent.stop_agent(agent.get_socket_path(args.database)):
+            print("no agent is running")
+        return
+    elif args.command == "batch":
+        from pwdmanager.batch import BatchException
+
+        try:
+            batch_commands = read_batch_commands(args.file)
+        except (OSError, BatchException) as e:
+            print("batch not applied, message is: {}".format(str(e)))
+            return
+    elif args.command == "import":
+        try:
+            import_file = open_import_file(args.file)
+        except OSError as e:
+            print("import not applied, message is: {}".format(str(e)))
+            return
+
+    master_pwd = args.master_password
+    if not master_pwd:
+        with timings.phase("password prompt"):
+            master_pwd = getpass.getpass()
+
+    from pwdmanager.database import DataBaseCryptException, create_db_manager
+
+    try:
+        db_manager = create_db_manager(
+            args.database,
+            master_pwd,
+            streaming=args.streaming_load,
+            crypter=args.crypter,
+            journaling=not args.no_journal,
+            timings=timings,
+            compression=None if args.compression == "none" else args.compression,
+            compression_level=args.compression_level,
+            columnar=args.columnar,
+            lazy=args.lazy_load,
         )
+        if os.path.exists(args.database):
+            db_manager.load_db()
+        else:
+            db_manager.init_db()
     except DataBaseCryptException as e:
         print("database cannot be loaded : {}".format(str(e)))
     else:
-        try:
-            print(command.check_execute_render(db))
-        except CommandException as e:
-            print("cannot execute command, message is: {}".format(str(e)))
+        if args.command == "migrate":
+            db_manager.migrate(
+                args.format == "segmented",
+                args.shards if args.format == "sharded" else 0,
+                args.serialization == "binary",
+            )
+            print("database migrated to the {} format".format(args.format))
+        elif args.command == "agent":
+            run_agent(args, db_manager, master_pwd)
+        elif args.command == "batch":
+            run_batch(batch_commands, db_manager)
+        elif args.command == "import":
+            run_import(args, db_manager, import_file)
+        elif args.command == "export":
+            run_export(args, db_manager)
+        elif args.command == "shell":
+            from pwdmanager import shell
+
+            shell.Shell(
+                db_manager, parser, create_command, autosave=args.autosave
+            ).cmdloop()
         else:
-            db_manager.save_db_if_needed()
+            from pwdmanager.commands import write_output
+
+            # the command is executed again if another process saved the database
+            # first, the output written is the one of its last execution
+            outputs = list()
+
+            def execute_command(db):
+                outputs.append(command.check_execute_render(db, timings))
+
+            try:
+                with timings.phase("command"):
+                    db_manager.execute(execute_command)
+                db_manager.save_db_if_needed()
+            except CommandException as e:
+                print("cannot execute command, message is: {}".format(str(e)))
+            else:
+                with timings.phase("output"):
+                    write_output(outputs[-1], sys.stdout)
+
+    return db_manager
 
 
 if __name__ == "__main__":
@@ -0,0 +1,51 @@
+"""
+Segmented database container. Each entry is encrypted on its own so a command
+only has to decrypt the entries it touches. Layout of the file:
+
+    MAGIC | segment 1 | ... | segment n | header | header length
+
+The header is encrypted as well and lists, for every entry, its name, aliases and
+tags along with the offset and length of its segment. Its length is stored as a
+big-endian unsigned 64 bits integer at the very end of the file, so segments can
+be written before knowing where they end up.
+"""
+
+import os
+import struct
+
+MAGIC = b"PWDSEG01"
+HEADER_LENGTH = struct.Struct(">Q")
+
+
+def is_segmented(db_file):
+    db_file.seek(0)
+    return db_file.read(len(MAGIC)) == MAGIC
+
+
+def read_header(db_file):
+    db_file.seek(-HEADER_LENGTH.size, os.SEEK_END)
+    (length,) = HEADER_LENGTH.unpack(db_file.read(HEADER_LENGTH.size))
+    db_file.seek(-HEADER_LENGTH.size - length, os.SEEK_END)
+    return db_file.read(length)
+
+
+def read_segment(db_file, offset, length):
+    db_file.seek(offset)
+    return db_file.read(length)
+
+
+class SegmentWriter:
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.db_file.write(MAGIC)
+        self.offset = len(MAGIC)
+
+    def write_segment(self, segment: bytes):
+        offset = self.offset
+        self.db_file.write(segment)
+        self.offset += len(segment)
+        return offset
+
+    def write_header(self, header: bytes):
+        self.db_file.write(header)
+        self.db_file.write(HEADER_LENGTH.pack(len(header)))
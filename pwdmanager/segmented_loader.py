@@ -0,0 +1,142 @@
+"""
+Loader of segmented database files, see pwdmanager.segmented for their layout.
+"""
+
+import json
+
+from pwdmanager import segmented
+from pwdmanager.database import (
+    Database,
+    DataBaseCryptException,
+    DatabaseEntry,
+    DatabaseJSONEncoder,
+    DBLoader,
+    EntryStub,
+    preload_stubs,
+    write_atomically,
+)
+
+
+class SegmentedDBLoader(DBLoader):
+    """
+    Each entry is encrypted on its own, so a command only decrypts the entries it
+    touches and a save only encrypts again the entries that changed.
+    """
+
+    def __init__(self, db_path: str, interceptor=None, **options):
+        super().__init__(db_path, interceptor, **options)
+        # offset and length by name of the segments up to date in the database file
+        self.segment_positions: dict = dict()
+        # segmented database file the stubs are loaded from
+        self.segments_file = None
+
+    def read_db(self):
+        """
+        Only decrypt the header, entries are decrypted when they are accessed.
+        """
+        self.segment_positions = dict()
+        with self.timings.phase("read"):
+            self.open_segments_file()
+            header_bytes = segmented.read_header(self.segments_file)
+        with self.timings.phase("decrypt"):
+            plaintext = self.interceptor.at_load_time(header_bytes)
+        with self.timings.phase("decode"):
+            header = json.loads(plaintext)
+
+        with self.timings.phase("index"):
+            db_dict = dict()
+            for name, aliases, tags, offset, length in header["entries"]:
+                db_dict[name] = EntryStub(name, aliases, tags, offset, length, self)
+                self.segment_positions[name] = (offset, length)
+            return Database(db_dict)
+
+    def open_segments_file(self):
+        """
+        Keep the segmented database file open, so that the stubs are loaded from
+        the file they come from even once another process replaced it.
+        """
+        if self.segments_file is not None:
+            self.segments_file.close()
+        self.segments_file = open(self.db_path, "rb")
+
+    def load_segment(self, stub):
+        with self.timings.phase("load entry"):
+            segment = self.read_raw_segment(stub.offset, stub.length)
+
+            entry = json.loads(
+                self.interceptor.at_load_time(segment),
+                object_hook=self.json_decode_database_entry,
+            )
+        if not isinstance(entry, DatabaseEntry) or entry.name != stub.name:
+            raise DataBaseCryptException(
+                "segment of entry {} is corrupted".format(stub.name)
+            )
+        return entry
+
+    def read_raw_segment(self, offset, length):
+        return segmented.read_segment(self.segments_file, offset, length)
+
+    def forget_saved(self, name):
+        self.segment_positions.pop(name, None)
+
+    def write_entries(self, db):
+        """
+        Entries that were never loaded or did not change since their segment was
+        written are copied without being decrypted, only the changed ones and the
+        header are encrypted again. When db changed in unknown ways, such as
+        migrated to another interceptor, every segment is decrypted and encrypted
+        again. The new file is written next to the database and then moved over
+        it.
+        """
+        changed = None if db.unknown_changes else db.changeset.names()
+        header_entries = list()
+        segment_positions = dict()
+        stub_positions = list()
+        preload_stubs(db.db.values())
+        with self.timings.phase("write"), write_atomically(self.db_path) as tmp_file:
+            writer = segmented.SegmentWriter(tmp_file)
+            for entry in db.db.values():
+                # only the stubs of a segment can be copied as they are
+                if isinstance(entry, EntryStub) and (
+                    changed is None or entry.offset is None
+                ):
+                    entry = entry.load()
+                position = self.segment_positions.get(entry.name)
+                in_segment = isinstance(entry, EntryStub)
+                if in_segment:
+                    segment = entry.loader.read_raw_segment(entry.offset, entry.length)
+                elif (
+                    position is not None
+                    and changed is not None
+                    and entry.name not in changed
+                ):
+                    segment = self.read_raw_segment(*position)
+                else:
+                    with self.timings.phase("encode"):
+                        plaintext = json.dumps(entry, cls=DatabaseJSONEncoder)
+                    with self.timings.phase("encrypt"):
+                        segment = self.interceptor.at_save_time(plaintext)
+                offset = writer.write_segment(segment)
+                segment_positions[entry.name] = (offset, len(segment))
+                if in_segment:
+                    stub_positions.append((entry, offset))
+                header_entries.append(
+                    (
+                        entry.name,
+                        list(entry.aliases),
+                        list(entry.tags),
+                        offset,
+                        len(segment),
+                    )
+                )
+
+            with self.timings.phase("encrypt"):
+                header = self.interceptor.at_save_time(
+                    json.dumps({"version": 1, "entries": header_entries})
+                )
+            writer.write_header(header)
+
+        self.segment_positions = segment_positions
+        for stub, offset in stub_positions:
+            stub.offset = offset
+        self.open_segments_file()
@@ -0,0 +1,72 @@
+"""
+Sharded database directory. Entries are spread over a fixed number of shards by
+a hash of their name, each shard being encrypted on its own so a command only
+decrypts the shards holding the entries it touches, and the shards can be
+decrypted and encrypted in parallel. Layout of the directory:
+
+    manifest | shard-000-<token> | ... | shard-<n-1>-<token>
+
+The manifest is encrypted as well and lists the file of every shard along with
+the name, aliases and tags of every entry. A save writes the shards that changed
+to new files, then replaces the manifest, which is when the save takes effect,
+and finally removes the files of the shards it replaced.
+"""
+
+import hashlib
+import os
+import secrets
+import shutil
+
+MANIFEST = "manifest"
+SHARD_PREFIX = "shard-"
+DEFAULT_SHARDS = 16
+
+
+def shard_of(name, shards):
+    digest = hashlib.blake2b(name.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+def new_shard_file(shard):
+    # never the name of a file in use, so a save does not touch the shards the
+    # current manifest points to
+    return "{}{:03d}-{}".format(SHARD_PREFIX, shard, secrets.token_hex(4))
+
+
+def remove_unused_shards(directory, shard_files):
+    """
+    Remove the shard files not in shard_files, replaced by a save or left by an
+    interrupted one.
+    """
+    used = set(shard_files)
+    for file_name in os.listdir(directory):
+        if file_name.startswith(SHARD_PREFIX) and file_name not in used:
+            os.unlink(os.path.join(directory, file_name))
+
+
+def get_size(path):
+    """
+    Size of a database file, or of all the files of a sharded database.
+    """
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def replace(src, dst):
+    """
+    Move src over dst. A file replaces a file at once, but when either is a
+    sharded directory dst is first moved aside and only removed once src took
+    its place.
+    """
+    if not os.path.exists(dst) or not (os.path.isdir(src) or os.path.isdir(dst)):
+        os.replace(src, dst)
+        return
+
+    aside = dst + ".replaced"
+    os.rename(dst, aside)
+    os.rename(src, dst)
+    if os.path.isdir(aside):
+        shutil.rmtree(aside)
+    else:
+        os.unlink(aside)
@@ -0,0 +1,243 @@
+"""
+Loader of sharded database directories, see pwdmanager.sharded for their layout.
+"""
+
+import itertools
+import json
+import os
+import shutil
+import tempfile
+
+from pwdmanager import sharded
+from pwdmanager.database import (
+    Database,
+    DataBaseCryptException,
+    DatabaseEntry,
+    DBLoader,
+    EntryStub,
+    join_chunks,
+    preload_stubs,
+    write_atomically,
+)
+
+
+class ShardStub(EntryStub):
+    """
+    Entry of a sharded database that has not been decrypted yet, its other fields
+    stay in the file of its shard.
+    """
+
+    __slots__ = ("shard_file",)
+
+    def __init__(self, name, aliases, tags, shard_file, loader: "ShardedDBLoader"):
+        super().__init__(name, aliases, tags, None, None, loader)
+        self.shard_file = shard_file
+
+    def load(self):
+        return self.loader.load_sharded_entry(self)
+
+
+class ShardedDBLoader(DBLoader):
+    """
+    Entries are spread over shard files, a command only decrypts the shards
+    holding the entries it touches and the shards are decrypted and encrypted in
+    parallel.
+    """
+
+    def __init__(
+        self, db_path: str, interceptor=None, shards=sharded.DEFAULT_SHARDS, **options
+    ):
+        super().__init__(db_path, interceptor, **options)
+        # number of shards written, that of the directory once loaded
+        self.shards = shards
+        # threads decrypting or encrypting shards at once
+        self.workers = os.cpu_count() or 1
+        # files of the shards, None for the shards whose file is not up to date
+        self.shard_files: list = list()
+        # open shard files and decrypted entries of the shards, by file name
+        self.shard_handles: dict = dict()
+        self.shard_entries: dict = dict()
+
+    def read_db(self):
+        """
+        Only decrypt the manifest, shards are decrypted when one of their entries
+        is accessed. The shard files are opened right away so that they can still
+        be read once another process replaced them.
+        """
+        with self.timings.phase("read"):
+            with open(os.path.join(self.db_path, sharded.MANIFEST), "rb") as f:
+                manifest_bytes = f.read()
+        with self.timings.phase("decrypt"):
+            plaintext = self.interceptor.at_load_time(manifest_bytes)
+        with self.timings.phase("decode"):
+            manifest = json.loads(plaintext)
+
+        with self.timings.phase("open shards"):
+            self.close_shards()
+            self.shard_files = manifest["shards"]
+            self.binary = manifest.get("binary", False)
+            for file_name in self.shard_files:
+                self.shard_handles[file_name] = open(
+                    os.path.join(self.db_path, file_name), "rb"
+                )
+        self.shards = len(self.shard_files)
+
+        with self.timings.phase("index"):
+            db_dict = dict()
+            for name, aliases, tags in manifest["entries"]:
+                shard_file = self.shard_files[sharded.shard_of(name, self.shards)]
+                db_dict[name] = ShardStub(name, aliases, tags, shard_file, self)
+            return Database(db_dict)
+
+    def close_shards(self):
+        for shard_file in self.shard_handles.values():
+            shard_file.close()
+        self.shard_handles = dict()
+        self.shard_entries = dict()
+
+    def read_shard(self, shard_file):
+        """
+        Decrypt and decode a shard, called from several threads at once.
+        """
+        handle = self.shard_handles[shard_file]
+        loaded_bytes = os.pread(handle.fileno(), os.fstat(handle.fileno()).st_size, 0)
+        plaintext = self.interceptor.at_load_time_bytes(loaded_bytes)
+        try:
+            return self.decode_entries(plaintext)
+        except ValueError:
+            raise DataBaseCryptException("shard {} is corrupted".format(shard_file))
+
+    def load_sharded_entry(self, stub):
+        entries = self.shard_entries.get(stub.shard_file)
+        if entries is None:
+            with self.timings.phase("load shard"):
+                entries = self.read_shard(stub.shard_file)
+            self.shard_entries[stub.shard_file] = entries
+        entry = entries.get(stub.name)
+        if not isinstance(entry, DatabaseEntry) or entry.name != stub.name:
+            raise DataBaseCryptException(
+                "shard of entry {} is corrupted".format(stub.name)
+            )
+        return entry
+
+    def preload(self, entries):
+        """
+        Decrypt in parallel the shards holding the stubs among entries, before
+        they are loaded one by one.
+        """
+        if not self.shard_handles:
+            return
+        shard_files = {
+            entry.shard_file
+            for entry in entries
+            if isinstance(entry, ShardStub) and entry.loader is self
+        }
+        shard_files = sorted(shard_files - self.shard_entries.keys())
+        if shard_files:
+            with self.timings.phase("load shards"):
+                loaded = self.map_in_parallel(self.read_shard, shard_files)
+            self.shard_entries.update(zip(shard_files, loaded))
+
+    def map_in_parallel(self, function, items):
+        """
+        Return the results of function called on every item. The first call
+        happens in the calling thread so that the interceptor sets itself up, such
+        as deriving its key or finding the gpg program, only once. The other
+        calls are spread over self.workers threads, the decryption and
+        encryption releasing the global interpreter lock.
+        """
+        results = [function(items[0])]
+        if self.workers > 1 and len(items) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(min(self.workers, len(items) - 1)) as executor:
+                results.extend(executor.map(function, items[1:]))
+        else:
+            results.extend(map(function, items[1:]))
+        return results
+
+    def forget_saved(self, name):
+        if self.shard_files:
+            self.shard_files[sharded.shard_of(name, len(self.shard_files))] = None
+
+    def write_entries(self, db):
+        """
+        Only the shards holding entries that changed since they were written are
+        encrypted again, in parallel, along with the manifest. When the database
+        is not a sharded directory yet, or had another number of shards, every
+        shard is written to a new directory then moved over the database.
+        """
+        shard_files = list(self.shard_files)
+        if (
+            len(shard_files) != self.shards
+            or not os.path.isdir(self.db_path)
+            or db.unknown_changes
+        ):
+            shard_files = [None] * self.shards
+        else:
+            for name in db.changeset.names():
+                shard_files[sharded.shard_of(name, self.shards)] = None
+
+        shards = [list() for _ in range(self.shards)]
+        for entry in db.db.values():
+            shards[sharded.shard_of(entry.name, self.shards)].append(entry)
+        changed = [shard for shard, file in enumerate(shard_files) if file is None]
+        preload_stubs(list(itertools.chain.from_iterable(shards[i] for i in changed)))
+
+        if os.path.isdir(self.db_path):
+            directory = self.db_path
+        else:
+            directory = tempfile.mkdtemp(
+                dir=os.path.dirname(self.db_path),
+                prefix=".pwdmanager-",
+            )
+
+        def write_shard(shard):
+            plaintext = join_chunks(self.encode_entries(shards[shard]))
+            shard_file = sharded.new_shard_file(shard)
+            with open(os.path.join(directory, shard_file), "wb") as f:
+                f.write(self.interceptor.at_save_time(plaintext))
+                f.flush()
+                os.fsync(f.fileno())
+            return shard_file
+
+        try:
+            with self.timings.phase("write shards"):
+                if changed:
+                    written = self.map_in_parallel(write_shard, changed)
+                    for shard, shard_file in zip(changed, written):
+                        shard_files[shard] = shard_file
+
+            with self.timings.phase("encrypt"):
+                manifest = self.interceptor.at_save_time(
+                    json.dumps(
+                        {
+                            "version": 1,
+                            "binary": self.binary,
+                            "shards": shard_files,
+                            "entries": [
+                                (entry.name, list(entry.aliases), list(entry.tags))
+                                for entry in db.db.values()
+                            ],
+                        }
+                    )
+                )
+            with self.timings.phase("write"):
+                manifest_path = os.path.join(directory, sharded.MANIFEST)
+                with write_atomically(manifest_path) as manifest_file:
+                    manifest_file.write(manifest)
+        except BaseException:
+            if directory != self.db_path:
+                shutil.rmtree(directory)
+            raise
+
+        if directory != self.db_path:
+            sharded.replace(directory, self.db_path)
+        sharded.remove_unused_shards(self.db_path, shard_files)
+
+        # the stubs keep loading from the files they were loaded from
+        for shard in changed:
+            self.shard_handles[shard_files[shard]] = open(
+                os.path.join(self.db_path, shard_files[shard]), "rb"
+            )
+        self.shard_files = shard_files
@@ -0,0 +1,121 @@
+import cmd
+import shlex
+
+from pwdmanager.commands import CommandException, write_output
+from pwdmanager.database import DataBaseManager
+
+NOT_IN_SHELL = ("shell", "agent", "migrate")
+
+
+class Shell(cmd.Cmd):
+    """
+    Read commands with the syntax of the command line and execute them against
+    the database loaded by db_manager. The database is saved on save and exit,
+    and every autosave modifying commands if autosave is not 0.
+    """
+
+    intro = "type help for the list of commands, exit to save and leave"
+    prompt = "pwdmanager> "
+
+    def __init__(
+        self,
+        db_manager: DataBaseManager,
+        parser,
+        create_command,
+        autosave=0,
+        stdin=None,
+        stdout=None,
+    ):
+        super().__init__(stdin=stdin, stdout=stdout)
+        if stdin is not None:
+            self.use_rawinput = False
+        self.db_manager = db_manager
+        # the searches of a session make up for building the trigram indexes
+        self.db_manager.keep_search_indexes()
+        self.parser = parser
+        self.create_command = create_command
+        self.autosave = autosave
+        self.unsaved_modifications = 0
+
+    def write(self, message):
+        self.stdout.write(message + "\n")
+
+    def emptyline(self):
+        return False
+
+    def default(self, line):
+        try:
+            args = self.parser.parse_args(shlex.split(line))
+        except ValueError as e:
+            self.write("cannot parse command, message is: {}".format(str(e)))
+            return False
+        except SystemExit:
+            return False
+
+        command = self.create_command(args)
+        if command is None or args.command in NOT_IN_SHELL:
+            self.write("{} is not available in the shell".format(args.command))
+            return False
+
+        self.execute(command)
+        return False
+
+    def execute(self, command):
+        db = self.db_manager.db
+        recorded = db.changeset.recorded
+        try:
+            write_output(
+                self.db_manager.execute(command.check_execute_render), self.stdout
+            )
+        except CommandException as e:
+            self.write("cannot execute command, message is: {}".format(str(e)))
+
+        if db.changeset.recorded > recorded:
+            self.unsaved_modifications += 1
+            if self.autosave and self.unsaved_modifications >= self.autosave:
+                self.save()
+
+    def save(self):
+        """
+        Should the database have been saved by another process with changes
+        conflicting with the ones made in the shell, it is loaded again as that
+        process saved it and the changes of the shell are lost.
+        """
+        try:
+            saved = self.db_manager.save_db_if_needed()
+        except CommandException as e:
+            self.write(
+                "cannot save, the database was modified by another process and"
+                " loaded again, message is: {}".format(str(e))
+            )
+            saved = False
+        self.unsaved_modifications = 0
+        return saved
+
+    def do_save(self, arg):
+        """save the database"""
+        if self.save():
+            self.write("database saved")
+        else:
+            self.write("nothing to save")
+
+    def do_exit(self, arg):
+        """save the database and leave"""
+        self.save()
+        return True
+
+    do_quit = do_exit
+
+    def do_EOF(self, arg):
+        self.write("")
+        return self.do_exit(arg)
+
+    def do_help(self, arg):
+        """show the help of the shell or of a command"""
+        if arg:
+            self.default("{} --help".format(arg))
+        else:
+            self.write(self.parser.format_help())
+            self.write("shell commands:")
+            self.write("  save                  save the database")
+            self.write("  exit                  save the database and leave")
@@ -0,0 +1,120 @@
+"""
+Breakdown of the time spent in the phases of an invocation, shown by --timings.
+Phases are timed with the phase context manager of a Timings. Phases started
+inside another one are shown indented below it, and the times of the phases
+with the same name inside the same parents, such as the encryption of every
+segment, are added up.
+"""
+
+import contextlib
+import json
+import time
+
+
+class Timings:
+    """
+    on_phase_end, when set, is called with the names of each phase and its
+    parents, its duration in nanoseconds and the exception it raised if any.
+    """
+
+    def __init__(self, on_phase_end=None):
+        self.on_phase_end = on_phase_end
+        self.start = time.perf_counter_ns()
+        self.path = ()
+        # names of the phase and its parents -> [calls, nanoseconds], in the order
+        # phases first started
+        self.phases = dict()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        parent_path = self.path
+        self.path = parent_path + (name,)
+        totals = self.phases.setdefault(self.path, [0, 0])
+        start = time.perf_counter_ns()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            nanoseconds = time.perf_counter_ns() - start
+            totals[0] += 1
+            totals[1] += nanoseconds
+            if self.on_phase_end:
+                self.on_phase_end(self.path, nanoseconds, error)
+            self.path = parent_path
+
+    def add(self, name, nanoseconds):
+        """
+        Add a call of the phase name, inside the current phases, timed by the
+        caller, such as the steps of a generator consumed inside another phase.
+        """
+        path = self.path + (name,)
+        totals = self.phases.setdefault(path, [0, 0])
+        totals[0] += 1
+        totals[1] += nanoseconds
+        if self.on_phase_end:
+            self.on_phase_end(path, nanoseconds, None)
+
+    def sorted_phases(self):
+        """
+        Phases in the order they first started, each one followed by the phases
+        started inside it.
+        """
+        order = {path: index for index, path in enumerate(self.phases)}
+        return sorted(
+            self.phases.items(),
+            key=lambda item: [order[item[0][: i + 1]] for i in range(len(item[0]))],
+        )
+
+    def elapsed(self):
+        return time.perf_counter_ns() - self.start
+
+    def render(self, output_format="table"):
+        if output_format == "json":
+            return self.render_json()
+        return self.render_table()
+
+    def render_table(self):
+        lines = ["{:<32} {:>6} {:>12}".format("phase", "calls", "ms")]
+        for path, (calls, nanoseconds) in self.sorted_phases():
+            lines.append(
+                "{:<32} {:>6} {:>12.3f}".format(
+                    "  " * (len(path) - 1) + path[-1], calls, nanoseconds / 1e6
+                )
+            )
+        lines.append("{:<32} {:>6} {:>12.3f}".format("total", "", self.elapsed() / 1e6))
+        return "\n".join(lines)
+
+    def render_json(self):
+        return json.dumps(
+            {
+                "phases": [
+                    {
+                        "name": path[-1],
+                        "parents": list(path[:-1]),
+                        "calls": calls,
+                        "seconds": nanoseconds / 1e9,
+                    }
+                    for path, (calls, nanoseconds) in self.sorted_phases()
+                ],
+                "total_seconds": self.elapsed() / 1e9,
+            }
+        )
+
+
+class NoTimings:
+    """
+    Timings recording nothing, used when no breakdown was asked for.
+    """
+
+    def phase(self, name):
+        return NULL_PHASE
+
+    def add(self, name, nanoseconds):
+        pass
+
+
+NULL_PHASE = contextlib.nullcontext()
+NO_TIMINGS = NoTimings()
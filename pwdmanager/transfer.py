@@ -0,0 +1,258 @@
+"""
+Import and export of entries. Records are plain dicts with the keys of FIELDS,
+read and written one at a time so a whole vault never has to be held as text.
+"""
+
+import csv
+import datetime
+import json
+
+from pwdmanager.database import Database, DatabaseEntry
+
+FIELDS = (
+    "name",
+    "login",
+    "password",
+    "login_alias",
+    "aliases",
+    "tags",
+    "creation_date",
+    "last_update_date",
+)
+LIST_SEPARATOR = ";"
+BITWARDEN_FOLDER = "folder"
+NAME_CONFLICT_POLICIES = ("fail", "skip", "overwrite", "rename")
+ALIAS_CONFLICT_POLICIES = ("fail", "drop", "skip")
+
+
+class TransferException(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+        super().__init__(msg)
+
+
+def split_list(value):
+    return [item for item in (value or "").split(LIST_SEPARATOR) if item]
+
+
+def to_list(value):
+    """
+    Items of the aliases or tags of a record, a string being split on
+    LIST_SEPARATOR. None if value is neither a string nor a list of strings.
+    """
+    if value is None or isinstance(value, str):
+        return split_list(value)
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return [item for item in value if item]
+    return None
+
+
+def read_jsonl(lines):
+    for line_number, line in enumerate(lines, start=1):
+        if line.strip():
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise TransferException("line {}: {}".format(line_number, e))
+            if not isinstance(record, dict):
+                raise TransferException(
+                    "line {}: a record must be a JSON object".format(line_number)
+                )
+            yield record
+
+
+def read_csv(lines):
+    for row in csv.DictReader(lines):
+        record = dict(row)
+        record["aliases"] = split_list(row.get("aliases"))
+        record["tags"] = split_list(row.get("tags"))
+        yield record
+
+
+def read_bitwarden_csv(lines):
+    """
+    Read the CSV export of Bitwarden, only keeping login items. Folders become
+    tags.
+    """
+    for row in csv.DictReader(lines):
+        if row.get("type", "login") != "login":
+            continue
+        folder = row.get(BITWARDEN_FOLDER)
+        yield {
+            "name": row.get("name"),
+            "login": row.get("login_username"),
+            "password": row.get("login_password"),
+            "tags": [folder] if folder else [],
+        }
+
+
+READERS = {"jsonl": read_jsonl, "csv": read_csv, "bitwarden": read_bitwarden_csv}
+
+
+def entry_to_record(entry: DatabaseEntry):
+    return {
+        "name": entry.name,
+        "login": entry.login,
+        "password": entry.pwd,
+        "login_alias": entry.login_alias,
+        "aliases": sorted(entry.aliases),
+        "tags": sorted(entry.tags),
+        "creation_date": entry.creation_date,
+        "last_update_date": entry.last_update_date,
+    }
+
+
+def write_jsonl(entries, output):
+    count = 0
+    for entry in entries:
+        output.write(json.dumps(entry_to_record(entry)) + "\n")
+        count += 1
+    return count
+
+
+def write_csv(entries, output):
+    writer = csv.DictWriter(output, FIELDS)
+    writer.writeheader()
+    count = 0
+    for entry in entries:
+        record = entry_to_record(entry)
+        record["aliases"] = LIST_SEPARATOR.join(record["aliases"])
+        record["tags"] = LIST_SEPARATOR.join(record["tags"])
+        writer.writerow(record)
+        count += 1
+    return count
+
+
+WRITERS = {"jsonl": write_jsonl, "csv": write_csv}
+
+
+def record_to_entry(record):
+    """
+    Return the entry described by record, or None if it lacks a name, login or
+    password, if its other fields are neither strings nor None or if its aliases
+    or tags are not lists.
+    """
+    if not all(isinstance(record.get(key), str) for key in ("name", "login")):
+        return None
+    if not all(
+        isinstance(record.get(key), (str, type(None)))
+        for key in ("login_alias", "creation_date", "last_update_date")
+    ):
+        return None
+    if not record["name"] or not record["login"] or not record.get("password"):
+        return None
+    aliases = to_list(record.get("aliases"))
+    tags = to_list(record.get("tags"))
+    if aliases is None or tags is None:
+        return None
+
+    entry = DatabaseEntry(
+        record["name"],
+        record["login"],
+        str(record["password"]),
+        record.get("login_alias") or None,
+    )
+    entry.aliases = aliases
+    entry.tags = tags
+    now = datetime.datetime.now().isoformat()
+    entry.creation_date = record.get("creation_date") or now
+    entry.last_update_date = record.get("last_update_date") or entry.creation_date
+    return entry
+
+
+class Importer:
+    """
+    Add the entries of a stream of records to a database, solving the names and
+    aliases already used according to the conflict policies:
+
+    - on name conflict: fail, skip the record, overwrite the existing entry or
+      rename the imported one with a numeric suffix
+    - on alias conflict: fail, drop the conflicting alias or skip the record
+    """
+
+    def __init__(
+        self, database: Database, on_name_conflict="fail", on_alias_conflict="fail"
+    ):
+        if on_name_conflict not in NAME_CONFLICT_POLICIES:
+            raise ValueError("unknown name conflict policy " + on_name_conflict)
+        if on_alias_conflict not in ALIAS_CONFLICT_POLICIES:
+            raise ValueError("unknown alias conflict policy " + on_alias_conflict)
+
+        self.database = database
+        self.on_name_conflict = on_name_conflict
+        self.on_alias_conflict = on_alias_conflict
+        self.counts = dict.fromkeys(
+            ("imported", "overwritten", "renamed", "skipped", "invalid"), 0
+        )
+
+    def import_records(self, records):
+        for record in records:
+            self.import_record(record)
+        return self.counts
+
+    def import_record(self, record):
+        entry = record_to_entry(record)
+        if entry is None:
+            self.counts["invalid"] += 1
+            return
+
+        outcome = "imported"
+        # name of the entry overwritten
+        replaced = None
+        if entry.name in self.database:
+            if self.on_name_conflict == "fail":
+                raise TransferException(
+                    "name {} already exists in database".format(entry.name)
+                )
+            elif self.on_name_conflict == "skip":
+                self.counts["skipped"] += 1
+                return
+            elif self.on_name_conflict == "overwrite":
+                if entry.name not in self.database.db:
+                    raise TransferException(
+                        "name {} is an alias of entry {}".format(
+                            entry.name, self.database.find(entry.name).name
+                        )
+                    )
+                replaced = entry.name
+                outcome = "overwritten"
+            else:
+                entry.name = self.free_name(entry.name)
+                outcome = "renamed"
+
+        conflicting_aliases = {
+            alias
+            for alias in entry.aliases
+            if alias == entry.name
+            or (alias in self.database and self.database.find(alias).name != replaced)
+        }
+        if conflicting_aliases:
+            if self.on_alias_conflict == "fail":
+                raise TransferException(
+                    "aliases {} already exist in database".format(
+                        ", ".join(sorted(conflicting_aliases))
+                    )
+                )
+            elif self.on_alias_conflict == "skip":
+                self.counts["skipped"] += 1
+                return
+            else:
+                entry.aliases = entry.aliases - conflicting_aliases
+
+        if replaced is not None:
+            del self.database[replaced]
+        self.database.add_entry(entry)
+        self.counts[outcome] += 1
+
+    def free_name(self, name):
+        suffix = 2
+        while "{}-{}".format(name, suffix) in self.database:
+            suffix += 1
+        return "{}-{}".format(name, suffix)
+
+
+def render_import_counts(counts):
+    return (
+        "{imported} entries imported, {overwritten} overwritten, {renamed} renamed,"
+        " {skipped} skipped, {invalid} invalid records ignored".format(**counts)
+    )
@@ -0,0 +1,192 @@
+import os
+import stat
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from pwdmanager import agent, commands, database, locking
+
+
+def test_get_socket_path(tmpdir, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", tmpdir.strpath)
+    socket_path = agent.get_socket_path("database")
+    assert os.path.dirname(socket_path) == tmpdir.strpath
+    assert socket_path == agent.get_socket_path(os.path.abspath("database"))
+    assert socket_path != agent.get_socket_path("other_database")
+
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    monkeypatch.setattr(agent.tempfile, "gettempdir", lambda: tmpdir.strpath)
+    runtime_dir = os.path.dirname(agent.get_socket_path("database"))
+    assert stat.S_IMODE(os.stat(runtime_dir).st_mode) == 0o700
+
+
+def test_encode_decode_command():
+    command = commands.UpdateEntry("name")
+    command.add_aliases = ["alias"]
+    command.pwd = "pwd"
+
+    decoded = agent.decode_command(agent.encode_command(command))
+    assert isinstance(decoded, commands.UpdateEntry)
+    assert vars(decoded) == vars(command)
+
+    with pytest.raises(agent.AgentException):
+        agent.decode_command({"command": "Command", "attributes": {}})
+    for request in (
+        {"command": "ShowEntry"},
+        {"command": "ShowEntry", "attributes": ["name"]},
+        {"command": "ShowEntry", "attributes": {}},
+        {"command": "ShowEntry", "attributes": {"search": "name", "other": 1}},
+        {"command": "AddEntry", "attributes": {"name": "n", "login": "l", "pwd": "p"}},
+    ):
+        with pytest.raises(agent.AgentException):
+            agent.decode_command(request)
+
+
+def test_execute_without_agent(tmpdir):
+    socket_path = tmpdir.join("agent.sock").strpath
+    assert agent.execute_in_agent(socket_path, commands.ShowEntry("name")) is None
+    assert not agent.is_agent_running(socket_path)
+    assert not agent.stop_agent(socket_path)
+
+
+class TestAgent:
+    @pytest.fixture(name="running_agent")
+    def running_agent_fixture(self, tmpdir):
+        db_path = tmpdir.join("database").strpath
+        db_manager = database.DataBaseManager(
+            database.DBLoader(db_path), lock=locking.DatabaseLock(db_path)
+        )
+        db_manager.init_db()
+        db_agent = agent.Agent(
+            db_manager, tmpdir.join("agent.sock").strpath, save_delay=0.2
+        )
+        server = db_agent.bind()
+        thread = threading.Thread(target=db_agent.serve, args=(server,))
+        thread.start()
+        yield db_agent
+        agent.stop_agent(db_agent.socket_path)
+        thread.join(5)
+        assert not thread.is_alive()
+
+    def test_socket_permissions(self, running_agent):
+        mode = os.stat(running_agent.socket_path).st_mode
+        assert stat.S_IMODE(mode) == 0o600
+        with pytest.raises(agent.AgentException):
+            running_agent.bind()
+
+    def test_execute(self, running_agent):
+        socket_path = running_agent.socket_path
+        add = commands.AddEntry("name", "login", "pwd")
+        add.aliases = ["alias"]
+        output = agent.execute_in_agent(socket_path, add)
+        assert output == add.render(add)
+
+        output = agent.execute_in_agent(socket_path, commands.ShowEntry("alias"))
+        assert "password: pwd" in output
+
+        with pytest.raises(commands.CommandException, match=".*exists.*"):
+            agent.execute_in_agent(socket_path, add)
+
+        list_entries = commands.ListEntries(None)
+        list_entries.output_format = "tsv"
+        list_entries.fields = ["name", "aliases"]
+        output = agent.execute_in_agent(socket_path, list_entries)
+        assert output == "name\talias"
+
+    def test_malformed_request(self, running_agent):
+        socket_path = running_agent.socket_path
+        for request in (
+            {"command": "ShowEntry"},
+            {"command": "RemoveEntry", "attributes": {"name": ["name"]}},
+            ["ShowEntry"],
+        ):
+            assert "error" in agent.send_request(socket_path, request)
+        assert agent.is_agent_running(socket_path)
+
+    def test_saved_by_another_process(self, running_agent):
+        running_agent.save_delay = 60
+        socket_path = running_agent.socket_path
+        agent.execute_in_agent(socket_path, commands.AddEntry("name", "l", "p"))
+
+        db_loader = running_agent.db_manager.db_loader
+        other = database.DataBaseManager(
+            database.DBLoader(db_loader.db_path),
+            lock=locking.DatabaseLock(db_loader.db_path),
+        )
+        other.load_db()
+        other.execute(commands.AddEntry("other", "l", "p").check_execute_render)
+        other.save_db()
+
+        list_entries = commands.ListEntries(None)
+        list_entries.output_format = "tsv"
+        list_entries.fields = ["name"]
+        output = agent.execute_in_agent(socket_path, list_entries)
+        assert output.split("\n") == ["other", "name"]
+        assert agent.stop_agent(socket_path)
+        time.sleep(0.2)
+        assert len(db_loader.load_db()) == 2
+
+    def test_debounced_save(self, running_agent):
+        socket_path = running_agent.socket_path
+        db_loader = running_agent.db_manager.db_loader
+        agent.execute_in_agent(socket_path, commands.AddEntry("name", "l", "p"))
+        agent.execute_in_agent(socket_path, commands.AddEntry("other", "l", "p"))
+        assert len(db_loader.load_db()) == 0
+
+        time.sleep(0.5)
+        assert len(db_loader.load_db()) == 2
+        assert not running_agent.db_manager.db.modified
+
+    def test_save_on_stop(self, running_agent):
+        running_agent.save_delay = 60
+        socket_path = running_agent.socket_path
+        agent.execute_in_agent(socket_path, commands.AddEntry("name", "l", "p"))
+        assert agent.stop_agent(socket_path)
+        time.sleep(0.2)
+        assert not os.path.exists(socket_path)
+        assert len(running_agent.db_manager.db_loader.load_db()) == 1
+
+    def test_save_retried(self, running_agent):
+        socket_path = running_agent.socket_path
+        db_manager = running_agent.db_manager
+        with patch.object(
+            db_manager.db_loader, "save_db", side_effect=OSError("disk full")
+        ):
+            agent.execute_in_agent(socket_path, commands.AddEntry("name", "l", "p"))
+            assert agent.stop_agent(socket_path)
+            time.sleep(0.5)
+            # still serving, the modification is not lost
+            assert agent.is_agent_running(socket_path)
+            assert db_manager.db.modified
+        time.sleep(agent.SAVE_RETRY_DELAY + 0.5)
+        assert not os.path.exists(socket_path)
+        assert len(db_manager.db_loader.load_db()) == 1
+
+    def test_password(self, tmpdir):
+        db_manager = database.DataBaseManager(
+            database.DBLoader(tmpdir.join("database").strpath)
+        )
+        db_manager.init_db()
+        db_agent = agent.Agent(
+            db_manager, tmpdir.join("agent.sock").strpath, password="secret"
+        )
+        show = agent.encode_command(commands.ListEntries(None))
+        assert "output" in db_agent.handle_request(show)
+        assert "output" in db_agent.handle_request(dict(show, password="secret"))
+        for password in ("wrong", 1):
+            response = db_agent.handle_request(dict(show, password=password))
+            assert response == {"error": "wrong master password"}
+
+
+def test_idle_timeout(tmpdir):
+    db_manager = database.DataBaseManager(
+        database.DBLoader(tmpdir.join("database").strpath)
+    )
+    db_manager.init_db()
+    db_agent = agent.Agent(db_manager, tmpdir.join("a.sock").strpath, idle_timeout=0.1)
+    start = time.monotonic()
+    db_agent.serve()
+    assert time.monotonic() - start < 5
+    assert not os.path.exists(db_agent.socket_path)
@@ -0,0 +1,97 @@
+import io
+
+import pytest
+
+from pwdmanager import batch, commands, database
+
+
+def test_create_command():
+    command = batch.create_command(
+        {
+            "command": "add",
+            "name": "name",
+            "login": "login",
+            "password": "pwd",
+            "aliases": ["alias"],
+        }
+    )
+    assert isinstance(command, commands.AddEntry)
+    assert (command.name, command.login, command.pwd) == ("name", "login", "pwd")
+    assert command.aliases == ["alias"]
+    assert command.tags == []
+
+    command = batch.create_command(
+        {"command": "update", "name": "name", "password": "pwd", "add_tags": ["t"]}
+    )
+    assert isinstance(command, commands.UpdateEntry)
+    assert command.pwd == "pwd"
+    assert command.login is None
+    assert command.add_tags == ["t"]
+    assert command.rm_aliases == []
+
+    command = batch.create_command({"command": "rm", "name": "name"})
+    assert isinstance(command, commands.RemoveEntry)
+    assert command.name == "name"
+
+
+def test_create_command_invalid():
+    for record in [
+        [],
+        {"name": "name"},
+        {"command": "show", "name": "name"},
+        {"command": "rm", "name": "name", "login": "login"},
+        {"command": "rm", "name": 1},
+        {"command": "add", "name": "n", "login": "l", "password": "p", "tags": "t"},
+        {"command": "update", "name": "n", "add_aliases": [1]},
+    ]:
+        with pytest.raises(batch.BatchException):
+            batch.create_command(record)
+
+
+def test_read_commands():
+    lines = io.StringIO(
+        '{"command": "rm", "name": "a"}\n\n{"command": "rm", "name": "b"}\n'
+    )
+    read_commands = batch.read_commands(lines)
+    assert [line_number for line_number, _ in read_commands] == [1, 3]
+    assert [command.name for _, command in read_commands] == ["a", "b"]
+
+    with pytest.raises(batch.BatchException, match="line 2: invalid JSON.*"):
+        batch.read_commands(['{"command": "rm", "name": "a"}', "{"])
+    with pytest.raises(batch.BatchException, match="line 1: unknown command.*"):
+        batch.read_commands(['{"command": "list"}'])
+
+
+def test_apply_commands():
+    db = database.Database()
+    read_commands = batch.read_commands(
+        [
+            '{"command": "add", "name": "a", "login": "l", "password": "p"}',
+            '{"command": "add", "name": "b", "login": "l", "password": "p"}',
+            '{"command": "update", "name": "a", "add_aliases": ["alias"]}',
+            '{"command": "update", "name": "alias", "password": "new"}',
+            '{"command": "rm", "name": "b"}',
+        ]
+    )
+    counts = batch.apply_commands(db, read_commands)
+    assert batch.render_counts(counts) == "batch applied: 2 added, 2 updated, 1 removed"
+    assert len(db) == 1
+    assert db["alias"].pwd == "new"
+    assert db.modified
+
+
+def test_apply_commands_failure():
+    for records, message in [
+        (
+            [
+                '{"command": "add", "name": "a", "login": "l", "password": "p"}',
+                '{"command": "add", "name": "a", "login": "l", "password": "p"}',
+            ],
+            "line 2: name a already exists.*",
+        ),
+        (['{"command": "update", "name": "a"}'], "line 1: no entry found.*"),
+        (['{"command": "rm", "name": "a"}'], "line 1: no entry found.*"),
+        (['{"command": "add", "name": "a", "login": "l"}'], "line 1: .*empty.*"),
+    ]:
+        with pytest.raises(batch.BatchException, match=message):
+            batch.apply_commands(database.Database(), batch.read_commands(records))
@@ -0,0 +1,76 @@
+import pytest
+
+from pwdmanager import binary
+from pwdmanager.database import DatabaseEntry
+
+
+def create_entries():
+    entries = list()
+    for name in ("name1", "name2", "nàme3"):
+        entry = DatabaseEntry(name, "login", "pwd_" + name)
+        entry.aliases = {name + "_alias", "shared"} if name != "name2" else set()
+        entry.tags = {"tag", "ünicode"}
+        entries.append(entry)
+    entries[1].login_alias = "name1"
+    return entries
+
+
+def test_round_trip():
+    entries = create_entries()
+    decoded = binary.decode(binary.encode(entries), DatabaseEntry.from_fields)
+    assert list(decoded) == [entry.name for entry in entries]
+    for entry in entries:
+        decoded_entry = decoded[entry.name]
+        for field in (
+            "name",
+            "login",
+            "pwd",
+            "login_alias",
+            "creation_date",
+            "last_update_date",
+            "aliases",
+            "tags",
+        ):
+            assert getattr(decoded_entry, field) == getattr(entry, field)
+    assert decoded["name2"].login_alias == "name1"
+    assert decoded["name1"].login_alias is None
+
+
+def test_strings_deduplicated():
+    plaintext = binary.encode(create_entries())
+    assert binary.is_binary(plaintext)
+    assert plaintext.count("ünicode".encode()) == 1
+    assert plaintext.count(b"shared") == 1
+    assert plaintext.count(b"login") == 1
+
+
+def test_iter_encode_chunks(monkeypatch):
+    monkeypatch.setattr(binary, "ENCODE_CHUNK_ITEMS", 2)
+    chunks = list(binary.iter_encode(create_entries()))
+    assert len(chunks) > 4
+    assert all(isinstance(chunk, bytes) for chunk in chunks)
+    assert b"".join(chunks) == binary.encode(create_entries())
+    decoded = binary.decode(b"".join(chunks), DatabaseEntry.from_fields)
+    assert decoded["name1"].aliases == {"name1_alias", "shared"}
+
+
+def test_empty():
+    plaintext = binary.encode([])
+    assert binary.decode(plaintext, DatabaseEntry.from_fields) == dict()
+
+
+@pytest.mark.parametrize(
+    "corrupt",
+    [
+        lambda plaintext: plaintext[:-1],
+        lambda plaintext: plaintext[: binary.HEADER.size - 1],
+        lambda plaintext: plaintext + b"\0",
+        lambda plaintext: b"NOTBIN" + plaintext[6:],
+        lambda plaintext: plaintext[:6] + b"\2\0" + plaintext[8:],
+        lambda plaintext: plaintext[:-4] + b"\xff\xff\xff\xff",
+    ],
+)
+def test_corrupted(corrupt):
+    plaintext = binary.encode(create_entries())
+    with pytest.raises(ValueError):
+        binary.decode(corrupt(plaintext), DatabaseEntry.from_fields)
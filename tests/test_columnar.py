@@ -0,0 +1,184 @@
+import pytest
+
+from pwdmanager import columnar, commands, database
+
+ENTRIES = [
+    ("mygit", set(), {"dev"}),
+    ("gitlab", set(), {"dev", "work"}),
+    ("github", {"code", "hub"}, {"dev"}),
+    ("gogs", {"gitea"}, {"home"}),
+    ("git", set(), set()),
+    ("mail", {"gmail"}, {"email", "home"}),
+]
+
+
+def create_databases():
+    databases = list()
+    for cls in (database.Database, columnar.ColumnarDatabase):
+        db = cls()
+        for name, aliases, tags in ENTRIES:
+            entry = database.DatabaseEntry(name, "login_" + name, "pwd_" + name)
+            entry.aliases = aliases
+            entry.tags = tags
+            db.add_entry(entry)
+        db.mark_saved()
+        databases.append(db)
+    return databases
+
+
+@pytest.fixture(name="db")
+def columnar_db_fixture():
+    return create_databases()[1]
+
+
+def names(entries):
+    return [entry.name for entry in entries]
+
+
+def test_same_results_as_database():
+    db, columnar_db = create_databases()
+    for part in [None, "", "git", "it", "g", "hub", "gmai", "zzz", "\0"]:
+        for tag_part in [None, "dev", "e", "hom", "zzz"]:
+            expected = names(db.iter_matching_entries(part, tag_part))
+            assert names(columnar_db.iter_matching_entries(part, tag_part)) == expected
+            assert columnar_db.count_matching_entries(part, tag_part) == len(expected)
+            assert db.count_matching_entries(part, tag_part) == len(expected)
+            if part:
+                for limit in (1, 3, 10):
+                    assert names(
+                        columnar_db.find_best_matching_entries(part, limit, tag_part)
+                    ) == names(db.find_best_matching_entries(part, limit, tag_part))
+    assert names(columnar_db.entries()) == names(db.entries())
+    assert list(columnar_db.db) == list(db.db)
+
+
+def test_lookup(db):
+    assert len(db) == 6
+    assert "hub" in db and "github" in db and "nothing" not in db
+    entry = db["hub"]
+    assert entry is db["github"]
+    assert (entry.login, entry.pwd) == ("login_github", "pwd_github")
+    assert entry.aliases == {"code", "hub"}
+    assert entry.tags == {"dev"}
+    assert db["nothing"] is None
+    assert db.db["gogs"].aliases == {"gitea"}
+
+
+def test_modifications_written_back(db):
+    entry = db["github"]
+    entry.pwd = "new_pwd"
+    assert db.changeset.modified == {"github"}
+    assert db.pwds[db.rows["github"]] == "new_pwd"
+
+    db.add_alias(entry, "octocat")
+    db.remove_alias(entry, "hub")
+    db.add_tag(entry, "work")
+    db.remove_tag(entry, "dev")
+    assert db["octocat"] is entry and "hub" not in db
+    assert names(db.iter_matching_entries("octo", "wor")) == ["github"]
+    assert names(db.iter_matching_entries("hub")) == ["github"]
+    assert names(db.iter_matching_entries("code", "dev")) == []
+
+    entry.aliases = {"octocat", "gitea"}
+    entry.tags = {"home"}
+    assert db["octocat"] is entry and "code" not in db
+    assert db["gitea"].name == "gogs"
+    assert names(db.iter_matching_entries("code")) == []
+    assert names(db.iter_matching_entries("octo", "home")) == ["github"]
+
+    # entries of a scan write back as well
+    listed = next(db.iter_matching_entries("gogs"))
+    listed.login = "new_login"
+    assert db["gogs"].login == "new_login"
+    assert db.changeset.modified == {"github", "gogs"}
+
+
+def test_add_and_remove(db):
+    replaced = db["gitlab"]
+    entry = database.DatabaseEntry("gitlab", "login", "pwd")
+    entry.aliases = {"lab"}
+    db.add_entry(entry)
+    assert db["lab"] is entry and replaced._owner is None
+    assert names(db.iter_matching_entries("git")) == [
+        "mygit",
+        "gitlab",
+        "github",
+        "gogs",
+        "git",
+    ]
+
+    assert db.__delitem__("gmail")
+    assert not db.__delitem__("gmail")
+    assert "mail" not in db and len(db) == 5
+    assert names(db.iter_matching_entries(None, "home")) == ["gogs"]
+    assert db.changeset.removed == {"mail"}
+
+    db.add_entry(database.DatabaseEntry("mail", "login", "pwd"))
+    assert names(db.entries())[-1] == "mail"
+    assert db.changeset.modified == {"gitlab", "mail"}
+
+
+def test_compaction(db):
+    entry = db["github"]
+    db.add_alias(entry, "octocat")
+    for name in ("mygit", "gitlab"):
+        del db[name]
+    assert len(db.names) == 6
+    # the tag of gogs makes the unused tags outnumber the ones in use
+    del db["gogs"]
+    assert db.names == ["github", "git", "mail"]
+    assert sorted(db.aliases) == ["code", "gmail", "hub", "octocat"]
+    assert sorted(db.tags) == ["dev", "email", "home"]
+    assert db["hub"] is entry
+    assert names(db.iter_matching_entries("mai")) == ["mail"]
+    entry.pwd = "new_pwd"
+    assert db.pwds == ["new_pwd", "pwd_git", "pwd_mail"]
+
+
+def test_compaction_of_aliases_and_tags(db):
+    entry = db["mail"]
+    for i in range(100):
+        entry.tags = {"tag{}".format(i)}
+        db.add_alias(entry, "alias{}".format(i))
+    rows = db.rows.values()
+    assert len(db.tags) <= 2 * sum(len(db.row_tags(row)) for row in rows)
+    assert len(db.aliases) <= 2 * sum(len(db.row_aliases(row)) for row in rows)
+    assert db["alias99"] is entry and entry.tags == {"tag99"}
+    assert names(db.iter_matching_entries(None, "tag99")) == ["mail"]
+
+
+def test_commands(db):
+    commands.AddEntry("new", "login", "pwd").check_execute_render(db)
+    update = commands.UpdateEntry("new")
+    update.add_aliases = ["newer"]
+    update.pwd = "new_pwd"
+    update.check_execute_render(db)
+    assert db["newer"].pwd == "new_pwd"
+    assert list(commands.ListEntries("newe").check_execute_render(db)) == [
+        "name: new\nlogin: login\npassword: new_pwd"
+    ]
+    commands.RemoveEntry("newer").check_execute_render(db)
+    assert "new" not in db
+
+
+def test_loader(tmpdir):
+    db_path = tmpdir.join("database").strpath
+    db = create_databases()[0]
+    for binary in (False, True):
+        database.DBLoader(db_path, binary=binary).save_db(db)
+        db_loader = database.DBLoader(db_path, journaling=True, columnar=True)
+        loaded_db = db_loader.load_db()
+        assert isinstance(loaded_db, columnar.ColumnarDatabase)
+        assert loaded_db["hub"].pwd == "pwd_github"
+        lazy_db = database.DBLoader(db_path, columnar=True, lazy=True).load_db()
+        assert lazy_db["hub"].pwd == "pwd_github"
+
+        loaded_db["hub"].pwd = "new_pwd"
+        del loaded_db["mail"]
+        db_loader.save_db(loaded_db)
+        loaded_db = database.DBLoader(db_path, columnar=True).load_db()
+        assert loaded_db["hub"].pwd == "new_pwd" and "mail" not in loaded_db
+
+        loaded_db.modified = True
+        database.DBLoader(db_path, binary=binary).save_db(loaded_db)
+        assert database.DBLoader(db_path).load_db()["hub"].pwd == "new_pwd"
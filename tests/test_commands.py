@@ -1,8 +1,11 @@
+import io
+import json
 from unittest.mock import MagicMock
 
 import pytest
 
 from pwdmanager import commands, database
+from pwdmanager.timings import Timings
 
 
 class TestCreateEntry:
@@ -28,7 +31,7 @@ class TestCreateEntry:
         com = commands.AddEntry("alias", "login", "pwd")
         com.perform_checks(db)
 
-        db["name"].aliases = ["alias"]
+        db.add_alias(db["name"], "alias")
         with pytest.raises(commands.CommandException, match=".*exists.*"):
             com.perform_checks(db)
 
@@ -48,8 +51,8 @@ class TestCreateEntry:
         assert entry.login == "login"
         assert entry.pwd == "pwd"
         assert entry.login_alias == "login_alias"
-        assert entry.aliases == alias_list
-        assert entry.tags == tag_list
+        assert entry.aliases == set(alias_list)
+        assert entry.tags == set(tag_list)
         assert entry.creation_date
         assert entry.last_update_date
 
@@ -68,6 +71,19 @@ class TestCreateEntry:
         command.render.assert_called_with("execute_returned")
         assert res == "render_returned"
 
+    def test_check_execute_render_timings(self):
+        timings = Timings()
+        output = commands.ListEntries("name").check_execute_render(
+            database.Database(), timings
+        )
+        assert list(timings.phases) == [("checks",), ("execute",), ("render",)]
+
+        # the lines are rendered as they are written
+        with timings.phase("output"):
+            assert list(output) == ["no match"]
+        assert list(timings.phases)[3:] == [("output",), ("output", "render")]
+        assert timings.phases[("output", "render")][0] == 1
+
 
 class TestShowEntry:
     def test_perform_checks(self):
@@ -95,7 +111,7 @@ class TestShowEntry:
         assert com.execute(db) == search_entry
         com.search = "search_alias"
         assert not com.execute(db)
-        test_entry.aliases.add("search_alias")
+        db.add_alias(test_entry, "search_alias")
         assert com.execute(db) == test_entry
 
     def test_render(self):
@@ -110,25 +126,108 @@ class TestListEntries:
         com = commands.ListEntries("search")
         com.perform_checks(None)
 
+        for args, kwargs in (
+            ((None,), {"fuzzy": True}),
+            (("search",), {"limit": 0}),
+        ):
+            with pytest.raises(commands.CommandException):
+                commands.ListEntries(*args, **kwargs).perform_checks(None)
+
+        for attribute, value in (
+            ("offset", -1),
+            ("output_format", "xml"),
+            ("fields", []),
+            ("fields", ["name", "pwd"]),
+        ):
+            com = commands.ListEntries("search")
+            setattr(com, attribute, value)
+            with pytest.raises(commands.CommandException):
+                com.perform_checks(None)
+
+    def test_execute_limit(self):
+        db = database.Database(dict())
+        for name in ("mygit", "gitlab", "github", "git"):
+            db.add_entry(database.DatabaseEntry(name, None, None))
+
+        com = commands.ListEntries("git", limit=2)
+        assert [entry.name for entry in com.execute(db)] == ["mygit", "gitlab"]
+        com.offset = 1
+        assert [entry.name for entry in com.execute(db)] == ["gitlab", "github"]
+        com.fuzzy = True
+        assert [entry.name for entry in com.execute(db)] == ["gitlab", "github"]
+        com.offset = 0
+        assert [entry.name for entry in com.execute(db)] == ["git", "gitlab"]
+        com.limit = None
+        assert len(list(com.execute(db))) == 4
+        com.offset = 3
+        assert [entry.name for entry in com.execute(db)] == ["mygit"]
+
     def test_execute(self):
         db = database.Database(dict())
         com = commands.ListEntries("search")
-        assert not com.execute(db)
+        assert not list(com.execute(db))
 
-        db.find_matching_entries = MagicMock()
-        db.find_matching_entries.return_value = "returned"
+        db.iter_matching_entries = MagicMock()
+        db.iter_matching_entries.return_value = iter(["returned"])
 
-        assert com.execute(db) == "returned"
+        assert list(com.execute(db)) == ["returned"]
+
+    def test_execute_lazily(self):
+        db = database.Database(dict())
+        db.iter_matching_entries = MagicMock()
+        db.iter_matching_entries.return_value = iter([])
+        commands.ListEntries("search").execute(db)
+        db.iter_matching_entries.assert_called_with("search", None)
 
     def test_render(self):
         com = commands.ListEntries("search")
-        assert com.render(None)
-        assert com.render(
-            [
-                database.DatabaseEntry("n", "l", "p"),
-                database.DatabaseEntry("nn", "ll", "pp"),
-            ]
-        )
+        assert list(com.render([])) == ["no match"]
+        assert "\n".join(
+            com.render(
+                [
+                    database.DatabaseEntry("n", "l", "p"),
+                    database.DatabaseEntry("nn", "ll", "pp"),
+                ]
+            )
+        ) == ("name: n\nlogin: l\npassword: p\n\nname: nn\nlogin: ll\npassword: pp")
+
+    def test_render_formats(self):
+        entry = database.DatabaseEntry("n", "l", "p\tw", login_alias="la")
+        entry.aliases = {"b", "a"}
+        com = commands.ListEntries("search")
+        com.fields = ["name", "login_alias", "aliases", "tags"]
+        assert list(com.render([entry])) == [
+            "name: n\nlogin alias: la\naliases: a, b\ntags: "
+        ]
+
+        com.output_format = "jsonl"
+        assert list(com.render([])) == []
+        assert [json.loads(line) for line in com.render([entry])] == [
+            {"name": "n", "login_alias": "la", "aliases": ["a", "b"], "tags": []}
+        ]
+
+        com.output_format = "tsv"
+        com.fields = ["name", "password", "aliases", "creation_date"]
+        assert list(com.render([entry])) == ["n\tp\\tw\ta;b\t"]
+
+    def test_render_consumes_lazily(self):
+        def entries():
+            yield database.DatabaseEntry("n", "l", "p")
+            raise AssertionError("only the first entry should be consumed")
+
+        lines = commands.ListEntries("search").render(entries())
+        assert next(lines) == "name: n\nlogin: l\npassword: p"
+
+
+def test_write_and_join_output():
+    output = io.StringIO()
+    commands.write_output("text", output)
+    commands.write_output(iter(["first", "second"]), output)
+    commands.write_output(iter([]), output)
+    assert output.getvalue() == "text\nfirst\nsecond\n"
+
+    assert commands.join_output("text") == "text"
+    assert commands.join_output(iter(["first", "second"])) == "first\nsecond"
 
 
 class TestRemoveEntry:
@@ -227,6 +326,31 @@ class TestUpdateEntry:
         assert entry.login == com.login
         assert entry.login_alias == com.login_alias
 
+    @pytest.mark.parametrize("columnar", [False, True])
+    def test_add_and_remove_alias_of_other_entry(self, columnar):
+        db = database.Database()
+        if columnar:
+            from pwdmanager.columnar import ColumnarDatabase
+
+            db = ColumnarDatabase()
+        db.add_entry(database.DatabaseEntry("entry1", "login", "pwd"))
+        entry2 = database.DatabaseEntry("entry2", "login", "pwd")
+        entry2.aliases = {"alias2"}
+        db.add_entry(entry2)
+
+        com = commands.UpdateEntry("entry1")
+        com.add_aliases = ["alias2"]
+        com.rm_aliases = ["alias2"]
+        com.perform_checks(db)
+        com.execute(db)
+        assert db["entry1"].aliases == set()
+        assert "alias2" in db
+        assert db["alias2"].name == "entry2"
+        com = commands.AddEntry("entry3", "login", "pwd")
+        com.aliases = ["alias2"]
+        with pytest.raises(commands.CommandException):
+            com.perform_checks(db)
+
     def test_render(self):
         com = commands.UpdateEntry("search")
         msg_true = com.render((True, ""))
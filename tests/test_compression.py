@@ -0,0 +1,41 @@
+import io
+
+import pytest
+
+from pwdmanager import compression
+
+PLAINTEXT = b'{"name": {"login": "login", "pwd": "pwd"}}' * 100
+
+
+@pytest.mark.parametrize("algorithm", sorted(compression.ALGORITHMS))
+def test_compress_decompress(algorithm):
+    chunks = [PLAINTEXT[:10], b"", PLAINTEXT[10:]]
+    compressed = b"".join(compression.compress_chunks(chunks, algorithm, 1))
+    assert compressed.startswith(compression.MAGIC)
+    assert len(compressed) < len(PLAINTEXT) / 10
+    assert compression.decompress(compressed) == PLAINTEXT
+
+    stream = compression.open_decompressed(io.BytesIO(compressed))
+    assert stream.read(10) == PLAINTEXT[:10]
+    assert stream.read() == PLAINTEXT[10:]
+
+
+def test_not_compressed():
+    assert compression.decompress(PLAINTEXT) == PLAINTEXT
+    assert compression.decompress(b"{}") == b"{}"
+    stream = compression.open_decompressed(io.BytesIO(PLAINTEXT))
+    assert stream.read(3) == PLAINTEXT[:3]
+    assert stream.read() == PLAINTEXT[3:]
+    assert compression.open_decompressed(io.BytesIO(b"")).read() == b""
+
+
+def test_unknown_algorithm():
+    with pytest.raises(ValueError):
+        compression.decompress(compression.MAGIC + b"\xff" + PLAINTEXT)
+
+
+@pytest.mark.parametrize("algorithm", sorted(compression.ALGORITHMS))
+def test_corrupted(algorithm):
+    compressed = b"".join(compression.compress_chunks([PLAINTEXT], algorithm, 1))
+    with pytest.raises(compression.ERRORS):
+        compression.decompress(compressed[:-10])
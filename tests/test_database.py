@@ -1,9 +1,41 @@
 import json
+import os
 from unittest.mock import DEFAULT, MagicMock, patch
 
 import pytest
 
-from pwdmanager import database
+from pwdmanager import binary, commands, compression, database, journal, locking
+from pwdmanager.segmented_loader import SegmentedDBLoader
+from pwdmanager.sharded_loader import ShardedDBLoader, ShardStub
+from pwdmanager.timings import Timings
+
+
+class TestDatabaseEntry:
+    def test_slots(self):
+        entry = database.DatabaseEntry("name", "login", "pwd")
+        with pytest.raises(AttributeError):
+            entry.__dict__
+        with pytest.raises(AttributeError):
+            entry.unknown_attribute = "value"
+
+    def test_aliases_and_tags(self):
+        entry_1 = database.DatabaseEntry("name1", "login", "pwd")
+        entry_2 = database.DatabaseEntry("name2", "login", "pwd")
+        assert entry_1.aliases is database.EMPTY_SET
+        assert entry_1.tags is database.EMPTY_SET
+        assert entry_2.tags is entry_1.tags
+
+        entry_1.tags = ["".join(["t", "ag"])]
+        entry_2.tags = {"".join(["ta", "g"])}
+        assert entry_1.tags == {"tag"}
+        assert isinstance(entry_1.tags, frozenset)
+        assert next(iter(entry_1.tags)) is next(iter(entry_2.tags))
+
+        entry_1.aliases = ["alias"]
+        assert entry_1.aliases == {"alias"}
+        assert isinstance(entry_1.aliases, frozenset)
+        entry_1.aliases = []
+        assert entry_1.aliases is database.EMPTY_SET
 
 
 class TestDatabase:
@@ -23,22 +55,46 @@ class TestDatabase:
         assert db["test_name"] is None
         assert "test_name" not in db
         entry = database.DatabaseEntry("test_name", None, None)
-        db.db["test_name"] = entry
+        db.add_entry(entry)
         assert db["test_name"] == entry
         assert "test_name" in db
 
         assert db["alias"] is None
         assert "alias" not in db
-        entry.aliases = ["alias"]
+        db.add_alias(entry, "alias")
         assert db["alias"] == entry
         assert "alias" in db
 
         assert db["alias2"] is None
         assert "alias2" not in db
-        entry.aliases.append("alias2")
+        db.add_alias(entry, "alias2")
         assert db["alias2"] == entry
         assert "alias2" in db
 
+    def test_alias_index_built_at_init(self):
+        entry = database.DatabaseEntry("name", None, None)
+        entry.aliases = {"alias1", "alias2"}
+        db = database.Database({"name": entry})
+        assert db["alias1"] == entry
+        assert db["alias2"] == entry
+        assert "alias1" in db
+        assert not db.modified
+
+    def test_remove_alias(self, db):
+        entry = database.DatabaseEntry("name", None, None)
+        db.add_entry(entry)
+        db.add_alias(entry, "alias")
+        db.modified = False
+
+        db.remove_alias(entry, "unknown")
+        assert not db.modified
+
+        db.remove_alias(entry, "alias")
+        assert db.modified
+        assert entry.aliases == set()
+        assert db["alias"] is None
+        assert "alias" not in db
+
     def test_del_item(self, db):
         entry = database.DatabaseEntry("name", None, None)
         db.add_entry(entry)
@@ -50,9 +106,58 @@ class TestDatabase:
         assert not db.__delitem__("alias")
         assert len(db) == 1
 
-        entry.aliases.add("alias")
+        db.add_alias(entry, "alias")
         assert db.__delitem__("alias")
         assert len(db) == 0
+        assert "alias" not in db
+        assert db.alias_index == dict()
+
+    def test_changeset(self, db):
+        entry = database.DatabaseEntry("name", None, None)
+        db.add_entry(entry)
+        db.add_entry(database.DatabaseEntry("other", None, None))
+        assert db.changeset.added == {"name", "other"}
+        db.mark_saved()
+        assert not db.modified
+        assert not db.changeset
+
+        entry.pwd = "pwd"
+        assert db.modified
+        assert db.changeset.modified == {"name"}
+        del db["other"]
+        assert db.changeset.removed == {"other"}
+        db.add_entry(database.DatabaseEntry("other", None, None))
+        db.add_entry(database.DatabaseEntry("new", None, None))
+        db.add_entry(database.DatabaseEntry("removed", None, None))
+        del db["removed"]
+        assert db.changeset.added == {"new"}
+        assert db.changeset.modified == {"name", "other"}
+        assert db.changeset.removed == set()
+        assert db.changeset.names() == {"name", "other", "new"}
+
+    def test_changeset_ignores_foreign_entries(self, db):
+        entry = database.DatabaseEntry("name", None, None)
+        entry.pwd = "pwd"
+        db.add_entry(entry)
+        replacement = database.DatabaseEntry("name", None, None)
+        db.add_entry(replacement)
+        db.mark_saved()
+
+        entry.pwd = "other pwd"
+        assert not db.modified
+        replacement.login = "login"
+        assert db.changeset.modified == {"name"}
+
+    def test_modified_setter(self, db):
+        db.modified = True
+        assert db.modified
+        assert db.unknown_changes
+        assert not db.changeset
+
+        db.add_entry(database.DatabaseEntry("name", None, None))
+        db.modified = False
+        assert not db.modified
+        assert not db.changeset
 
     def test_add_entry(self, db):
         assert len(db) == 0
@@ -63,6 +168,77 @@ class TestDatabase:
         assert db.modified
         assert db["test_name"] == entry
 
+    def test_add_entry_replaces_aliases(self, db):
+        entry = database.DatabaseEntry("name", None, None)
+        entry.aliases = {"old_alias"}
+        db.add_entry(entry)
+
+        replacement = database.DatabaseEntry("name", None, None)
+        replacement.aliases = {"new_alias"}
+        db.add_entry(replacement)
+        assert "old_alias" not in db
+        assert db["new_alias"] == replacement
+
+    def test_tags(self, db):
+        entry = database.DatabaseEntry("name", None, None)
+        db.add_entry(entry)
+        db.modified = False
+
+        db.remove_tag(entry, "unknown")
+        assert not db.modified
+
+        db.add_tag(entry, "email")
+        assert db.modified
+        assert entry.tags == {"email"}
+        assert db.find_matching_entries(None, "mai") == [entry]
+
+        db.remove_tag(entry, "email")
+        assert entry.tags == set()
+        assert not db.find_matching_entries(None, "mai")
+
+    def test_search_indexes(self, db):
+        entry = database.DatabaseEntry("name", None, None)
+        db.add_entry(entry)
+        db.add_alias(entry, "alias")
+        assert db["alias"] == entry
+        assert db.find_matching_entries(None) == [entry]
+        assert db.find_matching_entries("lia") == [entry]
+        assert db.find_best_matching_entries("alia", 1) == [entry]
+        assert db.name_index is None
+
+        db.build_search_indexes()
+        assert db.name_index is not None
+        assert db.find_matching_entries("lia") == [entry]
+        assert db.find_best_matching_entries("alia", 1) == [entry]
+        db.add_tag(entry, "tag")
+        db.remove_alias(entry, "alias")
+        assert db.find_matching_entries(None, "tag") == [entry]
+        assert not db.find_matching_entries("lia")
+
+    @pytest.mark.parametrize("search_indexes", [False, True])
+    def test_assigned_aliases_and_tags_indexed(self, db, search_indexes):
+        entry = database.DatabaseEntry("name", None, None)
+        entry.aliases = {"old"}
+        db.add_entry(entry)
+        other = database.DatabaseEntry("other", None, None)
+        other.aliases = {"taken"}
+        db.add_entry(other)
+        if search_indexes:
+            db.build_search_indexes()
+        db.mark_saved()
+
+        entry.aliases = {"new_alias", "taken"}
+        entry.tags = {"tag"}
+        assert db.changeset.modified == {"name"}
+        assert db["new_alias"] == entry and "old" not in db
+        assert db["taken"] == other
+        assert db.find_matching_entries("new_ali") == [entry]
+        assert not db.find_matching_entries("old")
+        assert db.find_matching_entries(None, "tag") == [entry]
+
+        entry.tags = set()
+        assert not db.find_matching_entries(None, "tag")
+
     def test_filter_with_name_or_alias_part(self):
         assert not database.Database.filter_with_name_or_alias_part("st", list())
         entry_1 = database.DatabaseEntry("test_name", None, None)
@@ -86,7 +262,7 @@ class TestDatabase:
         assert entry_1 in matching_items and entry_2 in matching_items
 
         assert not database.Database.filter_with_name_or_alias_part("lol", entries)
-        entry_1.aliases.add("ololo")
+        entry_1.aliases = {"ololo"}
         matching_items = database.Database.filter_with_name_or_alias_part(
             "lol", entries
         )
@@ -129,6 +305,102 @@ class TestDatabase:
             assert values["filter_with_name_or_alias_part"].call_count == 1
             assert values["filter_with_tag_part"].call_count == 1
 
+    def test_find_matching_entries_with_index(self, db):
+        entry_1 = database.DatabaseEntry("github", None, None)
+        entry_1.aliases = {"code"}
+        entry_1.tags = {"dev"}
+        entry_2 = database.DatabaseEntry("gitlab", None, None)
+        entry_2.tags = {"dev", "work"}
+        entry_3 = database.DatabaseEntry("mail", None, None)
+        entry_3.tags = {"email"}
+        for entry in (entry_1, entry_2, entry_3):
+            db.add_entry(entry)
+
+        assert db.find_matching_entries("git") == [entry_1, entry_2]
+        assert db.find_matching_entries("it") == [entry_1, entry_2]
+        assert db.find_matching_entries("cod") == [entry_1]
+        assert db.find_matching_entries("git", "wor") == [entry_2]
+        assert db.find_matching_entries(None, "mai") == [entry_3]
+        assert db.find_matching_entries("hub", "mai") == []
+        assert list(db.find_matching_entries(None)) == [entry_1, entry_2, entry_3]
+
+        db.add_alias(entry_3, "gitmail")
+        assert db.find_matching_entries("git") == [entry_1, entry_2, entry_3]
+        db.remove_alias(entry_3, "gitmail")
+        del db["github"]
+        assert db.find_matching_entries("git") == [entry_2]
+        assert not db.find_matching_entries("cod")
+
+        db.add_entry(entry_1)
+        assert db.find_matching_entries("git") == [entry_2, entry_1]
+
+    def test_find_best_matching_entries(self, db):
+        for name, aliases, tags in (
+            ("mygit", set(), {"dev"}),
+            ("gitlab", set(), {"dev", "work"}),
+            ("github", {"code"}, {"dev"}),
+            ("gogs", {"gitea"}, {"home"}),
+            ("git", set(), set()),
+            ("mail", set(), {"email"}),
+        ):
+            entry = database.DatabaseEntry(name, None, None)
+            entry.aliases = aliases
+            entry.tags = tags
+            db.add_entry(entry)
+
+        def names(*args):
+            return [entry.name for entry in db.find_best_matching_entries(*args)]
+
+        assert names("git", 10) == ["git", "gogs", "gitlab", "github", "mygit"]
+        assert names("git", 2) == ["git", "gogs"]
+        assert names("git", 10, "wor") == ["gitlab"]
+        assert names("githbu", 10) == ["github"]
+        assert names("gi", 10) == ["git", "gogs", "gitlab", "github", "mygit"]
+        assert names("zzz", 10) == []
+
+    def test_find_best_matching_entries_same_as_scan(self):
+        names = ["alpha", "alphabet", "beta", "gamma", "delta", "epsilon", "zeta"]
+        db = database.Database()
+        for i, name in enumerate(names):
+            entry = database.DatabaseEntry(name, None, None)
+            entry.aliases = {name[::-1], name + str(i)}
+            entry.tags = {names[(i + 1) % len(names)]}
+            db.add_entry(entry)
+
+        for part in ["a", "al", "alp", "pha", "ahpla", "alpah", "eta", "a3", "xyz"]:
+            for tag_part in [None, "lph", "et", "mma"]:
+                scored = sorted(
+                    db.score_entries(
+                        part,
+                        database.Database.filter_with_tag_part(
+                            tag_part, db.db.values()
+                        ),
+                    ),
+                    reverse=True,
+                )
+                assert db.find_best_matching_entries(part, 3, tag_part) == [
+                    entry for _, _, entry in scored[:3]
+                ]
+
+    def test_find_matching_entries_same_as_scan(self):
+        names = ["alpha", "alphabet", "beta", "gamma", "delta", "epsilon", "zeta"]
+        db = database.Database()
+        for i, name in enumerate(names):
+            entry = database.DatabaseEntry(name, None, None)
+            entry.aliases = {name[::-1], name + str(i)}
+            entry.tags = {names[(i + 1) % len(names)]}
+            db.add_entry(entry)
+
+        for part in ["a", "al", "alp", "pha", "ahpla", "ta", "eta", "a3", "xyz"]:
+            for tag_part in [None, "lph", "et", "mma"]:
+                scanned = database.Database.filter_with_tag_part(
+                    tag_part,
+                    database.Database.filter_with_name_or_alias_part(
+                        part, db.db.values()
+                    ),
+                )
+                assert list(db.find_matching_entries(part, tag_part)) == list(scanned)
+
 
 class TestDatabaseJSONEncoder:
     def test_default(self):
@@ -156,11 +428,30 @@ class TestDatabaseJSONEncoder:
         entry.tags = ["tags"]
 
         entry_as_dict = json_encoder.default(entry)
-        assert entry.aliases == entry_as_dict["aliases"]
-        assert entry.tags == entry_as_dict["tags"]
+        assert entry_as_dict["aliases"] == ["alias"]
+        assert entry_as_dict["tags"] == ["tags"]
+
+
+def test_iter_encode(monkeypatch):
+    db = database.Database()
+    for i in range(50):
+        entry = database.DatabaseEntry("name{}".format(i), "login", "pwd\u00e9")
+        entry.aliases = {"alias{}".format(i)}
+        db.add_entry(entry)
+    monkeypatch.setattr(database, "ENCODE_CHUNK_SIZE", 500)
+    chunks = list(database.iter_encode(db.db.values()))
+    assert len(chunks) > 1
+    assert "".join(chunks) == json.dumps(db, cls=database.DatabaseJSONEncoder)
+    assert "".join(database.iter_encode([])) == "{}"
 
 
 class TestPythonGnuPGCrypter:
+    def test_gpg_initialized_on_first_use(self):
+        crypter = database.PythonGnuPGCrypterInterceptor("pass")
+        assert crypter._gpg is None
+        assert crypter.decrypt(crypter.encrypt("text")) == "text"
+        assert crypter._gpg is not None
+
     def test_encrypt_decrypt(self):
         crypter = database.PythonGnuPGCrypterInterceptor("pass")
         secret = "secret"
@@ -176,6 +467,216 @@ class TestPythonGnuPGCrypter:
         with pytest.raises(database.DataBaseCryptException):
             crypter.decrypt(encrypted_secret)
 
+    def test_save_to_stream(self, tmpdir):
+        crypter = database.PythonGnuPGCrypterInterceptor("pass")
+        with open(tmpdir.join("encrypted").strpath, "w+b") as out_file:
+            crypter.save_to_stream(iter(["sec", "ret"]), out_file)
+            out_file.seek(0)
+            encrypted_secret = out_file.read()
+            out_file.seek(0)
+            with crypter.open_load_stream(out_file) as stream:
+                assert stream.read() == b"secret"
+        assert encrypted_secret.startswith(b"-----BEGIN PGP MESSAGE-----")
+        assert crypter.decrypt(encrypted_secret) == "secret"
+
+        crypter.passphrase = "wrongpass"
+        with open(tmpdir.join("encrypted").strpath, "rb") as in_file:
+            with pytest.raises(database.DataBaseCryptException):
+                with crypter.open_load_stream(in_file) as stream:
+                    stream.read()
+
+    def test_compression_disabled(self, tmpdir):
+        plaintext = "secret" * 1000
+        compressing = database.PythonGnuPGCrypterInterceptor("pass")
+        crypter = database.PythonGnuPGCrypterInterceptor("pass", compress=False)
+        encrypted_secret = crypter.encrypt(plaintext)
+        assert len(encrypted_secret) > 4 * len(compressing.encrypt(plaintext))
+        assert compressing.decrypt(encrypted_secret) == plaintext
+
+        with open(tmpdir.join("encrypted").strpath, "w+b") as out_file:
+            crypter.save_to_stream(iter([plaintext]), out_file)
+            assert out_file.tell() > len(plaintext)
+
+
+class TestCompressInterceptor:
+    def test_at_save_at_load_time(self):
+        interceptor = database.CompressInterceptor("lzma", 1)
+        compressed = interceptor.at_save_time("secret" * 100)
+        assert compressed.startswith(database.compression.MAGIC)
+        assert len(compressed) < 600
+        assert interceptor.at_load_time(compressed) == "secret" * 100
+        assert interceptor.at_load_time_bytes(b"secret") == b"secret"
+
+        with pytest.raises(database.DataBaseCryptException):
+            interceptor.at_load_time_bytes(compressed[:-5])
+
+    def test_no_compression(self):
+        interceptor = database.CompressInterceptor()
+        assert interceptor.at_save_time("secret") == b"secret"
+        compressed = database.CompressInterceptor("bz2").at_save_time("secret")
+        assert interceptor.at_load_time(compressed) == "secret"
+
+    def test_levels(self):
+        assert database.CompressInterceptor("zlib").level == 6
+        assert database.CompressInterceptor("bz2", 1).level == 1
+        with pytest.raises(database.DataBaseCryptException):
+            database.CompressInterceptor("bz2", 0)
+
+
+class TestInterceptorChain:
+    @pytest.fixture(name="chain")
+    def chain_fixture(self):
+        pytest.importorskip("cryptography")
+        return database.InterceptorChain(
+            [
+                database.CompressInterceptor("zlib"),
+                database.AESGCMCrypterInterceptor("pass", n=2**10),
+            ]
+        )
+
+    def test_at_save_at_load_time(self, chain):
+        saved = chain.at_save_time("secret" * 100)
+        assert saved.startswith(database.AEAD_MAGIC)
+        assert len(saved) < 200
+        assert chain.at_load_time(saved) == "secret" * 100
+        assert (
+            chain.interceptors[1]
+            .at_load_time_bytes(saved)
+            .startswith(database.compression.MAGIC)
+        )
+
+    def test_streams(self, chain, tmpdir):
+        with open(tmpdir.join("saved").strpath, "w+b") as out_file:
+            chain.save_to_stream(iter(["sec", "ret"] * 100), out_file)
+            out_file.seek(0)
+            with chain.open_load_stream(out_file) as stream:
+                assert stream.read() == b"secret" * 100
+
+    def test_timings(self, chain):
+        timings = Timings()
+        chain.timings = timings
+        assert all(stage.timings is timings for stage in chain.interceptors)
+
+    def test_create_interceptor(self, tmpdir):
+        db_file = tmpdir.join("database")
+        db = database.Database()
+        db.add_entry(database.DatabaseEntry("name", "login", "pwd"))
+        interceptor = database.create_interceptor("pass", "gpg", "bz2")
+        assert not interceptor.interceptors[1].compress
+        database.DBLoader(db_file.strpath, interceptor).save_db(db)
+
+        for streaming in (False, True):
+            db_loader = database.DBLoader(
+                db_file.strpath,
+                database.create_interceptor("pass", "gpg"),
+                streaming=streaming,
+            )
+            assert db_loader.load_db()["name"].pwd == "pwd"
+        assert database.create_interceptor("pass", "gpg").interceptors[1].compress
+
+
+class TestAESGCMCrypter:
+    @pytest.fixture(name="crypter")
+    def crypter_fixture(self):
+        pytest.importorskip("cryptography")
+        return database.AESGCMCrypterInterceptor("pass", n=2**10)
+
+    def test_encrypt_decrypt(self, crypter):
+        secret = "secret"
+        encrypted_secret = crypter.encrypt(secret)
+        assert isinstance(encrypted_secret, bytes)
+        assert encrypted_secret.startswith(database.AEAD_MAGIC)
+        assert secret.encode() not in encrypted_secret
+        assert crypter.encrypt(secret) != encrypted_secret
+
+        other_crypter = database.AESGCMCrypterInterceptor("pass")
+        assert other_crypter.decrypt(encrypted_secret) == secret
+        assert other_crypter.salt is None
+
+        crypter.passphrase = "wrongpass"
+        with pytest.raises(database.DataBaseCryptException):
+            crypter.decrypt(encrypted_secret)
+
+    def test_tampering(self, crypter):
+        encrypted_secret = bytearray(crypter.encrypt("secret"))
+        encrypted_secret[-1] ^= 1
+        with pytest.raises(database.DataBaseCryptException):
+            crypter.decrypt(bytes(encrypted_secret))
+
+        header = bytearray(crypter.encrypt("secret"))
+        header[20] ^= 1
+        with pytest.raises(database.DataBaseCryptException):
+            crypter.decrypt(bytes(header))
+
+        with pytest.raises(database.DataBaseCryptException):
+            crypter.decrypt(database.AEAD_MAGIC + b"short")
+
+    def test_key_derivation_limits(self, crypter):
+        with pytest.raises(database.DataBaseCryptException):
+            crypter.derive_key(b"salt", 2**30, 8, 1)
+
+    def test_reuses_salt_and_key(self, crypter):
+        encrypted_secret = crypter.encrypt("secret")
+        other_crypter = database.AESGCMCrypterInterceptor("pass", n=2**10)
+        other_crypter.decrypt(encrypted_secret)
+        assert other_crypter.salt == crypter.salt
+        other_crypter.encrypt("other secret")
+        assert len(other_crypter.keys) == 1
+
+    def test_open_load_stream(self, crypter, tmpdir):
+        db_file = tmpdir.join("encrypted")
+        db_file.write_binary(crypter.encrypt("secret"))
+        with open(db_file.strpath, "rb") as in_file:
+            with crypter.open_load_stream(in_file) as stream:
+                assert stream.read() == b"secret"
+
+        db_file.write_binary(b"")
+        with open(db_file.strpath, "rb") as in_file:
+            with pytest.raises(database.DataBaseCryptException):
+                with crypter.open_load_stream(in_file):
+                    pass
+
+    def test_reads_gpg(self, crypter, tmpdir):
+        gpg_crypter = database.PythonGnuPGCrypterInterceptor("pass")
+        assert crypter.decrypt(gpg_crypter.encrypt("secret")) == "secret"
+        assert gpg_crypter.decrypt(crypter.encrypt("secret")) == "secret"
+
+        db_file = tmpdir.join("database")
+        db = database.Database()
+        db.add_entry(database.DatabaseEntry("name", "login", "pwd"))
+        database.DBLoader(db_file.strpath, crypter).save_db(db)
+        db_loader = database.DBLoader(db_file.strpath, gpg_crypter, streaming=True)
+        assert db_loader.load_db()["name"].pwd == "pwd"
+
+
+class TestDetectedCrypter:
+    def test_keeps_loaded_crypter(self, tmpdir):
+        pytest.importorskip("cryptography")
+        crypter = database.DetectedCrypterInterceptor("pass")
+        assert not crypter.at_save_time("secret").startswith(database.AEAD_MAGIC)
+
+        aes_gcm = database.AESGCMCrypterInterceptor("pass", n=2**10)
+        assert crypter.at_load_time(aes_gcm.encrypt("secret")) == "secret"
+        assert crypter.at_save_time("secret").startswith(database.AEAD_MAGIC)
+
+        gpg = database.PythonGnuPGCrypterInterceptor("pass")
+        db_file = tmpdir.join("database")
+        db_file.write_binary(gpg.encrypt("secret"))
+        with open(db_file.strpath, "rb") as in_file:
+            with crypter.open_load_stream(in_file) as stream:
+                assert stream.read() == b"secret"
+        with open(db_file.strpath, "wb") as out_file:
+            crypter.save_to_stream(iter(["sec", "ret"]), out_file)
+        assert gpg.decrypt(db_file.read_binary()) == "secret"
+        assert crypter.crypter_name == "gpg"
+
+    def test_create_interceptor(self):
+        interceptor = database.create_interceptor("pass", compression="zlib")
+        assert isinstance(
+            interceptor.interceptors[1], database.DetectedCrypterInterceptor
+        )
+        assert not interceptor.interceptors[1].get_crypter("gpg").compress
+
 
 class TestDBLoader:
     def test_json_decode_database_entry(self):
@@ -231,6 +732,39 @@ class TestDBLoader:
         assert entry.login == db_as_dict["name"]["login"]
         assert entry.pwd == db_as_dict["name"]["pwd"]
 
+    def test_load_db_streaming(self, tmpdir):
+        db_file = tmpdir.join("database")
+        db = database.Database(dict())
+        for name in ("name1", "name2"):
+            entry = database.DatabaseEntry(name, "login", "pwd")
+            entry.aliases = {name + "_alias"}
+            db.add_entry(entry)
+
+        for interceptor in (
+            database.EncodeInterceptor(),
+            database.PythonGnuPGCrypterInterceptor("pass"),
+        ):
+            database.DBLoader(db_file.strpath, interceptor).save_db(db)
+            db_loader = database.DBLoader(db_file.strpath, interceptor, streaming=True)
+            loaded_db = db_loader.load_db()
+            assert len(loaded_db) == 2
+            assert loaded_db["name2_alias"].name == "name2"
+            assert loaded_db["name1"].pwd == "pwd"
+
+    def test_load_db_streaming_wrong_passphrase(self, tmpdir):
+        db_file = tmpdir.join("database")
+        database.DBLoader(
+            db_file.strpath, database.PythonGnuPGCrypterInterceptor("pass")
+        ).save_db(database.Database(dict()))
+
+        db_loader = database.DBLoader(
+            db_file.strpath,
+            database.PythonGnuPGCrypterInterceptor("wrongpass"),
+            streaming=True,
+        )
+        with pytest.raises(database.DataBaseCryptException):
+            db_loader.load_db()
+
     def test_save_db(self, tmpdir):
         db_file = tmpdir.join("database")
         db_loader = database.DBLoader(db_file.strpath)
@@ -246,11 +780,632 @@ class TestDBLoader:
         assert entry_as_dict["login"] == entry.login
         assert entry_as_dict["pwd"] == entry.pwd
 
+    def test_binary(self, tmpdir):
+        db_file = tmpdir.join("database")
+        db = database.Database(dict())
+        for name in ("name1", "name2"):
+            entry = database.DatabaseEntry(name, "login", "pwd_" + name)
+            entry.aliases = {name + "_alias"}
+            entry.tags = {"tag"}
+            db.add_entry(entry)
+
+        for interceptor in (
+            database.AESGCMCrypterInterceptor("pass"),
+            database.EncodeInterceptor(),
+        ):
+            database.DBLoader(db_file.strpath, interceptor, binary=True).save_db(db)
+            for streaming in (False, True):
+                db_loader = database.DBLoader(
+                    db_file.strpath, interceptor, streaming=streaming
+                )
+                loaded_db = db_loader.load_db()
+                assert db_loader.binary
+                assert loaded_db["name2_alias"].pwd == "pwd_name2"
+                assert loaded_db["name1"].tags == {"tag"}
+
+                # saved again in the format it was loaded from
+                loaded_db["name1"].pwd = "new_pwd"
+                db_loader.save_db(loaded_db)
+                assert (
+                    database.DBLoader(db_file.strpath, interceptor)
+                    .load_db()["name1"]
+                    .pwd
+                    == "new_pwd"
+                )
+        assert binary.is_binary(db_file.read_binary())
+
+    def test_symbolic_link(self, tmpdir):
+        db_file = tmpdir.join("database")
+        link = tmpdir.join("link")
+        link.mksymlinkto(db_file)
+        db = database.Database(dict())
+        db.add_entry(database.DatabaseEntry("name", "login", "pwd"))
+        for journaling in (False, True):
+            db_loader = database.DBLoader(link.strpath, journaling=journaling)
+            assert db_loader.db_path == db_file.strpath
+            assert db_loader.journal_path == db_file.strpath + ".journal"
+            db_loader.save_db(db)
+            db["name"].pwd = "pwd_{}".format(journaling)
+            db_loader.save_db(db)
+            assert link.islink()
+            loaded_db = database.DBLoader(db_file.strpath, journaling=True).load_db()
+            assert loaded_db["name"].pwd == "pwd_{}".format(journaling)
+
+    def test_json_detected(self, tmpdir):
+        db_file = tmpdir.join("database")
+        db = database.Database(dict())
+        db.add_entry(database.DatabaseEntry("name", "login", "pwd"))
+        database.DBLoader(db_file.strpath).save_db(db)
+
+        db_loader = database.DBLoader(db_file.strpath, binary=True)
+        loaded_db = db_loader.load_db()
+        assert not db_loader.binary
+        loaded_db["name"].pwd = "new_pwd"
+        db_loader.save_db(loaded_db)
+        assert json.loads(db_file.read_binary())["name"]["pwd"] == "new_pwd"
+
+    def test_migrate_serialization(self, tmpdir):
+        db_path = tmpdir.join("database").strpath
+        db = database.Database(dict())
+        for i in range(10):
+            db.add_entry(database.DatabaseEntry("name{}".format(i), "login", "pwd"))
+        ShardedDBLoader(db_path, shards=2).save_db(db)
+
+        db_manager = database.DataBaseManager(database.create_db_loader(db_path))
+        db_manager.load_db()
+        db_manager.migrate(False, shards=2, to_binary=True)
+        db_loader = database.create_db_loader(db_path)
+        assert db_loader.load_db()["name3"].login == "login"
+        assert db_loader.binary
+
+        db_manager.load_db()
+        db_manager.migrate(False, to_binary=False)
+        with open(db_path, "rb") as db_file:
+            assert json.load(db_file)["name3"]["login"] == "login"
+
+    def test_lazy(self, tmpdir):
+        db_file = tmpdir.join("database")
+        db = database.Database(dict())
+        for name in ("name1", "name2"):
+            entry = database.DatabaseEntry(name, "login", "pwd_" + name)
+            entry.aliases = {name + "_alias"}
+            entry.tags = {"tag"}
+            db.add_entry(entry)
+
+        for binary_format in (False, True):
+            database.DBLoader(db_file.strpath, binary=binary_format).save_db(db)
+            saved = db_file.read_binary()
+            for streaming in (False, True):
+                db_loader = database.DBLoader(
+                    db_file.strpath, streaming=streaming, lazy=True
+                )
+                loaded_db = db_loader.load_db()
+                assert all(
+                    isinstance(entry, database.RecordStub)
+                    for entry in loaded_db.db.values()
+                )
+                assert "name2_alias" in loaded_db
+                assert loaded_db.find("name2_alias").name == "name2"
+                assert loaded_db.count_matching_entries("name", "tag") == 2
+                assert isinstance(loaded_db.db["name2"], database.RecordStub)
+
+                # untouched entries are saved again as they were loaded
+                loaded_db.modified = True
+                db_loader.save_db(loaded_db)
+                assert db_file.read_binary() == saved
+
+                loaded_db["name1"].pwd = "new_pwd"
+                assert isinstance(loaded_db.db["name1"], database.DatabaseEntry)
+                db_loader.save_db(loaded_db)
+                reloaded_db = database.DBLoader(db_file.strpath).load_db()
+                assert reloaded_db["name1"].pwd == "new_pwd"
+                assert reloaded_db["name2"].pwd == "pwd_name2"
+                assert reloaded_db["name2"].aliases == {"name2_alias"}
+                database.DBLoader(db_file.strpath, binary=binary_format).save_db(db)
+
+    def test_lazy_migrate(self, tmpdir):
+        db_path = tmpdir.join("database").strpath
+        db = database.Database(dict())
+        for i in range(10):
+            db.add_entry(database.DatabaseEntry("name{}".format(i), "login", "pwd"))
+        database.DBLoader(db_path).save_db(db)
+
+        db_manager = database.DataBaseManager(database.DBLoader(db_path, lazy=True))
+        for to_segmented, shards in ((True, 0), (False, 2), (False, 0)):
+            db_manager.load_db()
+            db_manager.migrate(to_segmented, shards)
+            assert database.create_db_loader(db_path).load_db()["name3"].login == (
+                "login"
+            )
+
+    def test_loader_class(self, tmpdir):
+        db_path = tmpdir.join("database").strpath
+        assert database.get_loader_class(db_path) is database.DBLoader
+        db = database.Database()
+        db.add_entry(database.DatabaseEntry("name", "login", "pwd"))
+        for loader_class in (ShardedDBLoader, SegmentedDBLoader, database.DBLoader):
+            database.DBLoader(db_path).with_format(loader_class).save_db(db)
+            assert database.get_loader_class(db_path) is loader_class
+            db_loader = database.create_db_loader(db_path, lazy=True)
+            assert type(db_loader) is loader_class and db_loader.lazy
+            assert db_loader.load_db()["name"].pwd == "pwd"
+
+        SegmentedDBLoader(db_path).save_db(db)
+        with pytest.raises(database.DataBaseCryptException):
+            database.DBLoader(db_path).load_db()
+
+
+class CountingInterceptor(database.EncodeInterceptor):
+    def __init__(self):
+        self.saved = 0
+        self.loaded = 0
+
+    def at_save_time(self, plaintext: str):
+        self.saved += 1
+        return super().at_save_time(plaintext)
+
+    def at_load_time(self, loaded_bytes: bytes):
+        self.loaded += 1
+        return super().at_load_time(loaded_bytes)
+
+    def at_load_time_bytes(self, loaded_bytes: bytes):
+        self.loaded += 1
+        return super().at_load_time_bytes(loaded_bytes)
+
+
+class TestSegmentedDBLoader:
+    @pytest.fixture(name="db_path")
+    def segmented_db_fixture(self, tmpdir):
+        db_path = tmpdir.join("database").strpath
+        db = database.Database()
+        for name in ("name1", "name2", "name3"):
+            entry = database.DatabaseEntry(name, "login_" + name, "pwd_" + name)
+            entry.aliases = {name + "_alias"}
+            entry.tags = {"tag"}
+            db.add_entry(entry)
+        SegmentedDBLoader(db_path).save_db(db)
+        return db_path
+
+    def test_load_only_header(self, db_path):
+        interceptor = CountingInterceptor()
+        db_loader = database.create_db_loader(db_path, interceptor)
+        db = db_loader.load_db()
+        assert isinstance(db_loader, SegmentedDBLoader)
+        assert interceptor.loaded == 1
+        assert len(db) == 3
+        assert "name2_alias" in db
+        assert [entry.name for entry in db.find_candidate_entries("name", "tag")] == [
+            "name1",
+            "name2",
+            "name3",
+        ]
+        assert interceptor.loaded == 1
+
+        entry = db["name2_alias"]
+        assert interceptor.loaded == 2
+        assert isinstance(entry, database.DatabaseEntry)
+        assert entry.login == "login_name2"
+        assert entry.pwd == "pwd_name2"
+        assert entry.tags == {"tag"}
+        assert db["name2"] is entry
+        assert interceptor.loaded == 2
+
+        assert db.__delitem__("name3_alias")
+        assert interceptor.loaded == 2
+
+    def test_save_only_loaded_entries(self, db_path):
+        interceptor = CountingInterceptor()
+        db_loader = database.create_db_loader(db_path, interceptor)
+        db = db_loader.load_db()
+        entry = db["name1"]
+        entry.pwd = "new_pwd"
+        db.add_alias(entry, "new_alias")
+
+        db_loader.save_db(db)
+        assert interceptor.saved == 2
+
+        assert db["name3"].pwd == "pwd_name3"
+        reloaded_db = database.create_db_loader(db_path).load_db()
+        assert reloaded_db["new_alias"].pwd == "new_pwd"
+        assert reloaded_db["name2"].pwd == "pwd_name2"
+        assert reloaded_db["name3_alias"].login == "login_name3"
+
+    def test_save_only_changed_entries(self, db_path):
+        interceptor = CountingInterceptor()
+        db_loader = database.create_db_loader(db_path, interceptor)
+        db = db_loader.load_db()
+        assert db["name2"].pwd == "pwd_name2"
+        db["name1"].pwd = "new_pwd"
+
+        db_loader.save_db(db)
+        db.mark_saved()
+        assert interceptor.saved == 2
+        db_loader.save_db(db)
+        assert interceptor.saved == 3
+
+        # the segment of name3, never loaded, is encrypted again as well
+        db.modified = True
+        db_loader.save_db(db)
+        assert interceptor.saved == 7
+
+        reloaded_db = database.create_db_loader(db_path).load_db()
+        assert reloaded_db["name1"].pwd == "new_pwd"
+        assert reloaded_db["name2"].pwd == "pwd_name2"
+
+    def test_migrate_interceptor(self, tmpdir):
+        db_path = tmpdir.join("database").strpath
+        db = database.Database()
+        for name in ("name1", "name2"):
+            db.add_entry(database.DatabaseEntry(name, "login", "pwd_" + name))
+        gpg = database.create_interceptor("pass", "gpg")
+        SegmentedDBLoader(db_path, gpg).save_db(db)
+
+        db_manager = database.DataBaseManager(
+            database.create_db_loader(
+                db_path, database.create_interceptor("pass", "aes-gcm", "zlib")
+            )
+        )
+        db_manager.load_db()
+        assert db_manager.db["name1"].pwd == "pwd_name1"
+        db_manager.migrate(True)
+
+        # the segment of name2 was never loaded but is encrypted with aes-gcm too
+        aes_gcm = database.AESGCMCrypterInterceptor("pass")
+        with open(db_path, "rb") as db_file:
+            data = db_file.read()
+        for name, (offset, length) in db_manager.db_loader.segment_positions.items():
+            end = offset + length
+            segment = data[offset:end]
+            assert segment.startswith(database.AEAD_MAGIC)
+            plaintext = compression.decompress(aes_gcm.decrypt_bytes(segment))
+            assert json.loads(plaintext)["pwd"] == "pwd_" + name
+
+    def test_journaled_entries_saved_again(self, db_path):
+        interceptor = CountingInterceptor()
+        db_loader = database.create_db_loader(db_path, interceptor, journaling=True)
+        db = db_loader.load_db()
+        db["name1"].pwd = "new_pwd"
+        db_loader.save_db(db)
+        db.mark_saved()
+
+        db["name2"].pwd = "new_pwd2"
+        db_loader.save_db(db)
+
+        db = db_loader.load_db()
+        db["name3"].pwd = "new_pwd3"
+        db_loader.write_db(db)
+        reloaded_db = database.create_db_loader(db_path).load_db()
+        assert reloaded_db["name1"].pwd == "new_pwd"
+        assert reloaded_db["name2"].pwd == "new_pwd2"
+        assert reloaded_db["name3"].pwd == "new_pwd3"
+
+        db = db_loader.load_db()
+        db["name1"].pwd = "newer_pwd"
+        db_loader.save_db(db)
+        db.mark_saved()
+        db["name2"].pwd = "newer_pwd2"
+        db_loader.write_db(db)
+        reloaded_db = database.create_db_loader(db_path).load_db()
+        assert reloaded_db["name1"].pwd == "newer_pwd"
+        assert reloaded_db["name2"].pwd == "newer_pwd2"
+
+    def test_find_best_matching_entries_loads_only_best(self, db_path):
+        interceptor = CountingInterceptor()
+        db = database.create_db_loader(db_path, interceptor).load_db()
+        entries = db.find_best_matching_entries("name", 2)
+        assert [entry.name for entry in entries] == ["name1", "name2"]
+        assert interceptor.loaded == 3
+
+    def test_stubs_loaded_from_file_replaced(self, db_path):
+        db = database.create_db_loader(db_path).load_db()
+        other_db = database.create_db_loader(db_path).load_db()
+        del other_db["name1"]
+        SegmentedDBLoader(db_path).save_db(other_db)
+
+        assert db["name2"].pwd == "pwd_name2"
+        assert db["name1"].pwd == "pwd_name1"
+
+    def test_corrupted_segment(self, db_path):
+        db = database.create_db_loader(db_path).load_db()
+        stubs = db.db
+        stubs["name1"].offset, stubs["name1"].length = (
+            stubs["name2"].offset,
+            stubs["name2"].length,
+        )
+        with pytest.raises(database.DataBaseCryptException):
+            db["name1"]
+
+    def test_migrate(self, db_path):
+        db_manager = database.DataBaseManager(database.create_db_loader(db_path))
+        db_manager.load_db()
+        db_manager.migrate(False)
+        with open(db_path, "rb") as db_file:
+            db_as_dict = json.load(db_file)
+        assert db_as_dict["name1"]["pwd"] == "pwd_name1"
+        assert db_as_dict["name3"]["aliases"] == ["name3_alias"]
+
+        db_manager.load_db()
+        assert type(db_manager.db_loader) is database.DBLoader
+        db_manager.migrate(True)
+        db = database.create_db_loader(db_path).load_db()
+        assert isinstance(db.db["name1"], database.EntryStub)
+        assert db["name1_alias"].pwd == "pwd_name1"
+
+    def test_gpg(self, tmpdir):
+        db_path = tmpdir.join("database").strpath
+        interceptor = database.PythonGnuPGCrypterInterceptor("pass")
+        db = database.Database()
+        db.add_entry(database.DatabaseEntry("name", "login", "pwd"))
+        SegmentedDBLoader(db_path, interceptor).save_db(db)
+
+        with open(db_path, "rb") as db_file:
+            assert b"pwd" not in db_file.read()
+        assert (
+            database.create_db_loader(db_path, interceptor).load_db()["name"].pwd
+            == "pwd"
+        )
+
+
+class TestShardedDBLoader:
+    @pytest.fixture(name="db_path")
+    def sharded_db_fixture(self, tmpdir):
+        db_path = tmpdir.join("database").strpath
+        db = database.Database()
+        for i in range(20):
+            name = "name{}".format(i)
+            entry = database.DatabaseEntry(name, "login_" + name, "pwd_" + name)
+            entry.aliases = {name + "_alias"}
+            entry.tags = {"tag"}
+            db.add_entry(entry)
+        ShardedDBLoader(db_path, shards=4).save_db(db)
+        return db_path
+
+    @staticmethod
+    def same_shard(name, count=4):
+        return [
+            "name{}".format(i)
+            for i in range(20)
+            if database.sharded.shard_of("name{}".format(i), count)
+            == database.sharded.shard_of(name, count)
+        ]
+
+    def test_load_only_needed_shards(self, db_path):
+        interceptor = CountingInterceptor()
+        db_loader = database.create_db_loader(db_path, interceptor)
+        db = db_loader.load_db()
+        assert db_loader.shards == 4
+        assert interceptor.loaded == 1
+        assert len(db) == 20
+        assert isinstance(db.db["name1"], ShardStub)
+        entries = db.find_matching_entries("name1", "tag")
+        assert len(entries) == 11
+        assert interceptor.loaded == 1 + len(
+            {database.sharded.shard_of(entry.name, 4) for entry in entries}
+        )
+
+        db = db_loader.load_db()
+        interceptor.loaded = 0
+        entry = db["name2_alias"]
+        assert entry.pwd == "pwd_name2"
+        for name in self.same_shard("name2"):
+            assert db[name].login == "login_" + name
+        assert interceptor.loaded == 1
+
+    def test_entries_decrypt_shards_in_parallel(self, db_path):
+        interceptor = CountingInterceptor()
+        db_loader = database.create_db_loader(db_path, interceptor)
+        db_loader.workers = 4
+        db = db_loader.load_db()
+        assert sorted(entry.pwd for entry in db.entries()) == sorted(
+            "pwd_name{}".format(i) for i in range(20)
+        )
+        shards = {database.sharded.shard_of(name, 4) for name in db.db}
+        assert interceptor.loaded == 1 + len(shards)
+
+    def test_save_only_changed_shards(self, db_path):
+        interceptor = CountingInterceptor()
+        db_loader = database.create_db_loader(db_path, interceptor)
+        db = db_loader.load_db()
+        files = set(os.listdir(db_path))
+        db["name3"].pwd = "new_pwd"
+        db_loader.save_db(db)
+        assert interceptor.loaded == 2
+        assert interceptor.saved == 2
+        assert len(set(os.listdir(db_path)) - files) == 1
+        assert len(os.listdir(db_path)) == 5
+
+        db.mark_saved()
+        del db["name4"]
+        db_loader.save_db(db)
+        reloaded_db = database.create_db_loader(db_path).load_db()
+        assert len(reloaded_db) == 19
+        assert reloaded_db["name3"].pwd == "new_pwd"
+        assert "name4" not in reloaded_db
+        for name in self.same_shard("name4"):
+            if name not in ("name3", "name4"):
+                assert reloaded_db[name].pwd == "pwd_" + name
+
+    def test_journaled_entries_saved_again(self, db_path):
+        db_loader = database.create_db_loader(db_path, journaling=True)
+        db = db_loader.load_db()
+        db["name1"].pwd = "new_pwd"
+        db_loader.save_db(db)
+        assert os.path.exists(journal.get_journal_path(db_path))
+
+        db = db_loader.load_db()
+        db["name2"].pwd = "new_pwd2"
+        db_loader.write_db(db)
+        assert not os.path.exists(journal.get_journal_path(db_path))
+        reloaded_db = database.create_db_loader(db_path).load_db()
+        assert reloaded_db["name1"].pwd == "new_pwd"
+        assert reloaded_db["name2"].pwd == "new_pwd2"
+
+    def test_stubs_loaded_from_shard_replaced(self, db_path):
+        db = database.create_db_loader(db_path).load_db()
+        other_db = database.create_db_loader(db_path).load_db()
+        del other_db["name1"]
+        other_db.modified = True
+        database.create_db_loader(db_path).save_db(other_db)
+
+        assert db["name1"].pwd == "pwd_name1"
+
+    def test_migrate(self, db_path):
+        db_manager = database.DataBaseManager(database.create_db_loader(db_path))
+        db_manager.load_db()
+        db_manager.migrate(True)
+        assert os.path.isfile(db_path)
+        db = database.create_db_loader(db_path).load_db()
+        assert isinstance(db.db["name1"], database.EntryStub)
+        assert db["name1_alias"].pwd == "pwd_name1"
+
+        db_manager.load_db()
+        db_manager.migrate(False, shards=3)
+        assert len(os.listdir(db_path)) == 4
+        db_manager.load_db()
+        db_manager.migrate(False, shards=2)
+        assert len(os.listdir(db_path)) == 3
+        db = database.create_db_loader(db_path).load_db()
+        assert db["name19"].pwd == "pwd_name19"
+
+        db_manager.load_db()
+        db_manager.migrate(False)
+        with open(db_path, "rb") as db_file:
+            db_as_dict = json.load(db_file)
+        assert db_as_dict["name1"]["pwd"] == "pwd_name1"
+        assert len(os.listdir(os.path.dirname(db_path))) == 1
+
+
+class TestJournalingDBLoader:
+    @pytest.fixture(name="db_loader")
+    def db_loader_fixture(self, tmpdir):
+        db_loader = database.DBLoader(
+            tmpdir.join("database").strpath, CountingInterceptor(), journaling=True
+        )
+        db = database.Database()
+        for name in ("name1", "name2"):
+            db.add_entry(database.DatabaseEntry(name, "login_" + name, "pwd_" + name))
+        db_loader.save_db(db)
+        return db_loader
+
+    def test_save_appends_changes(self, db_loader):
+        db = db_loader.load_db()
+        db_file_size = os.path.getsize(db_loader.db_path)
+        assert not db.changeset
+
+        db["name1"].pwd = "new_pwd"
+        del db["name2"]
+        db.add_entry(database.DatabaseEntry("name3", "login_name3", "pwd_name3"))
+        db_loader.interceptor.saved = 0
+        db_loader.save_db(db)
+        db.mark_saved()
+        assert db_loader.interceptor.saved == 1
+        assert os.path.getsize(db_loader.db_path) == db_file_size
+
+        db.add_alias(db["name3"], "alias3")
+        db_loader.save_db(db)
+        assert db_loader.interceptor.saved == 2
+
+        reloaded_db = database.DBLoader(db_loader.db_path).load_db()
+        assert reloaded_db["name1"].pwd == "new_pwd"
+        assert "name2" not in reloaded_db
+        assert reloaded_db["alias3"].login == "login_name3"
+        assert not reloaded_db.modified
+
+    def test_single_record(self, db_loader):
+        db = db_loader.load_db()
+        for i in range(5):
+            db["name1"].pwd = "pwd{}".format(i)
+            db_loader.save_db(db)
+            db.mark_saved()
+        del db["name2"]
+        db_loader.save_db(db)
+        with open(db_loader.journal_path, "rb") as journal_file:
+            assert len(list(journal.read_records(journal_file))) == 1
+
+        db_loader.interceptor.loaded = 0
+        db = db_loader.load_db()
+        # the database file is streamed, only the journal record is counted
+        assert db_loader.interceptor.loaded == 1
+        assert db["name1"].pwd == "pwd4"
+        assert "name2" not in db
+        db.add_entry(database.DatabaseEntry("name2", "login", "pwd"))
+        db_loader.save_db(db)
+        reloaded_db = database.DBLoader(db_loader.db_path).load_db()
+        assert reloaded_db["name1"].pwd == "pwd4"
+        assert reloaded_db["name2"].pwd == "pwd"
+
+    def test_compaction(self, db_loader):
+        db = db_loader.load_db()
+        for i in range(2 * journal.COMPACTION_MIN_SIZE // 4096):
+            entry = database.DatabaseEntry("new{}".format(i), "login", "x" * 4096)
+            db.add_entry(entry)
+            db_loader.save_db(db)
+            db.mark_saved()
+            if not os.path.exists(db_loader.journal_path):
+                break
+
+        assert i > 0
+        assert db_loader.journal_length == 0
+        reloaded_db = database.DBLoader(db_loader.db_path).load_db()
+        assert reloaded_db[entry.name].pwd == entry.pwd
+
+    def test_replay_is_idempotent(self, db_loader):
+        db = db_loader.load_db()
+        db.add_alias(db["name1"], "alias1")
+        del db["name2"]
+        db_loader.save_db(db)
+        with open(db_loader.journal_path, "rb") as journal_file:
+            journal_bytes = journal_file.read()
+
+        db_loader.write_db(db)
+        with open(db_loader.journal_path, "wb") as journal_file:
+            journal_file.write(journal_bytes)
+        reloaded_db = database.DBLoader(db_loader.db_path).load_db()
+        assert reloaded_db["alias1"].name == "name1"
+        assert len(reloaded_db) == 1
+
+    def test_interrupted_append(self, db_loader):
+        db = db_loader.load_db()
+        db.add_alias(db["name1"], "alias1")
+        db_loader.save_db(db)
+        db.mark_saved()
+        with open(db_loader.journal_path, "ab") as journal_file:
+            journal_file.write(b"\x00\x00\x01\x00partial")
+
+        db = db_loader.load_db()
+        assert db["alias1"].name == "name1"
+        db.add_alias(db["name2"], "alias2")
+        db_loader.save_db(db)
+        reloaded_db = database.DBLoader(db_loader.db_path).load_db()
+        assert reloaded_db["alias1"].name == "name1"
+        assert reloaded_db["alias2"].name == "name2"
+
+    def test_segmented(self, db_loader):
+        db = db_loader.load_db()
+        db_loader = db_loader.with_format(SegmentedDBLoader)
+        db_loader.write_db(db)
+        db = db_loader.load_db()
+        db.add_tag(db["name1"], "tag")
+        db_loader.save_db(db)
+
+        reloaded_db = database.create_db_loader(db_loader.db_path).load_db()
+        assert reloaded_db.find_matching_entries(None, "tag")[0].name == "name1"
+        assert isinstance(reloaded_db.db["name2"], database.EntryStub)
+
+    def test_not_a_journal(self, db_loader):
+        with open(db_loader.journal_path, "wb") as journal_file:
+            journal_file.write(b"garbage")
+        with pytest.raises(database.DataBaseCryptException):
+            db_loader.load_db()
+
 
 class TestDataBaseManager:
     @pytest.fixture(name="db_manager")
-    def db_manager_fixture(self):
-        return database.DataBaseManager(MagicMock(spec=database.DBLoader))
+    def db_manager_fixture(self, tmpdir):
+        db_loader = MagicMock(spec=database.DBLoader)
+        db_loader.db_path = tmpdir.join("db").strpath
+        db_loader.with_format.return_value = db_loader
+        return database.DataBaseManager(db_loader)
 
     def test_init_db(self, db_manager):
         db = db_manager.init_db()
@@ -264,14 +1419,23 @@ class TestDataBaseManager:
         assert db == db_manager.db_loader.load_db.return_value
         assert db_manager.db == db_manager.db_loader.load_db.return_value
 
+    def test_keep_search_indexes(self, db_manager):
+        db_manager.db_loader.load_db.return_value = database.Database()
+        assert db_manager.load_db().name_index is None
+
+        db_manager.keep_search_indexes()
+        assert db_manager.db.name_index is not None
+        db_manager.db_loader.load_db.return_value = database.Database()
+        assert db_manager.load_db().name_index is not None
+
     def test_save_db(self, db_manager):
-        db = database.Database({"key": "value"})
+        db = database.Database({"key": database.DatabaseEntry("key", None, None)})
         db_manager.db = db
         db_manager.save_db()
         db_manager.db_loader.save_db.assert_called_with(db)
 
     def test_save_db_if_needed(self, db_manager):
-        db = database.Database({"key": "value"})
+        db = database.Database({"key": database.DatabaseEntry("key", None, None)})
         assert not db.modified
         db_manager.db = db
         assert not db_manager.save_db_if_needed()
@@ -279,3 +1443,56 @@ class TestDataBaseManager:
         db.modified = True
         assert db_manager.save_db_if_needed()
         assert db_manager.db_loader.save_db.called
+
+    def test_save_after_other_process(self, tmpdir):
+        db_path = tmpdir.join("db").strpath
+
+        def create_manager():
+            return database.DataBaseManager(
+                database.DBLoader(db_path, journaling=True),
+                lock=locking.DatabaseLock(db_path),
+            )
+
+        def add(name):
+            return lambda db: commands.AddEntry(name, "l", "p").check_execute_render(db)
+
+        create_manager().init_db()
+        first, second = create_manager(), create_manager()
+        first.load_db()
+        second.load_db()
+        first.execute(add("first"))
+        first.save_db()
+        second.execute(add("second"))
+        second.save_db()
+        assert (first.conflicts, second.conflicts) == (0, 1)
+        assert sorted(second.db.db) == ["first", "second"]
+
+        first.execute(add("third"))
+        second.execute(add("third"))
+        second.save_db()
+        with pytest.raises(commands.CommandException):
+            first.save_db()
+        assert sorted(first.db.db) == ["first", "second", "third"]
+        assert not first.db.modified
+
+        first.save_db_if_needed()
+        assert sorted(database.DBLoader(db_path).load_db().db) == [
+            "first",
+            "second",
+            "third",
+        ]
+
+    def test_timings(self, tmpdir):
+        timings = Timings()
+        db_loader = database.DBLoader(
+            tmpdir.join("db").strpath, database.EncodeInterceptor()
+        )
+        db_manager = database.DataBaseManager(db_loader, timings=timings)
+        db_manager.init_db()
+        db_manager.load_db()
+        db_manager.save_db()
+
+        assert ("init", "write") in timings.phases
+        assert ("load", "decrypt") in timings.phases
+        assert ("load", "decode") in timings.phases
+        assert ("save", "write") in timings.phases
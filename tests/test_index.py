@@ -0,0 +1,73 @@
+from pwdmanager import index
+
+
+def test_trigrams():
+    assert index.trigrams("ab") == set()
+    assert index.trigrams("abc") == {"abc"}
+    assert index.trigrams("abcab") == {"abc", "bca", "cab"}
+
+
+def test_similarity():
+    assert index.similarity("github", "github") == 1
+    assert index.similarity("githbu", "github") == 2 / 6
+    assert index.similarity("gi", "github") == 0
+    assert index.similarity("mail", "github") == 0
+
+
+def test_match_score():
+    assert index.match_score("git", ["git"]) == 3
+    assert (
+        2 < index.match_score("git", ["gitlab"]) < index.match_score("git", ["gitea"])
+    )
+    assert (
+        1 < index.match_score("git", ["mygitlab"]) < index.match_score("git", ["mygit"])
+    )
+    assert index.match_score("git", ["mygit"]) < 2
+    assert index.match_score("git", ["mygit", "gitea", "gitlab"]) == 2 + 3 / 5
+    assert 0 < index.match_score("githbu", ["github"]) < 1
+    assert index.match_score("githbu", ["gitlab", "github"]) == 2 / 6
+    assert index.match_score("githbu", ["gitlab"]) == 0
+    assert index.match_score("git", []) == 0
+
+
+class TestTrigramIndex:
+    def test_candidates(self):
+        trigram_index = index.TrigramIndex()
+        trigram_index.add("entry1", "gitlab")
+        trigram_index.add("entry2", "github")
+        trigram_index.add("entry3", "mail")
+
+        assert trigram_index.candidates("gi") is None
+        assert trigram_index.candidates("git") == {"entry1", "entry2"}
+        assert trigram_index.candidates("gith") == {"entry2"}
+        assert trigram_index.candidates("ail") == {"entry3"}
+        assert trigram_index.candidates("zzz") == set()
+        assert trigram_index.candidates("labhub") == set()
+
+    def test_remove(self):
+        trigram_index = index.TrigramIndex()
+        trigram_index.add("entry", "github")
+        trigram_index.add("entry", "gitlab")
+
+        trigram_index.remove("entry", "github")
+        assert trigram_index.candidates("git") == {"entry"}
+        assert trigram_index.candidates("hub") == set()
+
+        trigram_index.remove("entry", "gitlab")
+        assert trigram_index.candidates("git") == set()
+        assert trigram_index.postings == dict()
+
+        trigram_index.remove("entry", "unknown")
+        assert trigram_index.postings == dict()
+
+    def test_neighbours(self):
+        trigram_index = index.TrigramIndex()
+        trigram_index.add("entry1", "gitlab")
+        trigram_index.add("entry2", "github")
+        trigram_index.add("entry3", "mail")
+
+        assert trigram_index.neighbours("gi") is None
+        assert trigram_index.neighbours("gitla") == {"entry1", "entry2"}
+        assert trigram_index.neighbours("githbu") == {"entry2"}
+        assert trigram_index.neighbours("hubmail") == {"entry3"}
+        assert trigram_index.neighbours("zzz") == set()
@@ -0,0 +1,36 @@
+import io
+
+from pwdmanager import journal
+
+
+def test_write_and_read_records():
+    journal_file = io.BytesIO()
+    journal_file.write(journal.MAGIC)
+    assert journal.write_record(journal_file, b"first") == 4 + len(b"first")
+    journal.write_record(journal_file, b"")
+    journal.write_record(journal_file, b"second")
+
+    assert journal.is_journal(journal_file)
+    assert list(journal.read_records(journal_file)) == [
+        (b"first", 17),
+        (b"", 21),
+        (b"second", 31),
+    ]
+
+
+def test_truncated_record_ignored():
+    journal_file = io.BytesIO()
+    journal_file.write(journal.MAGIC)
+    journal.write_record(journal_file, b"first")
+    journal_file.write(journal.RECORD_LENGTH.pack(10) + b"sec")
+    assert list(journal.read_records(journal_file)) == [(b"first", 17)]
+
+    journal_file.write(b"\x00")
+    journal_file.seek(0)
+    journal_file.truncate(19)
+    assert list(journal.read_records(journal_file)) == [(b"first", 17)]
+
+
+def test_is_journal():
+    assert not journal.is_journal(io.BytesIO(b"PWDJRN"))
+    assert not journal.is_journal(io.BytesIO(b"PWDSEG01"))
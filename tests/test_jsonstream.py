@@ -0,0 +1,48 @@
+import io
+import json
+
+import pytest
+
+from pwdmanager import jsonstream
+
+
+def read_members(text, chunk_size=jsonstream.CHUNK_SIZE, object_hook=None):
+    reader = jsonstream.IncrementalObjectReader(
+        io.BytesIO(text.encode()), object_hook=object_hook, chunk_size=chunk_size
+    )
+    return list(reader)
+
+
+class TestIncrementalObjectReader:
+    def test_empty_object(self):
+        assert read_members("{}") == []
+        assert read_members(" \n{ \n } \n", chunk_size=1) == []
+
+    def test_members(self):
+        as_dict = {
+            "name": {"login": "login", "aliases": ["a", "b"], "nested": {"x": 1}},
+            "é": {"pwd": 'p"w,d}', "number": 12345, "flag": True, "none": None},
+            "last": 3.25,
+        }
+        text = json.dumps(as_dict, indent=2)
+        for chunk_size in (1, 2, 3, 7, 64):
+            assert read_members(text, chunk_size) == list(as_dict.items())
+
+    def test_compact(self):
+        as_dict = {"key{}".format(i): {"value": i} for i in range(100)}
+        reader = jsonstream.IncrementalObjectReader(
+            io.BytesIO(json.dumps(as_dict).encode()), chunk_size=16
+        )
+        for _ in reader:
+            assert len(reader.buffer) < 64
+
+    def test_object_hook(self):
+        members = read_members(
+            '{"a": {"b": {}}}', chunk_size=2, object_hook=lambda o: len(o)
+        )
+        assert members == [("a", 1)]
+
+    def test_malformed(self):
+        for text in ["", "[]", '{"a": 1', '{"a" 1}', "{1: 2}", '{"a": 1} x', '{"a":}']:
+            with pytest.raises(json.JSONDecodeError):
+                read_members(text, chunk_size=3)
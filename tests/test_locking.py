@@ -0,0 +1,50 @@
+import fcntl
+
+import pytest
+
+from pwdmanager import locking
+
+
+def try_lock(path, operation):
+    with open(path, "rb") as lock_file:
+        fcntl.flock(lock_file, operation | fcntl.LOCK_NB)
+
+
+def test_shared_and_exclusive(tmpdir):
+    lock = locking.DatabaseLock(tmpdir.join("db").strpath)
+    with lock.shared():
+        try_lock(lock.path, fcntl.LOCK_SH)
+        with pytest.raises(BlockingIOError):
+            try_lock(lock.path, fcntl.LOCK_EX)
+
+    with lock.exclusive():
+        with pytest.raises(BlockingIOError):
+            try_lock(lock.path, fcntl.LOCK_SH)
+
+    try_lock(lock.path, fcntl.LOCK_EX)
+
+
+def test_generation(tmpdir):
+    lock = locking.DatabaseLock(tmpdir.join("db").strpath)
+    with lock.shared():
+        assert lock.generation() == 0
+    with lock.exclusive():
+        assert lock.increment_generation() == 1
+        assert lock.increment_generation() == 2
+
+    other_lock = locking.DatabaseLock(tmpdir.join("db").strpath)
+    with other_lock.shared():
+        assert other_lock.generation() == 2
+
+    tmpdir.join("db.lock").write("garbage")
+    with lock.exclusive():
+        assert lock.generation() == 0
+        assert lock.increment_generation() == 1
+
+
+def test_symbolic_link(tmpdir):
+    db_path = tmpdir.join("db").strpath
+    tmpdir.join("link").mksymlinkto(db_path)
+    assert locking.DatabaseLock(tmpdir.join("link").strpath).path == (
+        locking.DatabaseLock(db_path).path
+    )
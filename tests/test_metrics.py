@@ -0,0 +1,87 @@
+import json
+
+from pwdmanager import database, metrics
+from pwdmanager.timings import Timings
+
+
+def test_observe_phase():
+    run_metrics = metrics.Metrics("metrics.prom")
+    timings = Timings(on_phase_end=run_metrics.observe_phase)
+    with timings.phase("load"):
+        with timings.phase("decrypt"):
+            pass
+    with timings.phase("save"):
+        pass
+    try:
+        with timings.phase("load"):
+            raise database.DataBaseCryptException("decryption failed")
+    except database.DataBaseCryptException:
+        pass
+
+    assert run_metrics.decrypt_failures == 1
+    assert run_metrics.histograms["pwdmanager_load_duration_seconds"]["count"] == 1
+    assert run_metrics.histograms["pwdmanager_save_duration_seconds"]["count"] == 1
+
+
+def test_histogram():
+    histogram = metrics.new_histogram()
+    for seconds in (0.001, 0.005, 0.3, 60):
+        metrics.observe(histogram, seconds)
+
+    assert histogram["buckets"][0] == 2
+    assert histogram["buckets"][metrics.LATENCY_BUCKETS.index(0.5)] == 1
+    assert sum(histogram["buckets"]) == 3
+    assert histogram["count"] == 4
+
+    state = metrics.new_state()
+    state["histograms"]["pwdmanager_load_duration_seconds"] = histogram
+    lines = metrics.render(state).splitlines()
+    assert "# TYPE pwdmanager_load_duration_seconds histogram" in lines
+    assert 'pwdmanager_load_duration_seconds_bucket{le="0.005"} 2' in lines
+    assert 'pwdmanager_load_duration_seconds_bucket{le="0.25"} 2' in lines
+    assert 'pwdmanager_load_duration_seconds_bucket{le="10.0"} 3' in lines
+    assert 'pwdmanager_load_duration_seconds_bucket{le="+Inf"} 4' in lines
+    assert "pwdmanager_load_duration_seconds_count 4" in lines
+
+
+def test_aggregated_over_invocations(tmpdir):
+    db_path = tmpdir.join("db").strpath
+    textfile_path = tmpdir.join("pwdmanager.prom").strpath
+    db = database.Database()
+    db.add_entry(database.DatabaseEntry("name", "login", "pwd"))
+    database.DBLoader(db_path).save_db(db)
+
+    for command in ("show", "show", "list"):
+        run_metrics = metrics.Metrics(textfile_path)
+        metrics.observe(
+            run_metrics.histograms.setdefault(
+                "pwdmanager_load_duration_seconds", metrics.new_histogram()
+            ),
+            0.02,
+        )
+        run_metrics.observe_run(command, db_path, db)
+        run_metrics.save()
+
+    with open(textfile_path) as textfile:
+        lines = textfile.read().splitlines()
+    assert 'pwdmanager_commands_total{command="list"} 1' in lines
+    assert 'pwdmanager_commands_total{command="show"} 2' in lines
+    assert "pwdmanager_decrypt_failures_total 0" in lines
+    assert "pwdmanager_load_duration_seconds_count 3" in lines
+    assert "pwdmanager_entries 1" in lines
+    assert "pwdmanager_journal_bytes 0" in lines
+    assert "pwdmanager_database_bytes {}".format(tmpdir.join("db").size()) in lines
+    assert not any(path.basename.startswith(".") for path in tmpdir.listdir())
+
+
+def test_unreadable_state_starts_over(tmpdir):
+    textfile_path = tmpdir.join("pwdmanager.prom").strpath
+    tmpdir.join("pwdmanager.prom.state").write("{")
+    run_metrics = metrics.Metrics(textfile_path)
+    run_metrics.observe_run("list", tmpdir.join("db").strpath)
+    run_metrics.save()
+
+    with open(metrics.get_state_path(textfile_path)) as state_file:
+        state = json.load(state_file)
+    assert state["counters"]["pwdmanager_commands_total"] == {"list": 1}
+    assert state["gauges"]["pwdmanager_database_bytes"] == 0
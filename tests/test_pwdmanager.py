@@ -0,0 +1,153 @@
+import getpass
+import json
+import subprocess
+import sys
+
+import pytest
+
+from pwdmanager import pwdmanager
+
+
+def refuse_prompt(prompt="Password: "):
+    raise AssertionError("the master password should not be asked")
+
+
+@pytest.fixture(name="run_main")
+def run_main_fixture(monkeypatch, tmpdir):
+    monkeypatch.setattr(getpass, "getpass", refuse_prompt)
+
+    def run_main(*argv):
+        db_path = tmpdir.join("database").strpath
+        monkeypatch.setattr(sys, "argv", ["pwdmanager", "-d", db_path, *argv])
+        pwdmanager.main()
+
+    return run_main
+
+
+def test_startup_imports():
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, pwdmanager.pwdmanager; print(sorted(module for module in"
+            " ('gnupg', 'pwdmanager.commands', 'pwdmanager.database')"
+            " if module in sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert output.strip() == "[]"
+
+
+def test_invalid_arguments_checked_before_prompt(run_main):
+    for argv in (
+        ["shell", "--autosave", "-1"],
+        ["agent", "--idle-timeout", "0"],
+        ["agent", "--save-delay", "-2"],
+        ["migrate", "sharded", "--shards", "0"],
+    ):
+        with pytest.raises(SystemExit):
+            run_main(*argv)
+
+
+def test_missing_import_file_checked_before_prompt(run_main, tmpdir, capsys):
+    run_main("import", tmpdir.join("missing.jsonl").strpath)
+    assert capsys.readouterr().out.startswith("import not applied")
+    assert not tmpdir.join("database").exists()
+
+
+def test_timings_written_to_stderr(monkeypatch, tmpdir, capsys):
+    db_path = tmpdir.join("database").strpath
+    for argv in (
+        ["list", "name"],
+        ["--timings", "list", "name"],
+        ["--timings", "--timings-format", "json", "list", "name"],
+    ):
+        monkeypatch.setattr(
+            sys,
+            "argv",
+            ["pwdmanager", "-d", db_path, "-p", "pwd", "--crypter", "aes-gcm", *argv],
+        )
+        pwdmanager.main()
+        output = capsys.readouterr()
+        assert output.out == "no match\n"
+        if "--timings" in argv:
+            assert "command" in output.err
+
+    assert json.loads(output.err)["phases"][0]["name"] == "agent request"
+
+
+def test_metrics_written(monkeypatch, tmpdir, capsys):
+    db_path = tmpdir.join("database").strpath
+    textfile_path = tmpdir.join("pwdmanager.prom").strpath
+    for argv in (["-p", "pwd", "list"], ["-p", "pwd", "list"], ["-p", "bad", "list"]):
+        monkeypatch.setattr(
+            sys,
+            "argv",
+            ["pwdmanager", "-d", db_path, "--crypter", "aes-gcm"]
+            + ["--metrics", textfile_path, *argv],
+        )
+        pwdmanager.main()
+    assert "decryption failed" in capsys.readouterr().out
+
+    lines = tmpdir.join("pwdmanager.prom").read().splitlines()
+    assert 'pwdmanager_commands_total{command="list"} 3' in lines
+    assert "pwdmanager_decrypt_failures_total 1" in lines
+    assert "pwdmanager_load_duration_seconds_count 1" in lines
+    assert "pwdmanager_entries 0" in lines
+
+
+def test_crypter_kept(run_main, tmpdir, capsys):
+    pytest.importorskip("cryptography")
+    run_main("-p", "pwd", "--crypter", "aes-gcm", "add", "name1", "login", "pwd")
+    run_main("-p", "pwd", "add", "name2", "login", "pwd")
+    assert b"PWDAEAD1" in tmpdir.join("database.journal").read_binary()
+    run_main("-p", "pwd", "--no-journal", "add", "name3", "login", "pwd")
+    assert tmpdir.join("database").read_binary().startswith(b"PWDAEAD1")
+
+    # the crypter given is used instead
+    run_main("-p", "pwd", "--crypter", "gpg", "--no-journal", "rm", "name3")
+    assert not tmpdir.join("database").read_binary().startswith(b"PWDAEAD1")
+    run_main("-p", "pwd", "--no-journal", "rm", "name2")
+    assert not tmpdir.join("database").read_binary().startswith(b"PWDAEAD1")
+    capsys.readouterr()
+
+
+def test_config_file(run_main, tmpdir, capsys):
+    config = tmpdir.join("pwdmanager.ini")
+    config.write("[pwdmanager]\ncrypter = aes-gcm\ncompression = lzma\n")
+    run_main("--config", config.strpath, "-p", "pwd", "add", "name", "login", "pwd")
+    saved = tmpdir.join("database").read_binary()
+    assert saved.startswith(b"PWDAEAD1")
+
+    from pwdmanager.database import AESGCMCrypterInterceptor
+
+    plaintext = AESGCMCrypterInterceptor("pwd").at_load_time_bytes(saved)
+    assert plaintext.startswith(b"PWDZIP")
+
+    # the command line overrides the configuration file
+    run_main(
+        *("--config", config.strpath, "--compression", "none", "--no-journal"),
+        *("-p", "pwd", "rm", "name"),
+    )
+    saved = tmpdir.join("database").read_binary()
+    assert (
+        not AESGCMCrypterInterceptor("pwd")
+        .at_load_time_bytes(saved)
+        .startswith(b"PWDZIP")
+    )
+    capsys.readouterr()
+
+    for content in (
+        "[pwdmanager]\nunknown = 1\n",
+        "[pwdmanager]\ncompression = gzip\n",
+        "[pwdmanager]\ncompression = bz2\ncompression-level = 0\n",
+        "[pwdmanager]\ncompression-level = high\n",
+        "no section\n",
+    ):
+        config.write(content)
+        with pytest.raises(SystemExit):
+            run_main("--config", config.strpath, "list")
+    with pytest.raises(SystemExit):
+        run_main("--config", tmpdir.join("missing.ini").strpath, "list")
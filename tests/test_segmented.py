@@ -0,0 +1,23 @@
+import io
+
+from pwdmanager import segmented
+
+
+def test_write_and_read():
+    db_file = io.BytesIO()
+    assert not segmented.is_segmented(db_file)
+
+    writer = segmented.SegmentWriter(db_file)
+    first_offset = writer.write_segment(b"first")
+    second_offset = writer.write_segment(b"second segment")
+    writer.write_header(b"header")
+
+    assert segmented.is_segmented(db_file)
+    assert segmented.read_header(db_file) == b"header"
+    assert segmented.read_segment(db_file, first_offset, 5) == b"first"
+    assert segmented.read_segment(db_file, second_offset, 14) == b"second segment"
+
+
+def test_is_segmented_legacy():
+    assert not segmented.is_segmented(io.BytesIO(b'{"name": {}}'))
+    assert not segmented.is_segmented(io.BytesIO(b""))
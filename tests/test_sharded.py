@@ -0,0 +1,44 @@
+import os
+
+from pwdmanager import sharded
+
+
+def test_shard_of():
+    shards = [sharded.shard_of("name{}".format(i), 4) for i in range(100)]
+    assert set(shards) == {0, 1, 2, 3}
+    assert sharded.shard_of("name1", 4) == shards[1]
+
+
+def test_new_shard_file():
+    shard_file = sharded.new_shard_file(3)
+    assert shard_file.startswith("shard-003-")
+    assert sharded.new_shard_file(3) != shard_file
+
+
+def test_remove_unused_shards(tmpdir):
+    for file_name in ("manifest", "shard-000-a", "shard-000-b", "shard-001-c"):
+        tmpdir.join(file_name).write("data")
+    sharded.remove_unused_shards(tmpdir.strpath, ["shard-000-b", "shard-001-c"])
+    assert sorted(os.listdir(tmpdir.strpath)) == [
+        "manifest",
+        "shard-000-b",
+        "shard-001-c",
+    ]
+    assert sharded.get_size(tmpdir.strpath) == 12
+
+
+def test_replace(tmpdir):
+    db_path = tmpdir.join("database")
+    db_path.write("file")
+    directory = tmpdir.mkdir("directory")
+    directory.join("manifest").write("manifest")
+
+    sharded.replace(directory.strpath, db_path.strpath)
+    assert db_path.join("manifest").read() == "manifest"
+    assert not directory.exists()
+
+    other_file = tmpdir.join("other")
+    other_file.write("file again")
+    sharded.replace(other_file.strpath, db_path.strpath)
+    assert db_path.read() == "file again"
+    assert sorted(os.listdir(tmpdir.strpath)) == ["database"]
@@ -0,0 +1,75 @@
+import io
+from unittest.mock import MagicMock
+
+import pytest
+
+from pwdmanager import database, shell
+from pwdmanager.pwdmanager import create_arg_parser, create_command
+
+
+@pytest.fixture(name="db_manager")
+def db_manager_fixture():
+    db_manager = database.DataBaseManager(MagicMock(spec=database.DBLoader))
+    db_manager.db = database.Database()
+    return db_manager
+
+
+def run_shell(db_manager, lines, autosave=0):
+    stdout = io.StringIO()
+    db_shell = shell.Shell(
+        db_manager,
+        create_arg_parser(),
+        create_command,
+        autosave=autosave,
+        stdin=io.StringIO("".join(line + "\n" for line in lines)),
+        stdout=stdout,
+    )
+    db_shell.cmdloop()
+    return db_shell, stdout.getvalue()
+
+
+def test_execute_commands(db_manager):
+    _, output = run_shell(
+        db_manager,
+        ["add name login 'my pwd' -a alias", "", "show alias", "add name l p"],
+    )
+    assert "successfully added" in output
+    assert "password: my pwd" in output
+    assert "already exists" in output
+    assert db_manager.db_loader.save_db.call_count == 1
+
+
+def test_invalid_commands(db_manager):
+    _, output = run_shell(
+        db_manager, ["unknown", "show", "agent", "migrate legacy", "add 'a"]
+    )
+    assert "agent is not available" in output
+    assert "migrate is not available" in output
+    assert "cannot parse command" in output
+    assert db_manager.db_loader.save_db.call_count == 0
+
+
+def test_save(db_manager):
+    _, output = run_shell(
+        db_manager, ["save", "add name login pwd", "show name", "save", "save"]
+    )
+    assert output.count("nothing to save") == 2
+    assert output.count("database saved") == 1
+    assert db_manager.db_loader.save_db.call_count == 1
+
+
+def test_autosave(db_manager):
+    db_shell, _ = run_shell(
+        db_manager,
+        [
+            "add name1 login pwd",
+            "show name1",
+            "add name2 login pwd",
+            "add name3 login pwd",
+            "rm unknown",
+            "quit",
+        ],
+        autosave=2,
+    )
+    assert db_manager.db_loader.save_db.call_count == 2
+    assert db_shell.unsaved_modifications == 0
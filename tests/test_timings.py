@@ -0,0 +1,94 @@
+import json
+
+from pwdmanager.timings import NO_TIMINGS, Timings
+
+
+def test_phases_added_up_by_parents():
+    timings = Timings()
+    with timings.phase("load"):
+        with timings.phase("decrypt"):
+            pass
+    with timings.phase("save"):
+        for _ in range(3):
+            with timings.phase("encrypt"):
+                pass
+    with timings.phase("load"):
+        with timings.phase("index"):
+            pass
+
+    assert [path for path, _ in timings.sorted_phases()] == [
+        ("load",),
+        ("load", "decrypt"),
+        ("load", "index"),
+        ("save",),
+        ("save", "encrypt"),
+    ]
+    assert timings.phases[("load",)][0] == 2
+    assert timings.phases[("save", "encrypt")][0] == 3
+    assert timings.path == ()
+
+
+def test_phase_timed_on_exception():
+    timings = Timings()
+    try:
+        with timings.phase("load"):
+            raise ValueError()
+    except ValueError:
+        pass
+    assert timings.phases[("load",)][0] == 1
+    assert timings.path == ()
+
+
+def test_on_phase_end():
+    ended = list()
+    timings = Timings(
+        on_phase_end=lambda path, nanoseconds, error: ended.append((path, error))
+    )
+    with timings.phase("load"):
+        with timings.phase("decrypt"):
+            pass
+    error = ValueError()
+    try:
+        with timings.phase("save"):
+            raise error
+    except ValueError:
+        pass
+
+    assert ended == [(("load", "decrypt"), None), (("load",), None), (("save",), error)]
+
+
+def test_add():
+    ended = list()
+    timings = Timings(
+        on_phase_end=lambda path, nanoseconds, error: ended.append((path, nanoseconds))
+    )
+    with timings.phase("output"):
+        timings.add("render", 5)
+        timings.add("render", 7)
+    assert timings.phases[("output", "render")] == [2, 12]
+    assert ended[:2] == [(("output", "render"), 5), (("output", "render"), 7)]
+    NO_TIMINGS.add("render", 5)
+
+
+def test_render():
+    timings = Timings()
+    with timings.phase("save"):
+        with timings.phase("encrypt"):
+            pass
+
+    lines = timings.render("table").splitlines()
+    assert lines[0].split() == ["phase", "calls", "ms"]
+    assert lines[1].startswith("save ")
+    assert lines[2].startswith("  encrypt ")
+    assert lines[3].startswith("total ")
+
+    report = json.loads(timings.render("json"))
+    assert [
+        (phase["name"], phase["parents"], phase["calls"]) for phase in report["phases"]
+    ] == [("save", [], 1), ("encrypt", ["save"], 1)]
+    assert report["total_seconds"] >= report["phases"][0]["seconds"]
+
+
+def test_no_timings():
+    with NO_TIMINGS.phase("load"):
+        pass
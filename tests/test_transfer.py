@@ -0,0 +1,178 @@
+import io
+
+import pytest
+
+from pwdmanager import database, transfer
+
+
+def create_database():
+    db = database.Database()
+    entry = database.DatabaseEntry("name", "login", "pwd", "login alias")
+    entry.aliases = ["alias"]
+    entry.tags = ["tag"]
+    entry.creation_date = "2020-01-01T00:00:00"
+    db.add_entry(entry)
+    db.add_entry(database.DatabaseEntry("other", "other login", "other pwd"))
+    return db
+
+
+def test_export_then_import_jsonl():
+    output = io.StringIO()
+    assert transfer.write_jsonl(create_database().entries(), output) == 2
+
+    db = database.Database()
+    output.seek(0)
+    counts = transfer.Importer(db).import_records(transfer.read_jsonl(output))
+    assert counts["imported"] == 2
+    assert db["alias"].name == "name"
+    assert db["name"].login_alias == "login alias"
+    assert db["name"].tags == {"tag"}
+    assert db["other"].pwd == "other pwd"
+    assert db.find_matching_entries(None, "ta") == [db["name"]]
+
+
+def test_export_then_import_csv():
+    db = create_database()
+    db.add_alias(db["name"], "second alias")
+    output = io.StringIO()
+    assert transfer.write_csv(db.entries(), output) == 2
+
+    imported_db = database.Database()
+    output.seek(0)
+    transfer.Importer(imported_db).import_records(transfer.read_csv(output))
+    assert imported_db["name"].aliases == {"alias", "second alias"}
+    assert imported_db["name"].creation_date == db["name"].creation_date
+    assert imported_db["other"].aliases == set()
+    assert imported_db["other"].login_alias is None
+
+
+def test_read_jsonl_invalid():
+    with pytest.raises(transfer.TransferException, match="line 2: .*"):
+        list(transfer.read_jsonl(['{"name": "n"}', "{"]))
+    with pytest.raises(transfer.TransferException, match="line 1: .*object"):
+        list(transfer.read_jsonl(["[]"]))
+
+
+def test_read_bitwarden_csv():
+    lines = io.StringIO(
+        "folder,favorite,type,name,notes,fields,login_uri,login_username,"
+        "login_password,login_totp\n"
+        "mail,,login,provider,,,https://mail.example,me,secret,\n"
+        ",,note,a note,text,,,,,\n"
+        ",,login,bank,,,,client,1234,\n"
+    )
+    records = list(transfer.read_bitwarden_csv(lines))
+    assert records == [
+        {"name": "provider", "login": "me", "password": "secret", "tags": ["mail"]},
+        {"name": "bank", "login": "client", "password": "1234", "tags": []},
+    ]
+
+
+def test_import_invalid_records():
+    db = database.Database()
+    counts = transfer.Importer(db).import_records(
+        [
+            {"name": "name", "login": "login"},
+            {"name": "", "login": "login", "password": "pwd"},
+            {"name": 1, "login": "login", "password": "pwd"},
+            {"name": "name", "login": "login", "password": "pwd", "login_alias": 5},
+            {"name": "name", "login": "l", "password": "p", "creation_date": 16e8},
+            {"name": "name", "login": "l", "password": "p", "last_update_date": []},
+            {"name": "name", "login": "login", "password": "pwd"},
+        ]
+    )
+    assert counts["invalid"] == 6
+    assert counts["imported"] == 1
+    assert len(db.db) == 1
+
+
+def test_import_aliases_and_tags():
+    db = database.Database()
+    counts = transfer.Importer(db).import_records(
+        [
+            {"name": "a", "login": "l", "password": "p", "aliases": "a1;a2"},
+            {"name": "b", "login": "l", "password": "p", "tags": ["t1", "", "t2"]},
+            {"name": "c", "login": "l", "password": "p", "aliases": {"c1": 1}},
+            {"name": "d", "login": "l", "password": "p", "tags": [1, 2]},
+        ]
+    )
+    assert counts["imported"] == 2
+    assert counts["invalid"] == 2
+    assert db["a"].aliases == {"a1", "a2"}
+    assert db["b"].tags == {"t1", "t2"}
+
+
+def test_import_name_conflict():
+    record = {"name": "alias", "login": "new login", "password": "new pwd"}
+
+    with pytest.raises(transfer.TransferException):
+        transfer.Importer(create_database()).import_record(record)
+
+    db = create_database()
+    importer = transfer.Importer(db, on_name_conflict="skip")
+    importer.import_record(record)
+    assert importer.counts["skipped"] == 1
+    assert db["alias"].login == "login"
+
+    db = create_database()
+    importer = transfer.Importer(db, on_name_conflict="overwrite")
+    importer.import_record(dict(record, name="name", aliases=["alias"]))
+    assert importer.counts["overwritten"] == 1
+    assert db["alias"].login == "new login"
+    assert len(db.db) == 2
+
+    # the name of the record is the alias of another entry, not overwritten
+    db = create_database()
+    importer = transfer.Importer(db, on_name_conflict="overwrite")
+    with pytest.raises(transfer.TransferException, match="alias of entry name"):
+        importer.import_record(record)
+    assert db["alias"].login == "login"
+    assert len(db.db) == 2
+
+    db = create_database()
+    importer = transfer.Importer(db, on_name_conflict="rename")
+    importer.import_record(record)
+    importer.import_record(record)
+    assert importer.counts["renamed"] == 2
+    assert db["alias-2"].login == "new login"
+    assert "alias-3" in db
+    assert db["alias"].name == "name"
+
+
+def test_import_alias_conflict():
+    record = {
+        "name": "new",
+        "login": "login",
+        "password": "pwd",
+        "aliases": ["alias", "free"],
+    }
+
+    with pytest.raises(transfer.TransferException, match="aliases alias .*"):
+        transfer.Importer(create_database()).import_record(record)
+
+    db = create_database()
+    importer = transfer.Importer(db, on_alias_conflict="skip")
+    importer.import_record(record)
+    assert importer.counts["skipped"] == 1
+    assert "new" not in db
+
+    db = create_database()
+    importer = transfer.Importer(db, on_alias_conflict="drop")
+    importer.import_record(record)
+    assert db["free"].name == "new"
+    assert db["new"].aliases == {"free"}
+    assert db["alias"].name == "name"
+
+
+def test_import_overwrite_keeps_entry_on_alias_conflict():
+    db = create_database()
+    importer = transfer.Importer(
+        db, on_name_conflict="overwrite", on_alias_conflict="skip"
+    )
+    importer.import_record(
+        {"name": "name", "login": "l", "password": "p", "aliases": ["other"]}
+    )
+    assert importer.counts == dict(
+        imported=0, overwritten=0, renamed=0, skipped=1, invalid=0
+    )
+    assert db["name"].login == "login"